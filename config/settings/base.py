@@ -132,7 +132,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "sandbox_math.utils.middleware.AsyncWhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -288,3 +288,29 @@ STATICFILES_FINDERS += ["compressor.finders.CompressorFinder"]
 # ------------------------------------------------------------------------------
 RECAPTCHA_PUBLIC_KEY = "6Lc5eI0nAAAAAOHYyfRoSxySD8JbZwn1bdpkhGjr"
 RECAPTCHA_PRIVATE_KEY = env("RECAPTCHA_PRIVATE_KEY")
+
+# ALGEBRA
+# ------------------------------------------------------------------------------
+# How many parsed latex expressions each process keeps in memory, see Expression.get_sympy_expression_from_latex
+ALGEBRA_PARSE_CACHE_SIZE = env.int("ALGEBRA_PARSE_CACHE_SIZE", default=4096)
+# How many random points two expressions are compared at before SymPy's simplify is used to decide if they are
+# equal, see algebra/equivalence.py. Set it to 0 to always use simplify.
+ALGEBRA_EQUIVALENCE_POINTS = env.int("ALGEBRA_EQUIVALENCE_POINTS", default=3)
+# How many equivalence answers each process keeps in memory
+ALGEBRA_EQUIVALENCE_CACHE_SIZE = env.int("ALGEBRA_EQUIVALENCE_CACHE_SIZE", default=8192)
+# The cache from CACHES that equivalence answers are shared through, or None to keep them in each process only
+ALGEBRA_EQUIVALENCE_SHARED_CACHE = None
+ALGEBRA_EQUIVALENCE_SHARED_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+# Seconds UpdateExpressionView waits after saving an edit before it finds the problem's mistakes, so that when someone
+# is typing only their last keystroke is checked, see UpdateExpressionView
+ALGEBRA_EDIT_COALESCE_SECONDS = env.float("ALGEBRA_EDIT_COALESCE_SECONDS", default=0.15)
+
+# SYMPY
+# ------------------------------------------------------------------------------
+# How many worker processes each Django process starts for SymPy work, see utils/sympy_pool.py
+# Set it to 0 to do SymPy work in the request thread, with no time limit
+SYMPY_POOL_SIZE = env.int("SYMPY_POOL_SIZE", default=2)
+# Seconds a piece of SymPy work can take, including waiting for a free worker, before Mistake.TIMEOUT is given
+SYMPY_TIMEOUT = env.float("SYMPY_TIMEOUT", default=2.0)
+# How many threads each Django process runs the blocking work of async views on, see utils/blocking.py
+BLOCKING_WORK_THREADS = env.int("BLOCKING_WORK_THREADS", default=8)
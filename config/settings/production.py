@@ -26,6 +26,8 @@ CACHES = {
         },
     }
 }
+# Share equivalence answers between processes through redis, see algebra/equivalence.py
+ALGEBRA_EQUIVALENCE_SHARED_CACHE = "default"
 
 # SECURITY
 # ------------------------------------------------------------------------------
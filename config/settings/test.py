@@ -28,5 +28,14 @@ EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 # DEBUGGING FOR TEMPLATES
 # ------------------------------------------------------------------------------
 TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore # noqa: F405
+
+# SYMPY
+# ------------------------------------------------------------------------------
+# Do SymPy work in the test process, algebra/tests/test_sympy_tasks.py starts its own pool
+SYMPY_POOL_SIZE = 0
+
+# ALGEBRA
+# ------------------------------------------------------------------------------
+ALGEBRA_EDIT_COALESCE_SECONDS = 0
 # Your stuff...
 # ------------------------------------------------------------------------------
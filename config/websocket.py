@@ -1,4 +1,16 @@
+import re
+
+from sandbox_math.algebra.websocket import algebra_feedback_application
+
+ALGEBRA_FEEDBACK_PATH = re.compile(r"^/ws/algebra/(?P<problem_id>\d+)/$")
+
+
 async def websocket_application(scope, receive, send):
+    algebra_feedback_path = ALGEBRA_FEEDBACK_PATH.match(scope["path"])
+    if algebra_feedback_path:
+        await algebra_feedback_application(scope, receive, send, int(algebra_feedback_path["problem_id"]))
+        return
+
     while True:
         event = await receive()
 
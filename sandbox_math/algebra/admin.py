@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from sandbox_math.algebra.models import CheckRewrite, CheckSolution, Expression, Problem, Step
+from sandbox_math.algebra.models import CheckRewrite, CheckSolution, Expression, Problem, Step, StepAnalysis
 
 
 # Register your models here.
@@ -18,10 +18,16 @@ class ExpressionAdmin(admin.ModelAdmin):
 
 @admin.register(Step)
 class StepAdmin(admin.ModelAdmin):
-    list_display = ["id", "problem_id", "created", "step_type", "left_expr_id", "right_expr_id"]
+    list_display = ["id", "problem_id", "position", "created", "step_type", "left_expr_id", "right_expr_id"]
     search_fields = ["id", "problem__id", "left_expr__id", "right_expr__id"]
 
 
+@admin.register(StepAnalysis)
+class StepAnalysisAdmin(admin.ModelAdmin):
+    list_display = ["id", "step_id", "analyzer_version", "left_mistake", "right_mistake", "updated"]
+    search_fields = ["id", "step__id"]
+
+
 @admin.register(CheckRewrite)
 class CheckRewriteAdmin(admin.ModelAdmin):
     list_display = ["id", "problem_id", "start_time", "expr1_id", "expr2_id", "are_equivalent", "end_time"]
@@ -0,0 +1,285 @@
+import random
+from fractions import Fraction
+from hashlib import sha256
+
+import sympy
+from django.conf import settings
+from django.core.cache import caches
+from sympy import Basic, UnevaluatedExpr, srepr
+
+from sandbox_math.algebra.sympy_tasks import simplifies_to_zero
+from sandbox_math.utils.cache import MISSING, LRUCache
+from sandbox_math.utils.sympy_pool import run_sympy
+
+# This module decides if two SymPy expressions are equal, which is the same as asking if simplify(a - b) == 0.
+# simplify is the slowest thing the app does, and most of the time the answer is no, so both expressions are first
+# evaluated at a few random rational points with exact arithmetic. If they are different at any point they can't be
+# equivalent. When every point agrees, both expressions are turned into rational functions, a numerator and a
+# denominator polynomial with fraction coefficients, which is everything a student can type into the sandbox: numbers,
+# variables, arithmetic and whole number exponents. Two rational functions with the same canonical form, which most
+# rewrites like 2x+4 and 4+2x have, are equal without any more work, and otherwise they are equal when their cross
+# products are the same polynomial. simplify only gets used for expressions with something else in them.
+
+# Bump this whenever a change here could give a different answer for the same two expressions
+ENGINE_VERSION = 1
+
+equivalence_cache = LRUCache(settings.ALGEBRA_EQUIVALENCE_CACHE_SIZE)
+
+# The points are random but the same every time, so the same two expressions always get the same answer
+POINT_SEED = 2023
+# Each variable gets a value numerator/denominator picked from these ranges
+NUMERATOR_RANGE = (-50, 50)
+DENOMINATOR_RANGE = (1, 20)
+# Powers bigger than this are left to simplify, so the exact numbers don't get huge
+MAX_EXPONENT = 64
+# Polynomials with more terms than this, or numbers with more bits than this, are left to simplify too, because
+# something like ((x+1)^64)^64 is small to type but would take minutes to multiply out here
+MAX_TERMS = 200
+MAX_BITS = 4096
+
+
+# Raised when an expression has something in it that can't be evaluated exactly with fractions, like a decimal
+# (SymPy rounds those), a function, a constant like pi, or a power that isn't a whole number
+# It is also raised when the exact numbers or polynomials would get too big to work with quickly
+class CannotEvaluate(Exception):
+    pass
+
+
+# This returns True if simplify(expr_a - expr_b) == 0
+# It raises SympyTimeout if simplify was needed and took too long
+# Answers are kept in equivalence_cache, and in the shared cache from settings.ALGEBRA_EQUIVALENCE_SHARED_CACHE if
+# there is one, because lots of students type the same steps
+def are_equivalent(expr_a, expr_b):
+    cache_key = get_cache_key(expr_a, expr_b)
+    is_equivalent = equivalence_cache.get(cache_key)
+    if is_equivalent is MISSING:
+        shared_cache = None
+        if settings.ALGEBRA_EQUIVALENCE_SHARED_CACHE:
+            shared_cache = caches[settings.ALGEBRA_EQUIVALENCE_SHARED_CACHE]
+            is_equivalent = shared_cache.get(cache_key, MISSING)
+
+        if is_equivalent is MISSING:
+            is_equivalent = check_equivalence(expr_a, expr_b)
+            if shared_cache is not None:
+                shared_cache.set(cache_key, is_equivalent, settings.ALGEBRA_EQUIVALENCE_SHARED_CACHE_TIMEOUT)
+        equivalence_cache.set(cache_key, is_equivalent)
+
+    return is_equivalent
+
+
+# The same for expr_a and expr_b in either order, and for the same expressions with their terms in a different order
+# ENGINE_VERSION and the SymPy version are part of it, so answers from older rules are never used
+def get_cache_key(expr_a, expr_b):
+    pair = "|".join(sorted([srepr(expr_a), srepr(expr_b)]))
+    return f"algebra:equivalence:{ENGINE_VERSION}:{sympy.__version__}:{sha256(pair.encode()).hexdigest()}"
+
+
+# Only called by are_equivalent
+def check_equivalence(expr_a, expr_b):
+    point_count = settings.ALGEBRA_EQUIVALENCE_POINTS
+    try:
+        if point_count > 0 and differ_at_points(expr_a, expr_b, point_count):
+            return False
+
+        numerator_a, denominator_a = get_rational_function(expr_a)
+        numerator_b, denominator_b = get_rational_function(expr_b)
+        if get_canonical_form(numerator_a, denominator_a) == get_canonical_form(numerator_b, denominator_b):
+            return True
+        return have_same_cross_products(numerator_a, denominator_a, numerator_b, denominator_b)
+    except CannotEvaluate:
+        pass
+
+    return run_sympy(simplifies_to_zero, expr_a, expr_b)
+
+
+# This returns True if the two expressions have different values at one of point_count random points
+# Points where either expression divides by zero are skipped
+def differ_at_points(expr_a, expr_b, point_count):
+    if not isinstance(expr_a, Basic) or not isinstance(expr_b, Basic):
+        raise CannotEvaluate()
+
+    variables = sorted(expr_a.free_symbols | expr_b.free_symbols, key=str)
+    if not variables:
+        # Without variables there is only one value to compare
+        point_count = 1
+
+    rng = random.Random(POINT_SEED)
+    points_compared = 0
+    for _ in range(point_count * 3):
+        point = {v: Fraction(rng.randint(*NUMERATOR_RANGE), rng.randint(*DENOMINATOR_RANGE)) for v in variables}
+        try:
+            value_a = evaluate_at(expr_a, point)
+            value_b = evaluate_at(expr_b, point)
+        except ZeroDivisionError:
+            continue
+
+        if value_a != value_b:
+            return True
+        points_compared += 1
+        if points_compared == point_count:
+            break
+
+    return False
+
+
+# This is a recursive function that returns the exact value of sympy_expr as a Fraction
+# point is a dictionary with a Fraction for every variable in sympy_expr
+def evaluate_at(sympy_expr, point):
+    if sympy_expr.is_Symbol:
+        return point[sympy_expr]
+    elif sympy_expr.is_Rational:
+        return Fraction(int(sympy_expr.p), int(sympy_expr.q))
+    elif sympy_expr.is_Add:
+        value = Fraction(0)
+        for arg in sympy_expr.args:
+            value += evaluate_at(arg, point)
+        return value
+    elif sympy_expr.is_Mul:
+        value = Fraction(1)
+        for arg in sympy_expr.args:
+            value *= evaluate_at(arg, point)
+        return value
+    elif sympy_expr.is_Pow:
+        exponent = evaluate_at(sympy_expr.exp, point)
+        if exponent.denominator != 1 or abs(exponent) > MAX_EXPONENT:
+            raise CannotEvaluate()
+        base = evaluate_at(sympy_expr.base, point)
+        if get_bit_length(base) * abs(int(exponent)) > MAX_BITS:
+            raise CannotEvaluate()
+        return base ** int(exponent)
+    elif isinstance(sympy_expr, UnevaluatedExpr):
+        return evaluate_at(sympy_expr.args[0], point)
+
+    raise CannotEvaluate()
+
+
+def get_bit_length(fraction):
+    return max(fraction.numerator.bit_length(), fraction.denominator.bit_length())
+
+
+# A polynomial is a dictionary from monomials to their nonzero Fraction coefficients
+# A monomial is a sorted tuple of (variable name, exponent) pairs, so 3x^2y is {(("x", 2), ("y", 1)): Fraction(3)}
+# and a number on its own is the empty monomial ()
+ONE = {(): Fraction(1)}
+
+
+def add_polynomials(poly_a, poly_b):
+    total = dict(poly_a)
+    for monomial, coefficient in poly_b.items():
+        coefficient += total.get(monomial, 0)
+        if coefficient:
+            total[monomial] = coefficient
+        else:
+            total.pop(monomial, None)
+
+    return total
+
+
+def multiply_monomials(monomial_a, monomial_b):
+    exponents = dict(monomial_a)
+    for variable, exponent in monomial_b:
+        exponents[variable] = exponents.get(variable, 0) + exponent
+
+    return tuple(sorted((variable, exponent) for variable, exponent in exponents.items() if exponent))
+
+
+def multiply_polynomials(poly_a, poly_b):
+    product = {}
+    for monomial_a, coefficient_a in poly_a.items():
+        for monomial_b, coefficient_b in poly_b.items():
+            monomial = multiply_monomials(monomial_a, monomial_b)
+            product[monomial] = product.get(monomial, 0) + coefficient_a * coefficient_b
+        if len(product) > MAX_TERMS:
+            raise CannotEvaluate()
+
+    if any(get_bit_length(coefficient) > MAX_BITS for coefficient in product.values()):
+        raise CannotEvaluate()
+    return {monomial: coefficient for monomial, coefficient in product.items() if coefficient}
+
+
+def power_of_polynomial(poly, exponent):
+    result = ONE
+    for _ in range(exponent):
+        result = multiply_polynomials(result, poly)
+
+    return result
+
+
+# This is a recursive function that returns sympy_expr as a (numerator, denominator) pair of polynomials
+# The denominator is never the zero polynomial, anything that divides by zero is left to simplify
+def get_rational_function(sympy_expr):
+    if not isinstance(sympy_expr, Basic):
+        raise CannotEvaluate()
+
+    if sympy_expr.is_Symbol:
+        return {((sympy_expr.name, 1),): Fraction(1)}, ONE
+    elif sympy_expr.is_Rational:
+        if sympy_expr.p == 0:
+            return {}, ONE
+        return {(): Fraction(int(sympy_expr.p), int(sympy_expr.q))}, ONE
+    elif sympy_expr.is_Add:
+        numerator, denominator = {}, ONE
+        for arg in sympy_expr.args:
+            arg_numerator, arg_denominator = get_rational_function(arg)
+            if arg_denominator == denominator:
+                numerator = add_polynomials(numerator, arg_numerator)
+            else:
+                numerator = add_polynomials(
+                    multiply_polynomials(numerator, arg_denominator), multiply_polynomials(arg_numerator, denominator)
+                )
+                denominator = multiply_polynomials(denominator, arg_denominator)
+        return numerator, denominator
+    elif sympy_expr.is_Mul:
+        numerator, denominator = ONE, ONE
+        for arg in sympy_expr.args:
+            arg_numerator, arg_denominator = get_rational_function(arg)
+            numerator = multiply_polynomials(numerator, arg_numerator)
+            denominator = multiply_polynomials(denominator, arg_denominator)
+        return numerator, denominator
+    elif sympy_expr.is_Pow:
+        exponent_numerator, exponent_denominator = get_rational_function(sympy_expr.exp)
+        if set(exponent_numerator) - {()} or set(exponent_denominator) != {()}:
+            # The exponent has a variable in it
+            raise CannotEvaluate()
+        exponent = exponent_numerator.get((), Fraction(0)) / exponent_denominator[()]
+        if exponent.denominator != 1 or abs(exponent) > MAX_EXPONENT:
+            raise CannotEvaluate()
+
+        numerator, denominator = get_rational_function(sympy_expr.base)
+        if exponent < 0:
+            if not numerator:
+                raise CannotEvaluate()
+            numerator, denominator = denominator, numerator
+        exponent = abs(int(exponent))
+        return power_of_polynomial(numerator, exponent), power_of_polynomial(denominator, exponent)
+    elif isinstance(sympy_expr, UnevaluatedExpr):
+        return get_rational_function(sympy_expr.args[0])
+
+    raise CannotEvaluate()
+
+
+# Only called by check_equivalence, when the canonical forms are different
+def have_same_cross_products(numerator_a, denominator_a, numerator_b, denominator_b):
+    return multiply_polynomials(numerator_a, denominator_b) == multiply_polynomials(numerator_b, denominator_a)
+
+
+# This returns a form of the rational function numerator/denominator, from get_rational_function, that is the same
+# for expressions that are equal once their numerator and denominator have been multiplied out. The denominator is
+# scaled so its first coefficient is 1, and variables that are a factor of every term on top and bottom are
+# cancelled, but other common factors are not: (x^2-1)/(x-1) and x+1 have different canonical forms, which is why
+# check_equivalence compares cross products when the canonical forms are different
+def get_canonical_form(numerator, denominator):
+    if not numerator:
+        return (), (((), Fraction(1)),)
+
+    lowest_exponents = dict(next(iter(numerator)))
+    for monomial in list(numerator) + list(denominator):
+        exponents = dict(monomial)
+        lowest_exponents = {v: min(e, exponents[v]) for v, e in lowest_exponents.items() if v in exponents}
+    common_factor = tuple((v, -e) for v, e in sorted(lowest_exponents.items()))
+
+    scale = 1 / denominator[min(denominator)]
+    return tuple(
+        tuple(sorted((multiply_monomials(m, common_factor), coefficient * scale) for m, coefficient in poly.items()))
+        for poly in (numerator, denominator)
+    )
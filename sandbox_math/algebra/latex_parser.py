@@ -0,0 +1,183 @@
+import re
+from collections import namedtuple
+
+# This module turns the LaTeX that MathQuill produces into a string that SymPy's parse_expr can read.
+# It replaces the old loops in Expression.parse_latex, which searched the whole string again from the start after
+# every single replacement and every single \frac and subscript. Here the latex words are swapped out with a fixed
+# number of passes, and \frac and subscripts are rewritten in one pass over the braces, so the cost is linear in the
+# length of the expression.
+# scan_expression then checks that string, in one pass, for the mistakes parse_expr lets through.
+
+# LaTeX words that are swapped out for something SymPy understands, in the order they are swapped out
+# If there is a space directly after one of these words, MathQuill put it there and it gets dropped, too
+LATEX_WORDS = {
+    "\\ ": "",
+    "\\cdot": "*",
+    "\\backslash": "\\",
+    "\\left(": "(",
+    "\\left\\{": "{",
+    "\\left[": "[",
+    "\\left|": "|",
+    "\\right)": ")",
+    "\\right\\}": "}",
+    "\\right]": "]",
+    "\\right|": "|",
+    "\\%": "%",
+    "\\sim": "~",
+    "^": "**",
+}
+
+# Every place a brace group starts or ends
+GROUP_PATTERN = re.compile(r"\\frac\{|_\{|[{}]")
+
+# Kinds of open brace groups
+BRACES = "braces"
+NUMERATOR = "numerator"
+DENOMINATOR = "denominator"
+SUBSCRIPT = "subscript"
+
+
+# This takes a latex expression and converts it into a human-readable string that SymPy can use
+def compile_latex(latex_expression):
+    if not latex_expression:
+        return ""
+
+    parsable_expression = latex_expression
+    for latex_word, replacement in LATEX_WORDS.items():
+        if latex_word in parsable_expression:
+            parsable_expression = parsable_expression.replace(f"{latex_word} ", replacement).replace(
+                latex_word, replacement
+            )
+
+    if "\\frac{" not in parsable_expression and "_{" not in parsable_expression:
+        return parsable_expression
+
+    return compile_groups(parsable_expression)
+
+
+# This rewrites \frac{a}{b} as ((a)/(b)) and x_{a} as x_a, just like the old parse_frac and subscript loops did
+# Parsing underscores is tricky because you don't know how to interpret xy_f
+# is it x(y_f) or is it (xy_f)? Until i can figure this out...no underscores are allowed
+# A \frac or subscript that is missing a brace is left as it is, so SymPy will not be able to parse it
+def compile_groups(text):
+    output = []
+    last_written = ""  # The last character written to output
+    copied_to = 0  # Everything in text before this index has been written to output
+    # Each open group is [kind, index in output of its opening, index in output of ")/(" for fractions, latex opening]
+    open_groups = []
+
+    for group in GROUP_PATTERN.finditer(text):
+        if group.start() < copied_to:
+            # This is the "{" of a denominator, which was already written out when the numerator was closed
+            continue
+
+        before = text[copied_to : group.start()]  # NOQA
+        if before:
+            output.append(before)
+            last_written = before[-1]
+            copied_to = group.start()
+
+        token = group.group()
+        if token == "}":
+            if not open_groups:
+                continue
+            kind, open_index, middle_index, latex_open = open_groups.pop()
+            if kind == BRACES:
+                continue
+
+            copied_to = group.end()
+            if kind == NUMERATOR:
+                if text.startswith("{", copied_to):
+                    open_groups.append([DENOMINATOR, open_index, len(output), latex_open])
+                    output.append(")/(")
+                    copied_to += 1
+                else:
+                    output[open_index] = latex_open
+                    output.append("}")
+                last_written = output[-1][-1]
+            elif kind == DENOMINATOR:
+                output.append("))")
+                last_written = ")"
+        elif token == "{":
+            if group.start() == copied_to and last_written == "_":
+                # The old parser kept removing the braces after an underscore until there were none left
+                # so x_{{1}} and x_{}{1} are both x_1
+                open_groups.append([SUBSCRIPT, len(output), None, "{"])
+                output.append("")
+                copied_to = group.end()
+            else:
+                open_groups.append([BRACES, None, None, token])
+        else:
+            copied_to = group.end()
+            if token == "_{":
+                open_groups.append([SUBSCRIPT, len(output), None, token])
+                output.append("_")
+                last_written = "_"
+            else:
+                open_groups.append([NUMERATOR, len(output), None, token])
+                output.append("((")
+                last_written = "("
+
+    output.append(text[copied_to:])
+
+    # Put back the latex for any \frac or subscript that was never closed
+    for kind, open_index, middle_index, latex_open in open_groups:
+        if kind != BRACES:
+            output[open_index] = latex_open
+        if middle_index is not None:
+            output[middle_index] = "}{"
+
+    return "".join(output)
+
+
+# A problem found by scan_expression, start and end are offsets into the string that was scanned
+ScanIssue = namedtuple("ScanIssue", ["kind", "start", "end"])
+
+# Kinds of scan issues
+EMPTY_GROUP = "empty group"
+UNKNOWN_SYMBOL = "unknown symbol"
+UNBALANCED = "unbalanced"
+
+BRACKET_PAIRS = {")": "(", "]": "[", "}": "{"}
+OPENING_BRACKETS = set(BRACKET_PAIRS.values())
+# Characters that are always fine in a math expression, so the scan can move past them quickly
+PLAIN_CHARACTERS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-+*/.")
+
+
+# This walks over a SymPy-friendly string once, keeping a stack of open brackets, and returns every problem in it:
+# brackets with nothing but spaces inside, symbols that are not math, and brackets that are never opened or closed
+# The issues are sorted by where they start
+def scan_expression(text):
+    issues = []
+    open_brackets = []  # Each open bracket is [bracket, index in text, whether it is empty so far]
+
+    for i, c in enumerate(text):
+        if c in PLAIN_CHARACTERS:
+            if open_brackets:
+                open_brackets[-1][2] = False
+        elif c in BRACKET_PAIRS:
+            if open_brackets and open_brackets[-1][0] == BRACKET_PAIRS[c]:
+                bracket, start, is_empty = open_brackets.pop()
+                if is_empty:
+                    issues.append(ScanIssue(EMPTY_GROUP, start, i + 1))
+            else:
+                issues.append(ScanIssue(UNBALANCED, i, i + 1))
+            if open_brackets:
+                open_brackets[-1][2] = False
+        elif c.isspace():
+            if c != " ":
+                issues.append(ScanIssue(UNKNOWN_SYMBOL, i, i + 1))
+        else:
+            if open_brackets:
+                open_brackets[-1][2] = False
+            if c in OPENING_BRACKETS:
+                open_brackets.append([c, i, True])
+            elif not (c.isalpha() or c.isnumeric()):
+                issues.append(ScanIssue(UNKNOWN_SYMBOL, i, i + 1))
+
+    for bracket, start, is_empty in open_brackets:
+        issues.append(ScanIssue(UNBALANCED, start, start + 1))
+
+    issues.sort(key=lambda issue: issue.start)
+
+    return issues
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from sandbox_math.algebra.models import Expression
+
+
+class Command(BaseCommand):
+    help = "Saves the parse of every Expression that has none, or one from an older Expression.PARSE_VERSION"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        checked_count = 0
+        updated_count = 0
+        to_update = []
+        for expression in Expression.objects.order_by("id").iterator(chunk_size=options["batch_size"]):
+            checked_count += 1
+            if Expression.update_parse(expression):
+                to_update.append(expression)
+
+            if len(to_update) >= options["batch_size"]:
+                Expression.objects.bulk_update(to_update, Expression.PARSE_FIELDS)
+                updated_count += len(to_update)
+                to_update = []
+
+        if to_update:
+            Expression.objects.bulk_update(to_update, Expression.PARSE_FIELDS)
+            updated_count += len(to_update)
+
+        self.stdout.write(f"Checked {checked_count} expressions and saved the parse of {updated_count}")
@@ -0,0 +1,191 @@
+from timeit import timeit
+
+from django.core.management.base import BaseCommand
+
+from sandbox_math.algebra.latex_parser import compile_latex, scan_expression
+from sandbox_math.algebra.models import Expression
+from sandbox_math.users.models import Mistake
+
+# Expressions like the ones students type into a step
+STUDENT_EXPRESSIONS = [
+    "2x+3",
+    "12x-4+4",
+    "3\\left(x-2\\right)+5x^{2}",
+    "\\frac{x}{2}+7",
+    "\\frac{3}{4}y-\\frac{1}{2}\\cdot x",
+]
+
+# Pieces of MathQuill output that are glued together to build expressions of different lengths
+SAMPLE_PIECES = [
+    "\\frac{3x}{4}",
+    "+2^{2}\\cdot\\left(x-1\\right)",
+    "-\\frac{\\frac{1}{2}y}{x_{1}+3}",
+    "+5x^{\\left(2\\right)}",
+    "-\\left(\\frac{7}{8}\\right)\\cdot y",
+]
+
+
+# This is the string replacement parser that Expression.parse_latex used before algebra/latex_parser.py
+# It is kept here so the new parser can be timed against it and tested for giving the same results
+def legacy_parse_latex(latex_expression):
+    if not latex_expression:
+        return ""
+
+    parsable_expression = latex_expression
+    latex_word_dict = {
+        "\\ ": "",
+        "\\cdot": "*",
+        "\\backslash": "\\",
+        "\\left(": "(",
+        "\\left\\{": "{",
+        "\\left[": "[",
+        "\\left|": "|",
+        "\\right)": ")",
+        "\\right\\}": "}",
+        "\\right]": "]",
+        "\\right|": "|",
+        "\\%": "%",
+        "\\sim": "~",
+        "^": "**",
+    }
+    for latex_word in latex_word_dict:
+        i = parsable_expression.find(latex_word)
+        while i > -1:
+            adder = 0  # If there is a variable directly after a latex word, there is a space added in
+            try:
+                if parsable_expression[i + len(latex_word)] == " ":
+                    adder = 1
+            except IndexError:
+                pass
+
+            parsable_expression = (
+                f"{parsable_expression[:i]}{latex_word_dict[latex_word]}"
+                f"{parsable_expression[i + len(latex_word) + adder:]}"
+            )
+            i = parsable_expression.find(latex_word)
+
+    # Parse \frac
+    numerator_open = parsable_expression.find("\\frac{")
+    while numerator_open > -1:
+        frac, frac_end = legacy_parse_frac(parsable_expression, numerator_open + 5)
+        parsable_expression = f"{parsable_expression[:numerator_open]}{frac}{parsable_expression[frac_end:]}"
+        numerator_open = parsable_expression.find("\\frac{")
+
+    # Parse underscores _{ } to get rid of the brackets
+    sub_open = parsable_expression.find("_{")
+    sub_close = 0
+    while sub_open > -1:
+        open_count = 1
+        for c in range(sub_open + 2, len(parsable_expression)):
+            if parsable_expression[c] == "}":
+                open_count -= 1
+            elif parsable_expression[c] == "{":
+                open_count += 1
+
+            if open_count == 0:
+                sub_close = c
+                break
+        parsable_expression = (
+            f"{parsable_expression[:sub_open + 1]}{parsable_expression[sub_open + 2:sub_close]}"
+            f"{parsable_expression[sub_close + 1:]}"
+        )
+        sub_open = parsable_expression.find("_{")
+
+    return parsable_expression
+
+
+# Only called by legacy_parse_latex
+def legacy_parse_frac(frac_str, expression_start):
+    fraction = {"numerator": "", "denominator": ""}
+    for expression in fraction:
+        expression_end = frac_str.find("}", expression_start)
+        open_count = 1
+        for c in range(expression_start + 1, len(frac_str)):
+            if frac_str[c] == "}":
+                open_count -= 1
+            elif frac_str[c] == "{":
+                open_count += 1
+
+            if open_count == 0:
+                expression_end = c
+                break
+
+        fraction[expression] = frac_str[expression_start + 1: expression_end]  # fmt: skip
+        expression_start = expression_end + 1
+
+    return f"(({fraction['numerator']})/({fraction['denominator']}))", expression_start  # fmt: skip
+
+
+# This is the loop that Expression.get_sympy_expression_from_str used to find grey boxes and unknown symbols before
+# algebra/latex_parser.py had scan_expression, kept for the same reasons as legacy_parse_latex
+def legacy_find_mistake(sympy_friendly_str):
+    feedback = Mistake.NONE
+    for i in range(0, len(sympy_friendly_str)):
+        if sympy_friendly_str[i].isalpha():
+            pass
+        elif sympy_friendly_str[i].isnumeric() or sympy_friendly_str[i] in "[]{}()-+*/. ":
+            close_index = -1
+            if sympy_friendly_str[i] == "[":
+                close_index = sympy_friendly_str.find("]", i)
+            elif sympy_friendly_str[i] == "{":
+                close_index = sympy_friendly_str.find("}", i)
+            elif sympy_friendly_str[i] == "(":
+                close_index = sympy_friendly_str.find(")", i)
+
+            if close_index > -1 and feedback == Mistake.NONE:
+                if len(sympy_friendly_str[i + 1 : close_index].strip()) == 0:  # NOQA
+                    feedback = Mistake.GREY_BOX
+        elif feedback == Mistake.NONE:
+            feedback = Mistake.UNKNOWN_SYM
+
+    return feedback
+
+
+# The mistake Expression.get_sympy_expression_from_str gets from scan_expression
+def find_mistake(sympy_friendly_str):
+    for issue in scan_expression(sympy_friendly_str):
+        if issue.kind in Expression.SCAN_MISTAKES:
+            return Expression.SCAN_MISTAKES[issue.kind]
+
+    return Mistake.NONE
+
+
+class Command(BaseCommand):
+    help = "Times algebra/latex_parser.py against the string replacement parser and mistake loop it replaced"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=2000)
+        parser.add_argument("--pieces", type=int, nargs="+", default=[5, 10, 20, 40, 80])
+
+    def handle(self, *args, **options):
+        latex_expressions = STUDENT_EXPRESSIONS + [
+            "".join(SAMPLE_PIECES[p % len(SAMPLE_PIECES)] for p in range(piece_count))
+            for piece_count in options["pieces"]
+        ]
+
+        self.stdout.write(f"{'length':>8} {'legacy (us)':>12} {'compiled (us)':>14} {'speedup':>8}")
+        for latex_expression in latex_expressions:
+            if legacy_parse_latex(latex_expression) != compile_latex(latex_expression):
+                self.stderr.write(f"Parsers disagree on {latex_expression}")
+
+            legacy_time = timeit(lambda: legacy_parse_latex(latex_expression), number=options["iterations"])
+            compiled_time = timeit(lambda: compile_latex(latex_expression), number=options["iterations"])
+            self.write_times(len(latex_expression), legacy_time, compiled_time, options["iterations"])
+
+        self.stdout.write(f"\n{'length':>8} {'legacy (us)':>12} {'scanned (us)':>14} {'speedup':>8}")
+        for latex_expression in latex_expressions:
+            sympy_friendly_str = compile_latex(latex_expression)
+            if legacy_find_mistake(sympy_friendly_str) != find_mistake(sympy_friendly_str):
+                self.stderr.write(f"Scanners disagree on {sympy_friendly_str}")
+
+            legacy_time = timeit(lambda: legacy_find_mistake(sympy_friendly_str), number=options["iterations"])
+            scanned_time = timeit(lambda: find_mistake(sympy_friendly_str), number=options["iterations"])
+            self.write_times(len(sympy_friendly_str), legacy_time, scanned_time, options["iterations"])
+
+    def write_times(self, length, legacy_time, new_time, iterations):
+        self.stdout.write(
+            f"{length:>8} "
+            f"{legacy_time / iterations * 1e6:>12.1f} "
+            f"{new_time / iterations * 1e6:>14.1f} "
+            f"{legacy_time / new_time:>7.1f}x"
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.9 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("algebra", "0016_alter_step_problem"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="expression",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="expression",
+            name="parse_mistake",
+            field=models.CharField(blank=True, default="", max_length=30),
+        ),
+        migrations.AddField(
+            model_name="expression",
+            name="sympy_srepr",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddField(
+            model_name="expression",
+            name="variables",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
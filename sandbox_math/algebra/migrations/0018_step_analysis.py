@@ -0,0 +1,30 @@
+# Generated by Django 4.1.9 on 2026-10-18 09:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("algebra", "0017_expression_parse"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StepAnalysis",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("analyzer_version", models.PositiveSmallIntegerField(default=1)),
+                ("inputs_hash", models.CharField(max_length=64)),
+                ("left_mistake", models.CharField(max_length=30)),
+                ("right_mistake", models.CharField(max_length=30)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                (
+                    "step",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="analysis", to="algebra.step"
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.9 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+# Numbers every problem's steps 1, 2, 3, ... in the order they were created
+def set_positions(apps, schema_editor):
+    Step = apps.get_model("algebra", "Step")
+    steps_to_update = []
+    problem_id = None
+    position = 0
+    for step in Step.objects.order_by("problem_id", "created", "id").only("id", "problem_id").iterator():
+        if step.problem_id != problem_id:
+            problem_id = step.problem_id
+            position = 0
+        position += 1
+        step.position = position
+        steps_to_update.append(step)
+
+        if len(steps_to_update) >= 1000:
+            Step.objects.bulk_update(steps_to_update, ["position"])
+            steps_to_update = []
+
+    Step.objects.bulk_update(steps_to_update, ["position"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("algebra", "0018_step_analysis"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="step",
+            name="position",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(set_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="step",
+            index=models.Index(fields=["problem", "position"], name="algebra_ste_problem_ea9a61_idx"),
+        ),
+    ]
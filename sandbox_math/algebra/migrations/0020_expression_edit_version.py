@@ -0,0 +1,17 @@
+# Generated by Django 4.1.9 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("algebra", "0019_step_position"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="expression",
+            name="edit_version",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
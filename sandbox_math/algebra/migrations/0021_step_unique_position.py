@@ -0,0 +1,31 @@
+# Generated by Django 4.1.9 on 2026-10-18 10:42
+
+from importlib import import_module
+
+import django.db.models.constraints
+from django.db import migrations, models
+
+# Steps added at the same time before this could share a position, so every problem's steps are numbered again first
+set_positions = import_module("sandbox_math.algebra.migrations.0019_step_position").set_positions
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("algebra", "0020_expression_edit_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(set_positions, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="step",
+            name="algebra_ste_problem_ea9a61_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="step",
+            constraint=models.UniqueConstraint(
+                deferrable=django.db.models.constraints.Deferrable["DEFERRED"],
+                fields=("problem", "position"),
+                name="algebra_step_unique_position",
+            ),
+        ),
+    ]
@@ -1,21 +1,33 @@
+import ast
+import json
+import re
 from datetime import datetime, timedelta
 from decimal import Decimal
+from hashlib import sha256
 
+import sympy
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import models, transaction
 
 # from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Case, Count, OuterRef, Q, Subquery, When
+from django.db.models import Case, Count, F, Max, OuterRef, Q, Subquery, When
 from django.utils import timezone
-from sympy import UnevaluatedExpr, latex, simplify
+from sympy import UnevaluatedExpr, latex, simplify, srepr
 from sympy.core import symbol
-from sympy.parsing.sympy_parser import implicit_multiplication_application, parse_expr, standard_transformations
+from sympy.core.parameters import evaluate
 from sympy.solvers import solve
 
 from config.settings.base import AUTH_USER_MODEL
+from sandbox_math.algebra.equivalence import are_equivalent
+from sandbox_math.algebra.latex_parser import EMPTY_GROUP, UNKNOWN_SYMBOL, compile_latex, scan_expression
+from sandbox_math.algebra.sympy_tasks import parse_to_srepr
 from sandbox_math.calculator.models import Content, Response
 from sandbox_math.sandbox.models import CheckAlgebra, Sandbox
-from sandbox_math.users.models import HelpClick, Mistake, Proceed, User
+from sandbox_math.users.mistake_catalog import ParseMistake
+from sandbox_math.users.models import Mistake, Proceed, User
+from sandbox_math.utils.cache import MISSING, LRUCache
+from sandbox_math.utils.sympy_pool import SympyTimeout, run_sympy
 
 
 # Create your models here.
@@ -64,12 +76,63 @@ class Problem(models.Model):
             problem.variable = None
             problem.save()
 
+    # A new problem for student_id with problem's variable and copies of steps, which have to be the first steps of
+    # problem, in order, with their expressions and analysis loaded like get_steps_to_analyze does
+    # The copies keep the parse of each expression and the analysis of each step, so nothing is parsed or checked
+    # again. However many steps there are, this is one insert for the problem and one each for the expressions, the
+    # steps and the analyses.
+    @classmethod
+    def copy_for_student(cls, problem, student_id, steps):
+        new_problem = Problem(student_id=student_id, variable=problem.variable, last_viewed=timezone.now())
+        new_problem.save()
+
+        new_expressions = []
+        for step in steps:
+            for expression in [step.left_expr, step.right_expr]:
+                new_expressions.append(
+                    Expression(
+                        latex=expression.latex,
+                        **{field: getattr(expression, field) for field in Expression.PARSE_FIELDS},
+                    )
+                )
+        Expression.objects.bulk_create(new_expressions)
+
+        new_steps = []
+        for position, step in enumerate(steps, start=1):
+            new_steps.append(
+                Step(
+                    problem=new_problem,
+                    position=position,
+                    step_type=step.step_type,
+                    left_expr=new_expressions[2 * position - 2],
+                    right_expr=new_expressions[2 * position - 1],
+                )
+            )
+        Step.objects.bulk_create(new_steps)
+
+        new_analyses = []
+        for step, new_step in zip(steps, new_steps):
+            analysis = StepAnalysis.get_for_step(step)
+            if analysis is not None:
+                new_analyses.append(
+                    StepAnalysis(
+                        step=new_step,
+                        analyzer_version=analysis.analyzer_version,
+                        inputs_hash=analysis.inputs_hash,
+                        left_mistake=analysis.left_mistake,
+                        right_mistake=analysis.right_mistake,
+                    )
+                )
+        StepAnalysis.objects.bulk_create(new_analyses)
+
+        return new_problem
+
     # This method is called by the RecentProblemsListView in algebra/views
     # It returns a queryset with columns:
     # link, start date, last viewed, equation, step count, solved/unsolved status
     @classmethod
     def populate_recent_table(cls, student_id, table_filter):
-        step_qs = Step.objects.filter(problem=OuterRef("pk")).order_by("created")
+        step_qs = Step.objects.filter(problem=OuterRef("pk")).order_by("position")
 
         and_filter = Q()
         if table_filter["status"]:
@@ -134,14 +197,14 @@ class Problem(models.Model):
         has_variables = [False, False]
 
         for s in range(0, 2):
-            this_latex = this_step.left_expr.latex
+            this_expr = this_step.left_expr
             if s == 1:
-                this_latex = this_step.right_expr.latex
-            if this_latex:
-                sympy_expr = Expression.get_sympy_expression_from_latex(this_latex)
+                this_expr = this_step.right_expr
+            if this_expr.latex:
+                sympy_expr = Expression.get_sympy_expression(this_expr)
 
-                if sympy_expr not in list(zip(*Mistake.MISTAKE_TYPES))[0]:
-                    if Expression.get_variables_in_latex_expression(this_latex):
+                if not isinstance(sympy_expr, ParseMistake):
+                    if Expression.get_variables(this_expr):
                         has_variables[s] = True
                 else:
                     mistakes[s] = sympy_expr
@@ -154,11 +217,9 @@ class Problem(models.Model):
                 mistakes[1] = Mistake.NO_VAR
             elif has_variables[0] or has_variables[1]:
                 if this_step.problem.variable:
-                    if this_step.problem.variable not in Expression.get_variables_in_latex_expression(
-                        this_step.left_expr.latex
-                    ) and this_step.problem.variable not in Expression.get_variables_in_latex_expression(
-                        this_step.right_expr.latex
-                    ):
+                    if this_step.problem.variable not in Expression.get_variables(
+                        this_step.left_expr
+                    ) and this_step.problem.variable not in Expression.get_variables(this_step.right_expr):
                         mistakes[0] = Mistake.VAR_NOT_IN_EQUATION  # fmt: skip
                         mistakes[1] = Mistake.VAR_NOT_IN_EQUATION  # fmt: skip
 
@@ -174,15 +235,16 @@ class Problem(models.Model):
 
         # STEP 1: Is the new expression on each side a recognizable math expression?
         for s in range(0, 2):
-            this_latex = this_step.left_expr.latex
+            this_expr = this_step.left_expr
             prev_latex = prev_step.left_expr.latex
             if s == 1:
-                this_latex = this_step.right_expr.latex
+                this_expr = this_step.right_expr
                 prev_latex = prev_step.right_expr.latex
+            this_latex = this_expr.latex
             if this_latex:
                 prev_latex_index[s] = this_latex.find(prev_latex)
-                sympy_expr = Expression.get_sympy_expression_from_latex(this_latex)
-                if sympy_expr in list(zip(*Mistake.MISTAKE_TYPES))[0]:
+                sympy_expr = Expression.get_sympy_expression(this_expr)
+                if isinstance(sympy_expr, ParseMistake):
                     mistakes[s] = sympy_expr
             else:
                 mistakes[s] = Mistake.BLANK_EXPR
@@ -190,11 +252,12 @@ class Problem(models.Model):
         # STEP 2: Is the previous expression on each side in the current expression on the same side?
         if mistakes[0] == mistakes[1] == Mistake.NONE:
             for s in range(0, 2):
-                this_latex = this_step.left_expr.latex
+                this_expr = this_step.left_expr
                 prev_latex = prev_step.left_expr.latex
                 if s == 1:
-                    this_latex = this_step.right_expr.latex
+                    this_expr = this_step.right_expr
                     prev_latex = prev_step.right_expr.latex
+                this_latex = this_expr.latex
                 includes_prev_expression = True
                 if prev_latex_index[s] < 0:
                     includes_prev_expression = False
@@ -229,10 +292,13 @@ class Problem(models.Model):
                     sympy_this_with_parens_around_prev = Expression.get_sympy_expression_from_latex(
                         latex_this_with_parens_around_prev
                     )
-                    if sympy_this_with_parens_around_prev not in list(zip(*Mistake.MISTAKE_TYPES))[0]:
-                        this_sympy = Expression.get_sympy_expression_from_latex(this_latex)
-                        if simplify(this_sympy - sympy_this_with_parens_around_prev) != 0:
-                            mistakes[s] = Mistake.MISSING_PARENS
+                    if not isinstance(sympy_this_with_parens_around_prev, ParseMistake):
+                        this_sympy = Expression.get_sympy_expression(this_expr)
+                        try:
+                            if not are_equivalent(this_sympy, sympy_this_with_parens_around_prev):
+                                mistakes[s] = Mistake.MISSING_PARENS
+                        except SympyTimeout:
+                            mistakes[s] = Mistake.TIMEOUT
                     else:
                         print(latex_this_with_parens_around_prev)
                         mistakes[s] = sympy_this_with_parens_around_prev
@@ -242,12 +308,12 @@ class Problem(models.Model):
         # To see if this is the same, we would check if 12x - 4 + 4 == 12x - 4 + 16/4 AND if 32 + 16/4 == 32 + 4
         if mistakes[0] == mistakes[1] == Mistake.NONE:
             for s in range(0, 2):
-                this_latex = this_step.left_expr.latex
+                this_expr = this_step.left_expr
                 prev_latex = prev_step.left_expr.latex
                 other_side_latex = this_step.right_expr.latex
                 other_side_prev_latex = prev_step.right_expr.latex
                 if s == 1:
-                    this_latex = this_step.right_expr.latex
+                    this_expr = this_step.right_expr
                     prev_latex = prev_step.right_expr.latex
                     other_side_latex = this_step.left_expr.latex
                     other_side_prev_latex = prev_step.left_expr.latex
@@ -258,10 +324,13 @@ class Problem(models.Model):
                     f"{other_side_latex[prev_latex_index[(s + 1) % 2] + len(other_side_prev_latex):]}"
                 )
                 sympy_this_in_other_side = Expression.get_sympy_expression_from_latex(latex_this_in_other_side)
-                if sympy_this_in_other_side not in list(zip(*Mistake.MISTAKE_TYPES))[0]:
-                    this_sympy = Expression.get_sympy_expression_from_latex(this_latex)
-                    if simplify(this_sympy - sympy_this_in_other_side) != 0:
-                        mistakes[s] = Mistake.UNEQUAL_ARITHMETIC
+                if not isinstance(sympy_this_in_other_side, ParseMistake):
+                    this_sympy = Expression.get_sympy_expression(this_expr)
+                    try:
+                        if not are_equivalent(this_sympy, sympy_this_in_other_side):
+                            mistakes[s] = Mistake.UNEQUAL_ARITHMETIC
+                    except SympyTimeout:
+                        mistakes[s] = Mistake.TIMEOUT
                 else:
                     print("should I do something here in check_arithmetic?")
                     # side_dict["feedback"] = feedback
@@ -276,76 +345,122 @@ class Problem(models.Model):
         mistakes = [Mistake.NONE, Mistake.NONE]
 
         for s in range(0, 2):
-            this_latex = this_step.left_expr.latex
-            prev_latex = prev_step.left_expr.latex
+            this_expr = this_step.left_expr
+            prev_expr = prev_step.left_expr
             if s == 1:
-                this_latex = this_step.right_expr.latex
-                prev_latex = prev_step.right_expr.latex
-            if not prev_latex:
+                this_expr = this_step.right_expr
+                prev_expr = prev_step.right_expr
+            if not prev_expr.latex:
                 mistakes[s] = Mistake.CANNOT_REWRITE
-            elif this_latex:
-                sympy_prev = Expression.get_sympy_expression_from_latex(prev_latex)
-                sympy_this = Expression.get_sympy_expression_from_latex(this_latex)
-
-                all_mistake_types = list(zip(*Mistake.MISTAKE_TYPES))[0]
-                if sympy_prev not in all_mistake_types and sympy_this not in all_mistake_types:
-                    if simplify(sympy_this - sympy_prev) == 0:
-                        mistakes[s] = Mistake.NONE
-                    else:
-                        mistakes[s] = Mistake.REWRITE
+            elif this_expr.latex:
+                sympy_prev = Expression.get_sympy_expression(prev_expr)
+                sympy_this = Expression.get_sympy_expression(this_expr)
+
+                if not isinstance(sympy_prev, ParseMistake) and not isinstance(sympy_this, ParseMistake):
+                    try:
+                        if are_equivalent(sympy_this, sympy_prev):
+                            mistakes[s] = Mistake.NONE
+                        else:
+                            mistakes[s] = Mistake.REWRITE
+                    except SympyTimeout:
+                        mistakes[s] = Mistake.TIMEOUT
                 else:
-                    if sympy_prev in all_mistake_types:
+                    if isinstance(sympy_prev, ParseMistake):
                         mistakes[s] = Mistake.CANNOT_REWRITE
-                    elif sympy_this in all_mistake_types:
+                    elif isinstance(sympy_this, ParseMistake):
                         mistakes[s] = sympy_this
             else:
                 mistakes[s] = Mistake.BLANK_EXPR
 
         return mistakes
 
+    # This finds the mistakes in every step of the problem without writing anything to the database
+    # It returns a list of (step, [left mistake, right mistake], StepAnalysis to save or None), in order
+    # Steps and their saved StepAnalysis are loaded in one query, unless steps from get_steps_to_analyze are passed in,
+    # and only the steps that changed since their analysis was saved are checked again. Editing one expression checks
+    # that step and the one after it instead of every step in the problem.
     @classmethod
-    def get_all_steps_mistakes(cls, problem):
-        mistakes = {}
+    def analyze_steps(cls, problem, steps=None):
+        if steps is None:
+            steps = Problem.get_steps_to_analyze(problem)
+        step_analyses = []
+        prev_step = None
+        for step in steps:
+            step.problem = problem
+            mistakes, new_analysis = Step.get_analyzed_mistakes(step, prev_step)
+            step_analyses.append((step, mistakes, new_analysis))
+            prev_step = step
+
+        return step_analyses
+
+    # The problem's steps in order, with what analyze_steps needs already loaded
+    @classmethod
+    def get_steps_to_analyze(cls, problem):
+        return list(
+            Step.objects.filter(problem=problem)
+            .select_related("left_expr", "right_expr", "analysis")
+            .order_by("position")
+        )
+
+    # This saves what analyze_steps found and marks the mistakes it shows were fixed
+    # Views that change a problem call this once, through ProblemSnapshot.reconcile. Pages and anything else that only
+    # reads a problem never write, so they don't need it.
+    @classmethod
+    def reconcile_mistakes(cls, problem, step_analyses):
+        StepAnalysis.save_all([new_analysis for step, mistakes, new_analysis in step_analyses if new_analysis])
+
+        fixed_expression_ids = []
         has_mistakes = False
-        for step in Step.objects.filter(problem=problem):
-            mistakes[step.id] = [{"title": "", "content": ""}, {"title": "", "content": ""}]
-            mistake_titles = Step.get_mistakes(step)
-            mistakes[step.id][0]["title"] = mistake_titles[0]
-            if mistake_titles[0] != Mistake.NONE or mistake_titles[1] != Mistake.NONE:
-                has_mistakes = True
-            mistakes[step.id][1]["title"] = mistake_titles[1]
-            for m in Mistake.MISTAKE_TYPES:
-                if m[0] == mistake_titles[0]:
-                    mistakes[step.id][0]["content"] = m[1]
-                if m[0] == mistake_titles[1]:
-                    mistakes[step.id][1]["content"] = m[1]
+        for step, mistakes, new_analysis in step_analyses:
+            for expression_id, mistake in zip([step.left_expr_id, step.right_expr_id], mistakes):
+                if mistake == Mistake.NONE:
+                    fixed_expression_ids.append(expression_id)
+                else:
+                    has_mistakes = True
 
+        Mistake.fix_help_clicks(problem.student_id, fixed_expression_ids)
         if not has_mistakes:
-            proceed_mistakes = Proceed.objects.filter(problem_id=problem.id, proceed_type=Proceed.ADD_STEP)
-            Mistake.objects.filter(mistake_event_type=Mistake.PROCEED, event_id__in=proceed_mistakes).update(
-                is_fixed=True
-            )
+            Mistake.fix_proceeds(problem.id, Proceed.ADD_STEP)
+
+    # This returns {step id: [left mistake, right mistake]} for every step in the problem, in order
+    # step_analyses is what analyze_steps returned, if it has already been called
+    @classmethod
+    def get_all_steps_mistake_titles(cls, problem, step_analyses=None):
+        if step_analyses is None:
+            step_analyses = Problem.analyze_steps(problem)
+
+        return {step.id: mistakes for step, mistakes, new_analysis in step_analyses}
+
+    @classmethod
+    def get_all_steps_mistakes(cls, problem, step_analyses=None):
+        mistakes = {}
+        for step_id, mistake_titles in Problem.get_all_steps_mistake_titles(problem, step_analyses).items():
+            mistakes[step_id] = [{"title": "", "content": ""}, {"title": "", "content": ""}]
+            mistakes[step_id][0]["title"] = mistake_titles[0]
+            mistakes[step_id][1]["title"] = mistake_titles[1]
+            mistakes[step_id][0]["content"] = Mistake.CATALOG.get_message(mistake_titles[0], "")
+            mistakes[step_id][1]["content"] = Mistake.CATALOG.get_message(mistake_titles[1], "")
 
         return mistakes
 
+    # last_step and all_mistake_titles (from get_all_steps_mistake_titles) are looked up if they aren't passed in
     @classmethod
-    def variable_isolated_side(cls, problem):
-        last_step = Step.objects.filter(problem=problem).order_by("created").last()
+    def variable_isolated_side(cls, problem, last_step=None, all_mistake_titles=None):
+        if last_step is None:
+            last_step = Step.objects.filter(problem=problem).order_by("position").last()
         if last_step.left_expr.latex == problem.variable:
-            if last_step.left_expr.latex not in Expression.get_variables_in_latex_expression(
-                last_step.right_expr.latex
-            ):
+            if last_step.left_expr.latex not in Expression.get_variables(last_step.right_expr):
                 return "right"
             else:
-                for m in Problem.get_all_steps_mistakes(problem).items():
-                    if m[1][0]["title"] != Mistake.NONE or m[1][1]["title"] != Mistake.NONE:
+                if all_mistake_titles is None:
+                    all_mistake_titles = Problem.get_all_steps_mistake_titles(problem)
+                for mistake_titles in all_mistake_titles.values():
+                    if mistake_titles[0] != Mistake.NONE or mistake_titles[1] != Mistake.NONE:
                         return None
                 if last_step.right_expr.latex == problem.variable:
                     return CheckSolution.INFINITELY_MANY
         elif last_step.right_expr.latex == problem.variable:
-            if last_step.right_expr.latex not in Expression.get_variables_in_latex_expression(
-                last_step.left_expr.latex
-            ):
+            if last_step.right_expr.latex not in Expression.get_variables(last_step.left_expr):
                 return "left"
         else:
             if last_step.right_expr.latex.isnumeric() and last_step.left_expr.latex.isnumeric():
@@ -354,10 +469,6 @@ class Problem(models.Model):
                 else:
                     return CheckSolution.NO_SOLUTION
 
-            for m in Problem.get_all_steps_mistakes(problem).items():
-                if m[1][0]["title"] != Mistake.NONE or m[1][1]["title"] != Mistake.NONE:
-                    return None
-
         return None
 
     @classmethod
@@ -371,7 +482,7 @@ class Problem(models.Model):
 
         problems_per_date = {}
         for p in recent_problems:
-            first_step = Step.objects.filter(problem_id=p.id).order_by("created").first()
+            first_step = Step.objects.filter(problem_id=p.id).order_by("position").first()
             date_string = first_step.created.strftime('"%b %-d, %Y"')
             mistakes = Step.get_mistakes(first_step)
             if mistakes[0] == Mistake.NONE and mistakes[1] == Mistake.NONE:
@@ -388,146 +499,233 @@ class Problem(models.Model):
 # Expressions cannot have underscores
 # Expressions cannot have functions other than arithmetic and exponents (no sqrt or trig)
 class Expression(models.Model):
+    # Bump this whenever parse_latex or get_sympy_expression_from_str change what they return for the same latex
+    # Every saved parse then has a stale content_hash, and gets parsed again until backfill_expression_parse is run
+    PARSE_VERSION = 1
+    PARSE_FIELDS = ["sympy_srepr", "variables", "parse_mistake", "content_hash"]
+
     latex = models.CharField(max_length=100, blank=True, null=False, default="")
+    # The parse of latex is saved with it, so steps that have not changed are never parsed again
+    sympy_srepr = models.TextField(blank=True, null=False, default="")
+    variables = models.JSONField(blank=True, null=False, default=list)
+    parse_mistake = models.CharField(max_length=30, blank=True, null=False, default="")
+    content_hash = models.CharField(max_length=64, blank=True, null=False, default="")
+    # The version the page gave the last edit saved with save_edit, so edits that arrive late can be dropped
+    edit_version = models.BigIntegerField(default=0)
+
+    # The mistake for each kind of issue scan_expression finds, if parse_expr could still parse the expression
+    SCAN_MISTAKES = {EMPTY_GROUP: Mistake.GREY_BOX, UNKNOWN_SYMBOL: Mistake.UNKNOWN_SYM}
+
+    sympy_cache = LRUCache(settings.ALGEBRA_PARSE_CACHE_SIZE)
+    # The pieces of a srepr string load_srepr builds, which are all that parse_to_srepr makes of an algebra expression
+    # MathQuill wraps exponents in braces, and parse_expr reads those as a FiniteSet
+    SREPR_OPERATIONS = {
+        "Add": sympy.Add,
+        "Mul": sympy.Mul,
+        "Pow": sympy.Pow,
+        "UnevaluatedExpr": UnevaluatedExpr,
+        "FiniteSet": sympy.FiniteSet,
+    }
+    SREPR_CONSTANTS = {"E": sympy.E, "I": sympy.I, "pi": sympy.pi}
+    # A letter, with a subscript if it has one, like x or x_12
+    SYMBOL_NAME_PATTERN = re.compile(r"[A-Za-z](_[A-Za-z0-9_]+)?", re.ASCII)
+    FLOAT_PATTERN = re.compile(r"-?[0-9]+(\.[0-9]*)?(e[-+]?[0-9]+)?", re.ASCII)
+
+    def save(self, *args, **kwargs):
+        if Expression.update_parse(self) and kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | set(Expression.PARSE_FIELDS)
+        super().save(*args, **kwargs)
 
-    # This method takes a latex expression and converts it into a human-readable string that SymPy can use
-    # Only called by the get_sympy_expression_from_latex
     @classmethod
-    def parse_latex(cls, latex_expression):
-        if not latex_expression:
-            return ""
-
-        parsable_expression = latex_expression
-        latex_word_dict = {
-            "\\ ": "",
-            "\\cdot": "*",
-            "\\backslash": "\\",
-            "\\left(": "(",
-            "\\left\\{": "{",
-            "\\left[": "[",
-            "\\left|": "|",
-            "\\right)": ")",
-            "\\right\\}": "}",
-            "\\right]": "]",
-            "\\right|": "|",
-            "\\%": "%",
-            "\\sim": "~",
-            "^": "**",
-        }
-        for latex_word in latex_word_dict:
-            i = parsable_expression.find(latex_word)
-            while i > -1:
-                adder = 0  # If there is a variable directly after a latex word, there is a space added in
-                try:
-                    if parsable_expression[i + len(latex_word)] == " ":
-                        adder = 1
-                except IndexError:
-                    pass
-
-                parsable_expression = (
-                    f"{parsable_expression[:i]}{latex_word_dict[latex_word]}"
-                    f"{parsable_expression[i + len(latex_word) + adder:]}"
-                )
-                i = parsable_expression.find(latex_word)
-
-        # Parse \frac
-        numerator_open = parsable_expression.find("\\frac{")
-        while numerator_open > -1:
-            frac, frac_end = Expression.parse_frac(parsable_expression, numerator_open + 5)
-            parsable_expression = f"{parsable_expression[:numerator_open]}{frac}{parsable_expression[frac_end:]}"
-            numerator_open = parsable_expression.find("\\frac{")
-
-        # Parse underscores _{ } to get rid of the brackets
-        # Parsing underscores is tricky because you don't know how to interpret xy_f
-        # is it x(y_f) or is it (xy_f)? Until i can figure this out...no underscores are allowed
-        # i need to wrap these underscores in parentheses because subscripts with only 1 character do not get brackets
-        # so i need x_1y_1 to be (x_1)(y_1) so sympy interprets properly. But if i can't tell how long the base is...
-        # i don't know where to put the starting parentheses
-        sub_open = parsable_expression.find("_{")
-        sub_close = 0
-        while sub_open > -1:
-            open_count = 1
-            for c in range(sub_open + 2, len(parsable_expression)):
-                if parsable_expression[c] == "}":
-                    open_count -= 1
-                elif parsable_expression[c] == "{":
-                    open_count += 1
-
-                if open_count == 0:
-                    sub_close = c
-                    break
-            parsable_expression = (
-                f"{parsable_expression[:sub_open + 1]}{parsable_expression[sub_open + 2:sub_close]}"
-                f"{parsable_expression[sub_close + 1:]}"
+    def get_content_hash(cls, latex_expr):
+        return sha256(f"{Expression.PARSE_VERSION}:{latex_expr}".encode()).hexdigest()
+
+    @classmethod
+    def has_current_parse(cls, expression):
+        return expression.content_hash == Expression.get_content_hash(expression.latex)
+
+    # This fills in the parse fields from latex if they were saved for different latex or an older PARSE_VERSION
+    # Returns True if any of them changed
+    @classmethod
+    def update_parse(cls, expression):
+        if Expression.has_current_parse(expression):
+            return False
+
+        sympy_expr = Expression.get_sympy_expression_from_latex(expression.latex)
+        if isinstance(sympy_expr, ParseMistake) and sympy_expr == Mistake.TIMEOUT:
+            # Running out of time doesn't say anything about the expression, so it will be parsed again next time
+            return False
+        elif isinstance(sympy_expr, ParseMistake):
+            expression.sympy_srepr = ""
+            expression.variables = []
+            expression.parse_mistake = sympy_expr
+        else:
+            expression.sympy_srepr = srepr(sympy_expr, order="none")
+            expression.variables = sorted(set(Expression.get_variables_in_sympy_expression(sympy_expr)))
+            expression.parse_mistake = ""
+        expression.content_hash = Expression.get_content_hash(expression.latex)
+
+        return True
+
+    # Saves latex_expr as edit number version of the expression, without parsing it
+    # Returns False if a later edit was saved first. This is one UPDATE, so two edits saved at the same time can't both
+    # win.
+    @classmethod
+    def save_edit(cls, expression, latex_expr, version):
+        return (
+            Expression.objects.filter(id=expression.id, edit_version__lt=version).update(
+                latex=latex_expr, edit_version=version
             )
-            sub_open = parsable_expression.find("_{")
+            == 1
+        )
 
-        return parsable_expression
+    # The same as save_edit, for async views
+    @classmethod
+    async def asave_edit(cls, expression, latex_expr, version):
+        return (
+            await Expression.objects.filter(id=expression.id, edit_version__lt=version).aupdate(
+                latex=latex_expr, edit_version=version
+            )
+            == 1
+        )
 
-    # Only called by parse_latex method
+    # Same as get_sympy_expression_from_latex(expression.latex), but it loads the saved parse instead of parsing again
     @classmethod
-    def parse_frac(cls, frac_str, expression_start):
-        fraction = {"numerator": "", "denominator": ""}
-        for expression in fraction:
-            expression_end = frac_str.find("}", expression_start)
-            open_count = 1
-            for c in range(expression_start + 1, len(frac_str)):
-                if frac_str[c] == "}":
-                    open_count -= 1
-                elif frac_str[c] == "{":
-                    open_count += 1
-
-                if open_count == 0:
-                    expression_end = c
-                    break
+    def get_sympy_expression(cls, expression):
+        if not Expression.has_current_parse(expression):
+            return Expression.get_sympy_expression_from_latex(expression.latex)
+        if expression.parse_mistake:
+            return ParseMistake(expression.parse_mistake)
+
+        cache_key = ("srepr", expression.content_hash)
+        sympy_expr = Expression.sympy_cache.get(cache_key)
+        if sympy_expr is MISSING:
+            try:
+                sympy_expr = Expression.load_srepr(expression.sympy_srepr)
+            except ValueError:
+                # The saved parse isn't a srepr string, so it isn't trusted and the latex is parsed again
+                return Expression.get_sympy_expression_from_latex(expression.latex)
+            Expression.sympy_cache.set(cache_key, sympy_expr)
+
+        return sympy_expr
+
+    # This turns srepr(sympy_expr, order="none") back into sympy_expr
+    # order="none" keeps the terms in the order they were typed, and building is done with evaluate(False), so the
+    # expression comes back exactly as parse_expr made it
+    # The string comes from the database, so it is never run. Its syntax tree is walked and only the pieces in
+    # SREPR_OPERATIONS and SREPR_CONSTANTS are built, and a ValueError is raised for anything else.
+    @classmethod
+    def load_srepr(cls, sympy_srepr):
+        try:
+            tree = ast.parse(sympy_srepr, mode="eval")
+            with evaluate(False):
+                return Expression.build_srepr_node(tree.body)
+        except (SyntaxError, TypeError, ValueError, RecursionError) as e:
+            raise ValueError(f"Not a srepr string: {sympy_srepr!r}") from e
 
-            fraction[expression] = frac_str[expression_start + 1: expression_end]  # fmt: skip
-            expression_start = expression_end + 1
+    # Only called by load_srepr
+    @classmethod
+    def build_srepr_node(cls, node):
+        if isinstance(node, ast.Name) and node.id in Expression.SREPR_CONSTANTS:
+            return Expression.SREPR_CONSTANTS[node.id]
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+            raise ValueError(f"Not a srepr call: {ast.dump(node)}")
+
+        name = node.func.id
+        args = node.args
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+        if name in Expression.SREPR_OPERATIONS and not keywords:
+            return Expression.SREPR_OPERATIONS[name](*[Expression.build_srepr_node(arg) for arg in args])
+        elif name == "Symbol" and len(args) == 1 and not keywords:
+            symbol_name = Expression.get_srepr_literal(args[0], str)
+            if Expression.SYMBOL_NAME_PATTERN.fullmatch(symbol_name):
+                return sympy.Symbol(symbol_name)
+        elif name == "Integer" and len(args) == 1 and not keywords:
+            return sympy.Integer(Expression.get_srepr_literal(args[0], int))
+        elif name == "Rational" and len(args) == 2 and not keywords:
+            return sympy.Rational(*[Expression.get_srepr_literal(arg, int) for arg in args])
+        elif name == "Float" and len(args) == 1 and set(keywords) <= {"precision"}:
+            float_str = Expression.get_srepr_literal(args[0], str)
+            if Expression.FLOAT_PATTERN.fullmatch(float_str):
+                if "precision" in keywords:
+                    return sympy.Float(float_str, precision=Expression.get_srepr_literal(keywords["precision"], int))
+                return sympy.Float(float_str)
+
+        raise ValueError(f"Not a srepr call: {ast.dump(node)}")
+
+    # A number or string written out in a srepr string, like the -3 in Integer(-3)
+    # Only called by build_srepr_node
+    @classmethod
+    def get_srepr_literal(cls, node, literal_type):
+        sign = 1
+        if literal_type is int and isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            sign = -1
+            node = node.operand
+        # bool is a kind of int, but True is never written out for a number
+        if not (isinstance(node, ast.Constant) and type(node.value) is literal_type):
+            raise ValueError(f"Not a {literal_type.__name__}: {ast.dump(node)}")
+
+        return sign * node.value if literal_type is int else node.value
+
+    # Same as get_variables_in_latex_expression(expression.latex), but it uses the saved variables
+    @classmethod
+    def get_variables(cls, expression):
+        if not Expression.has_current_parse(expression):
+            return Expression.get_variables_in_latex_expression(expression.latex)
+
+        return list(expression.variables)
 
-        return f"(({fraction['numerator']})/({fraction['denominator']}))", expression_start  # fmt: skip
+    # This method takes a latex expression and converts it into a human-readable string that SymPy can use
+    # Only called by the get_sympy_expression_from_latex
+    # See algebra/latex_parser.py for how \frac and subscripts are handled
+    @classmethod
+    def parse_latex(cls, latex_expression):
+        return compile_latex(latex_expression)
 
     # This method converts a latex expression into it's equivalent SymPy expression
     # If it is not a valid math expression, then it will return a mistake from users/models.py Mistake
+    # Results are kept in sympy_cache, keyed by the SymPy-friendly string, because the same expressions get parsed
+    # over and over while mistakes are found. SymPy expressions can't be changed, so it is safe to share them.
     @classmethod
     def get_sympy_expression_from_latex(cls, latex_expr):
         sympy_friendly_str = Expression.parse_latex(latex_expr)
 
+        sympy_expr = Expression.sympy_cache.get(sympy_friendly_str)
+        if sympy_expr is MISSING:
+            sympy_expr = Expression.get_sympy_expression_from_str(sympy_friendly_str)
+            if not (isinstance(sympy_expr, ParseMistake) and sympy_expr == Mistake.TIMEOUT):
+                Expression.sympy_cache.set(sympy_friendly_str, sympy_expr)
+
+        return sympy_expr
+
+    # Only called by get_sympy_expression_from_latex
+    @classmethod
+    def get_sympy_expression_from_str(cls, sympy_friendly_str):
         feedback = Mistake.NONE
         try:
-            sympy_expr = parse_expr(
-                sympy_friendly_str,
-                None,
-                transformations=standard_transformations + (implicit_multiplication_application,),
-                evaluate=False,
-            )
-        except (SyntaxError, TypeError, NameError, IndexError):
-            sympy_expr = None
+            sympy_srepr = run_sympy(parse_to_srepr, sympy_friendly_str)
+        except SympyTimeout:
+            return ParseMistake(Mistake.TIMEOUT)
+
+        sympy_expr = None
+        if sympy_srepr is not None:
+            try:
+                sympy_expr = Expression.load_srepr(sympy_srepr)
+            except ValueError:
+                pass
 
         if sympy_expr is None:
             feedback = Mistake.NON_MATH
         else:
-            for i in range(0, len(sympy_friendly_str)):
-                if sympy_friendly_str[i].isalpha():
-                    pass
-                elif sympy_friendly_str[i].isnumeric() or sympy_friendly_str[i] in "[]{}()-+*/. ":
-                    close_index = -1
-                    if sympy_friendly_str[i] == "[":
-                        close_index = sympy_friendly_str.find("]", i)
-                    elif sympy_friendly_str[i] == "{":
-                        close_index = sympy_friendly_str.find("}", i)
-                    elif sympy_friendly_str[i] == "(":
-                        close_index = sympy_friendly_str.find(")", i)
-
-                    if close_index > -1 and feedback == Mistake.NONE:
-                        if len(sympy_friendly_str[i + 1 : close_index].strip()) == 0:  # NOQA
-                            feedback = Mistake.GREY_BOX
-                elif feedback == Mistake.NONE:
-                    feedback = Mistake.UNKNOWN_SYM
+            for issue in scan_expression(sympy_friendly_str):
+                if issue.kind in Expression.SCAN_MISTAKES:
+                    feedback = Expression.SCAN_MISTAKES[issue.kind]
+                    break
 
         if feedback == Mistake.NONE:
             return sympy_expr
         else:
-            return feedback
+            return ParseMistake(feedback)
 
     # This is only used by the method get_variables_in_latex_expression
     # This is a recursive function that returns a list of variables in expr
@@ -551,7 +749,7 @@ class Expression(models.Model):
     def get_variables_in_latex_expression(cls, latex_expr):
         if latex_expr:
             sympy_expr = Expression.get_sympy_expression_from_latex(latex_expr)
-            if sympy_expr not in list(zip(*Mistake.MISTAKE_TYPES))[0]:
+            if not isinstance(sympy_expr, ParseMistake):
                 symbols_list = Expression.get_variables_in_sympy_expression(sympy_expr)
                 symbols_list.sort()
                 return list(set(symbols_list))
@@ -575,6 +773,8 @@ class Step(models.Model):
 
     problem = models.ForeignKey(Problem, related_name="step", on_delete=models.CASCADE, default=None)
     created = models.DateTimeField(auto_now_add=True)
+    # Where this step is in its problem, starting at 1. Steps used to be put in order by created.
+    position = models.PositiveIntegerField(default=1)
     step_type = models.CharField(max_length=10, choices=STEP_TYPES, default=NONE)
     test_count = models.PositiveSmallIntegerField(default=0)
     left_expr = models.OneToOneField(Expression, on_delete=models.CASCADE, related_name="left_side_step", default=None)
@@ -582,76 +782,113 @@ class Step(models.Model):
         Expression, on_delete=models.CASCADE, related_name="right_side_step", default=None
     )
 
+    class Meta:
+        # Deferred, because delete_step moves the steps after the deleted one up one at a time, and partway through
+        # two of them can have the same position
+        constraints = [
+            models.UniqueConstraint(
+                fields=["problem", "position"],
+                name="algebra_step_unique_position",
+                deferrable=models.Deferrable.DEFERRED,
+            )
+        ]
+
+    # The new step goes after the problem's last step
+    # The problem's row is locked first, so two steps added at the same time can't both take the same position
     @classmethod
     def save_new(cls, problem):
-        step = Step(problem=problem)
-        step.left_expr = Expression()
-        step.left_expr.save()
-        step.right_expr = Expression()
-        step.right_expr.save()
-        step.save()
+        with transaction.atomic():
+            Step.lock_positions(problem.id)
+            last_position = Step.objects.filter(problem=problem).aggregate(Max("position"))["position__max"] or 0
+            step = Step(problem=problem, position=last_position + 1)
+            step.left_expr = Expression()
+            step.left_expr.save()
+            step.right_expr = Expression()
+            step.right_expr.save()
+            step.save()
 
         return step
 
+    # This deletes a step and its expressions, and moves the steps after it up one position
     @classmethod
-    def copy_step(cls, step_to_copy, new_step):
-        new_step.step_type = step_to_copy.step_type
-        new_step.left_expr = Expression(latex=step_to_copy.left_expr.latex)
-        new_step.left_expr.save()
-        new_step.right_expr = Expression(latex=step_to_copy.right_expr.latex)
-        new_step.right_expr.save()
-        new_step.save()
+    def delete_step(cls, this_step):
+        with transaction.atomic():
+            Step.lock_positions(this_step.problem_id)
+            this_step.left_expr.delete()
+            this_step.right_expr.delete()
+            Step.objects.filter(problem_id=this_step.problem_id, position__gt=this_step.position).update(
+                position=F("position") - 1
+            )
+
+    # Everything that changes the positions of a problem's steps holds this lock until its transaction ends
+    @classmethod
+    def lock_positions(cls, problem_id):
+        list(Problem.objects.select_for_update().filter(id=problem_id).values_list("id", flat=True))
+
+    # The steps before and after this_step in its problem
+    # Each of the methods below is one query on the (problem, position) index
+    @classmethod
+    def get_steps_before(cls, this_step):
+        return Step.objects.filter(problem_id=this_step.problem_id, position__lt=this_step.position)
+
+    @classmethod
+    def get_steps_after(cls, this_step):
+        return Step.objects.filter(problem_id=this_step.problem_id, position__gt=this_step.position)
 
     @classmethod
     def is_first(cls, this_step):
-        first_step = Step.objects.filter(problem=this_step.problem).order_by("created").first()  # fmt: skip
-        if first_step == this_step:
-            return True
-        else:
-            return False
+        return not Step.get_steps_before(this_step).exists()
 
     @classmethod
     def is_last(cls, this_step):
-        last_step = (Step.objects.filter(problem=this_step.problem).order_by("created").last())  # fmt: skip
-        if last_step == this_step:
-            return True
-        else:
-            return False
+        return not Step.get_steps_after(this_step).exists()
 
     @classmethod
     def get_number(cls, this_step):
-        all_steps = Step.objects.filter(problem=this_step.problem).order_by("created")
-        for step_num in range(0, len(all_steps)):
-            if all_steps[step_num] == this_step:
-                return step_num + 1
-
-        return 0
+        return Step.get_steps_before(this_step).count() + 1
 
     @classmethod
     def get_prev(cls, this_step):
-        if Step.is_first(this_step):
-            return None
-        else:
-            all_steps = Step.objects.filter(problem=this_step.problem).order_by("created")  # fmt: skip
-            for step_num in range(0, len(all_steps)):
-                if all_steps[step_num] == this_step:
-                    return all_steps[step_num - 1]
-
-        return None
+        return Step.get_steps_before(this_step).order_by("-position").first()
 
     @classmethod
     def get_next(cls, this_step):
-        if Step.is_last(this_step):
-            return None
-        else:
-            all_steps = Step.objects.filter(problem=this_step.problem).order_by("created")  # fmt: skip
-            for step_num in range(0, len(all_steps)):
-                if all_steps[step_num] == this_step:
-                    if step_num + 1 < len(all_steps):
-                        return all_steps[step_num + 1]
+        return Step.get_steps_after(this_step).order_by("position").first()
 
-        return None
+    # This returns the same thing as get_mistakes(step), but from the step's StepAnalysis if nothing it depends on
+    # has changed since the analysis was saved, and None
+    # Otherwise the mistakes are found again, and returned with a new StepAnalysis that Problem.reconcile_mistakes
+    # saves. Nothing is written here.
+    # prev_step is the step before this one, or None if this is the first step
+    @classmethod
+    def get_analyzed_mistakes(cls, step, prev_step):
+        inputs_hash = StepAnalysis.get_inputs_hash(Step.get_mistake_inputs(step, prev_step, step.problem.variable))
+        analysis = StepAnalysis.get_for_step(step)
+        if StepAnalysis.is_current(analysis, inputs_hash):
+            return [analysis.left_mistake, analysis.right_mistake], None
+
+        mistakes = Step.get_mistakes(step)
+        # Running out of time says nothing about the step, so it gets checked again next time
+        if Mistake.TIMEOUT in mistakes:
+            return mistakes, None
+
+        return mistakes, StepAnalysis.new_for_step(step, inputs_hash, mistakes)
+
+    # This returns everything get_mistakes reads to find this step's mistakes, other than help clicks
+    # prev_step is the step before this one, or None if this is the first step
+    # The first step is checked on its own, rewrite and arithmetic steps are checked against the step before them, and
+    # any other step only needs its own type and expressions
+    @classmethod
+    def get_mistake_inputs(cls, step, prev_step, variable):
+        inputs = (step.step_type, step.left_expr.latex, step.right_expr.latex)
+        if prev_step is None:
+            return ("first",) + inputs + (variable,)
+        elif step.step_type in [Step.REWRITE, Step.ARITHMETIC]:
+            return inputs + (prev_step.left_expr.latex, prev_step.right_expr.latex, variable)
 
+        return inputs
+
+    # This only reads, help clicks on expressions without mistakes are marked fixed by Problem.reconcile_mistakes
     @classmethod
     def get_mistakes(cls, step):
         expression_max_length = Expression._meta.get_field("latex").max_length
@@ -711,26 +948,6 @@ class Step(models.Model):
                 if mistakes[1] not in [Mistake.BLANK_EXPR, Mistake.TOO_LONG]:
                     mistakes[1] = Mistake.NO_STEP_TYPE
 
-        # find any mistake objects involving this step
-        help_click_mistakes = HelpClick.objects.filter(
-            id__in=Mistake.objects.filter(mistake_event_type=Mistake.HELP_CLICK, is_fixed=False)
-            .exclude(mistake_type=Mistake.NONE)
-            .values("event_id")
-        )
-        for i in range(0, 2):
-            if mistakes[i] == Mistake.NONE:
-                exp_id = step.left_expr.id
-                if i == 1:
-                    exp_id = step.right_expr.id
-                try:
-                    Expression.objects.get(id=exp_id, id__in=help_click_mistakes.values("object_id"))
-                    help_clicks = HelpClick.objects.filter(object_id=exp_id, object_type=HelpClick.EXPRESSION)
-                    Mistake.objects.filter(
-                        mistake_event_type=Mistake.HELP_CLICK, event_id__in=help_clicks.values("id")
-                    ).update(is_fixed=True)
-                except Expression.DoesNotExist:
-                    pass
-
         return mistakes
 
     @classmethod
@@ -759,6 +976,64 @@ class Step(models.Model):
 
 # A check rewrite process is considered completed if the are_equivalent is not null
 # if the are_equivalent field is null, then the user never even completed that process
+# The mistakes Step.get_mistakes found for a step, saved with a hash of everything they were found from
+# Pages and feedback read these instead of checking every step again, see Step.get_analyzed_mistakes
+class StepAnalysis(models.Model):
+    # Bump this whenever Step.get_mistakes could find different mistakes for the same step, and every saved analysis
+    # is found again the next time it is read
+    ANALYZER_VERSION = 1
+
+    step = models.OneToOneField(Step, on_delete=models.CASCADE, related_name="analysis")
+    analyzer_version = models.PositiveSmallIntegerField(default=ANALYZER_VERSION)
+    inputs_hash = models.CharField(max_length=64)
+    left_mistake = models.CharField(max_length=30)
+    right_mistake = models.CharField(max_length=30)
+    updated = models.DateTimeField(auto_now=True)
+
+    # inputs is what Step.get_mistake_inputs returns
+    @classmethod
+    def get_inputs_hash(cls, inputs):
+        return sha256(json.dumps(inputs).encode()).hexdigest()
+
+    # The saved analysis of step, or None if it has never been saved
+    @classmethod
+    def get_for_step(cls, step):
+        try:
+            return step.analysis
+        except StepAnalysis.DoesNotExist:
+            return None
+
+    @classmethod
+    def is_current(cls, analysis, inputs_hash):
+        return (
+            analysis is not None
+            and analysis.analyzer_version == StepAnalysis.ANALYZER_VERSION
+            and analysis.inputs_hash == inputs_hash
+        )
+
+    # An unsaved analysis, see save_all
+    @classmethod
+    def new_for_step(cls, step, inputs_hash, mistakes):
+        return StepAnalysis(
+            step=step,
+            analyzer_version=StepAnalysis.ANALYZER_VERSION,
+            inputs_hash=inputs_hash,
+            left_mistake=mistakes[0],
+            right_mistake=mistakes[1],
+        )
+
+    # This saves new analyses and replaces the old analysis of their steps, in one query
+    @classmethod
+    def save_all(cls, analyses):
+        if analyses:
+            StepAnalysis.objects.bulk_create(
+                analyses,
+                update_conflicts=True,
+                unique_fields=["step"],
+                update_fields=["analyzer_version", "inputs_hash", "left_mistake", "right_mistake", "updated"],
+            )
+
+
 class CheckRewrite(CheckAlgebra):
     are_equivalent = models.BooleanField(default=None, null=True)
 
@@ -791,10 +1066,8 @@ class CheckRewrite(CheckAlgebra):
         responses = []
         response_context = Response.NO_CONTEXT
 
-        all_vars_in_expressions = Expression.get_variables_in_latex_expression(getattr(step, f"{side}_expr").latex)
-        all_vars_in_expressions += Expression.get_variables_in_latex_expression(
-            getattr(Step.get_prev(step), f"{side}_expr").latex
-        )
+        all_vars_in_expressions = Expression.get_variables(getattr(step, f"{side}_expr"))
+        all_vars_in_expressions += Expression.get_variables(getattr(Step.get_prev(step), f"{side}_expr"))
 
         all_vars_to_substitute = list(set(all_vars_in_expressions))
         if not all_vars_to_substitute:
@@ -833,8 +1106,7 @@ class CheckRewrite(CheckAlgebra):
                 responses.append(
                     "You have an issue with one of the expressions you are trying to check. Please fix that first."
                 )
-                new_mistake = Mistake.save_new(user_message_obj.problem_id, new_check, Mistake.INVALID_EXPR)
-                new_mistake.save()
+                Mistake.save_new(user_message_obj.problem_id, new_check, Mistake.INVALID_EXPR)
                 new_check.end_time = timezone.now()
                 new_check.save()
             else:
@@ -968,7 +1240,7 @@ class CheckRewrite(CheckAlgebra):
                 )
                 sympy_exprs[expr_key] = sympy_after_subs
             else:
-                if sympy_expr not in list(zip(*Mistake.MISTAKE_TYPES))[0]:
+                if not isinstance(sympy_expr, ParseMistake):
                     sympy_exprs[expr_key] = sympy_expr
                 else:
                     # There is an issue with the user message and this will add the mistake message to the responses
@@ -977,13 +1249,13 @@ class CheckRewrite(CheckAlgebra):
 
         if sympy_exprs["usr_msg"] is not None:
             if not check_process.did_expr1_subst:
-                if simplify(sympy_exprs["usr_msg"] - sympy_exprs["rewrite"]) == 0:
+                if are_equivalent(sympy_exprs["usr_msg"], sympy_exprs["rewrite"]):
                     Mistake.objects.filter(event_id=check_process.id, mistake_type=Mistake.SUB_EXPR1).update(
                         is_fixed=True
                     )
                     check_process.did_expr1_subst = True
                     check_process.save()
-                    simplify_user_msg = latex(simplify(sympy_exprs["usr_msg"]))
+                    simplify_user_msg = latex(run_sympy(simplify, sympy_exprs["usr_msg"]))
                     responses.append(f"Great, that is equal to `/{simplify_user_msg}`.")
                     responses.append(
                         f"Now, substitute {var_val_string} in the expression " f"`/{check_process.expr2_latex}`"
@@ -992,7 +1264,7 @@ class CheckRewrite(CheckAlgebra):
                     Mistake.save_new(user_message_obj.problem_id, check_process, Mistake.SUB_EXPR1)
                     responses.append("You didn't do that substitution correctly. Try again.")
             else:
-                if simplify(sympy_exprs["usr_msg"] - sympy_exprs["prev"]) == 0:
+                if are_equivalent(sympy_exprs["usr_msg"], sympy_exprs["prev"]):
                     Mistake.objects.filter(event_id=check_process.id, mistake_type=Mistake.SUB_EXPR2).update(
                         is_fixed=True
                     )
@@ -1001,10 +1273,10 @@ class CheckRewrite(CheckAlgebra):
                     check_process.save()
 
                     # Test this user message against the rewritten expression, too
-                    if simplify(sympy_exprs["usr_msg"] - sympy_exprs["rewrite"]) == 0:
+                    if are_equivalent(sympy_exprs["usr_msg"], sympy_exprs["rewrite"]):
                         # If this user message is ALSO equal to the rewritten expression, then we have equivalence
                         responses.append(
-                            f"Great, that is also equal to `/{latex(simplify(sympy_exprs['usr_msg']))}`. "
+                            f"Great, that is also equal to `/{latex(run_sympy(simplify, sympy_exprs['usr_msg']))}`. "
                             f"It looks like `/{check_process.expr1_latex}` can probably be "
                             f"rewritten as `/{check_process.expr2_latex}`."
                         )
@@ -1027,10 +1299,12 @@ class CheckRewrite(CheckAlgebra):
                         check_process.save()
                     else:
                         # We have done our substitution correctly, but we do NOT have equivalence
+                        rewrite_value = latex(run_sympy(simplify, sympy_exprs["rewrite"]))
+                        original_value = latex(run_sympy(simplify, sympy_exprs["usr_msg"]))
                         responses.append(
                             f"You did this substitution correctly, but after substitution the rewritten expression "
-                            f"equals `/{Sandbox.clean_decimal(Decimal(latex(simplify(sympy_exprs['rewrite']))))}` "
-                            f"while the original expression equals `/{latex(simplify(sympy_exprs['usr_msg']))}`."
+                            f"equals `/{Sandbox.clean_decimal(Decimal(rewrite_value))}` "
+                            f"while the original expression equals `/{original_value}`."
                         )
                         responses.append("Try to find and fix your mistakes, then try again.")
                         check_process.are_equivalent = False
@@ -1081,18 +1355,18 @@ class CheckSolution(CheckAlgebra):
 
     @classmethod
     def create_start_response(cls, user_message_obj):
-        equation_step = Step.objects.filter(problem_id=user_message_obj.problem_id).order_by("created").first()
+        equation_step = Step.objects.filter(problem_id=user_message_obj.problem_id).order_by("position").first()
         equation_mistakes = Step.get_mistakes(equation_step)
 
-        attempt_step = Step.objects.filter(problem_id=user_message_obj.problem_id).order_by("created").last()
+        attempt_step = Step.objects.filter(problem_id=user_message_obj.problem_id).order_by("position").last()
         attempt_mistakes = Step.get_mistakes(attempt_step)
 
         responses = []
         response_context = Response.NO_CONTEXT
 
-        all_vars_in_equation = Expression.get_variables_in_latex_expression(
-            equation_step.left_expr.latex
-        ) + Expression.get_variables_in_latex_expression(equation_step.right_expr.latex)
+        all_vars_in_equation = Expression.get_variables(equation_step.left_expr) + Expression.get_variables(
+            equation_step.right_expr
+        )
         all_vars_to_substitute = list(set(all_vars_in_equation))
         if not all_vars_to_substitute:
             if (
@@ -1139,8 +1413,7 @@ class CheckSolution(CheckAlgebra):
                     "You have an issue with your equation. Please fix that before checking your equation."
                 )
 
-                new_mistake = Mistake.save_new(user_message_obj.problem_id, check_process, Mistake.INVALID_EXPR)
-                new_mistake.save()
+                Mistake.save_new(user_message_obj.problem_id, check_process, Mistake.INVALID_EXPR)
                 check_process.end_time = timezone.now()
                 check_process.save()
             else:
@@ -1173,7 +1446,7 @@ class CheckSolution(CheckAlgebra):
                             prev_correct_check_process.first().attempt
                         )
                         sympy_current = Expression.get_sympy_expression_from_latex(check_process.attempt)
-                        if simplify(sympy_correct - sympy_current) == 0:
+                        if are_equivalent(sympy_correct, sympy_current):
                             still_has_mistakes = None
                             for step_mistakes in Problem.get_all_steps_mistakes(problem).items():
                                 if step_mistakes[1][0]["title"] != Mistake.NONE:
@@ -1247,7 +1520,7 @@ class CheckSolution(CheckAlgebra):
                                     else:
                                         left = Expression.get_sympy_expression_from_latex(check_process.expr1_latex)
                                         right = Expression.get_sympy_expression_from_latex(check_process.expr2_latex)
-                                        if not solve(left - right):
+                                        if not run_sympy(solve, left - right):
                                             # Update any mistakes made during a check solution process to fixed
                                             all_check_solution_mistakes = Proceed.objects.filter(
                                                 problem_id=user_message_obj.problem_id,
@@ -1337,22 +1610,23 @@ class CheckSolution(CheckAlgebra):
             sympy_answer = Expression.get_sympy_expression_from_latex(check_process.attempt)
             solving_for_sympy = Expression.get_sympy_expression_from_latex(check_process.solving_for_latex_value)
             other_var_sympy = Expression.get_sympy_expression_from_latex(check_process.other_var_latex_value)
-            answer_with_substitution = simplify(
+            answer_with_substitution = run_sympy(
+                simplify,
                 sympy_answer.subs(
                     [
                         (check_process.solving_for, solving_for_sympy),
                         (check_process.other_var, other_var_sympy),
                     ],
                     order="none",
-                )
+                ),
             )
 
             sympy_message = Expression.get_sympy_expression_from_latex(message_latex)
 
-            if sympy_message in list(zip(*Mistake.MISTAKE_TYPES))[0]:
+            if isinstance(sympy_message, ParseMistake):
                 responses.append("I'm having a hard time understanding that. Try again.")
             else:
-                if simplify(sympy_message - answer_with_substitution) == 0:
+                if are_equivalent(sympy_message, answer_with_substitution):
                     # check_process.solving_for_value = Decimal(message_latex)
                     check_process.solving_for_latex_value = message_latex
                     check_process.save()
@@ -1447,7 +1721,7 @@ class CheckSolution(CheckAlgebra):
                 )
                 sympy_exprs[expr_key] = sympy_after_subs
             else:
-                if sympy_expr not in list(zip(*Mistake.MISTAKE_TYPES))[0]:
+                if not isinstance(sympy_expr, ParseMistake):
                     sympy_exprs[expr_key] = sympy_expr
                 else:
                     # There is an issue with the user message and this will add the mistake message to the responses
@@ -1456,13 +1730,13 @@ class CheckSolution(CheckAlgebra):
 
         if sympy_exprs["usr_msg"]:
             if not check_process.did_expr1_subst:
-                if simplify(sympy_exprs["usr_msg"] - sympy_exprs["left"]) == 0:
+                if are_equivalent(sympy_exprs["usr_msg"], sympy_exprs["left"]):
                     Mistake.objects.filter(event_id=check_process.id, mistake_type=Mistake.SUB_EXPR1).update(
                         is_fixed=True
                     )
                     check_process.did_expr1_subst = True
                     check_process.save()
-                    simplify_user_msg = latex(simplify(sympy_exprs["usr_msg"]))
+                    simplify_user_msg = latex(run_sympy(simplify, sympy_exprs["usr_msg"]))
                     responses.append(f"Great, that is equal to `/{simplify_user_msg}`.")
                     responses.append(
                         f"Now, substitute {var_val_string} in the right side of the starting equation "
@@ -1472,7 +1746,7 @@ class CheckSolution(CheckAlgebra):
                     Mistake.save_new(user_message_obj.problem_id, check_process, Mistake.SUB_EXPR1)
                     responses.append("You didn't do that substitution correctly. Try again.")
             else:
-                if simplify(sympy_exprs["usr_msg"] - sympy_exprs["right"]) == 0:
+                if are_equivalent(sympy_exprs["usr_msg"], sympy_exprs["right"]):
                     Mistake.objects.filter(event_id=check_process.id, mistake_type=Mistake.SUB_EXPR2).update(
                         is_fixed=True
                     )
@@ -1481,7 +1755,7 @@ class CheckSolution(CheckAlgebra):
                     check_process.save()
 
                     # Test this user message against the rewritten expression, too
-                    if simplify(sympy_exprs["usr_msg"] - sympy_exprs["left"]) == 0:
+                    if are_equivalent(sympy_exprs["usr_msg"], sympy_exprs["left"]):
                         # Update any mistakes that were made during a check solution process to fixed
                         all_check_solution_mistakes = Proceed.objects.filter(
                             problem_id=user_message_obj.problem_id, proceed_type=Proceed.CHECK_SOLUTION
@@ -1503,19 +1777,20 @@ class CheckSolution(CheckAlgebra):
                             check_process.problem_solved = CheckSolution.SOLVED
                             check_process.save()
 
-                            responses.append(
-                                f"Great, that is also equal to `/{latex(simplify(sympy_exprs['usr_msg']))}`. "
-                            )
+                            user_value = latex(run_sympy(simplify, sympy_exprs["usr_msg"]))
+                            responses.append(f"Great, that is also equal to `/{user_value}`. ")
                             responses.append(
                                 f"Congratulations! You have correctly solved this equation "
                                 f"for `/{check_process.solving_for}`."
                             )
                             responses.append("Keep up the good work!")
                         else:
-                            responses.append(f"That is also equal to `/{latex(simplify(sympy_exprs['usr_msg']))}`. ")
+                            responses.append(
+                                f"That is also equal to `/{latex(run_sympy(simplify, sympy_exprs['usr_msg']))}`. "
+                            )
                             left = Expression.get_sympy_expression_from_latex(check_process.expr1_latex)
                             right = Expression.get_sympy_expression_from_latex(check_process.expr2_latex)
-                            if solve(left - right):
+                            if run_sympy(solve, left - right):
                                 check_process.problem_solved = CheckSolution.SOLVED
                                 check_process.save()
 
@@ -1545,10 +1820,12 @@ class CheckSolution(CheckAlgebra):
                             )
                     else:
                         # We have done our substitution correctly, but we do NOT have equivalence
+                        left_value = latex(run_sympy(simplify, sympy_exprs["left"]))
+                        right_value = latex(run_sympy(simplify, sympy_exprs["usr_msg"]))
                         responses.append(
                             f"You did this substitution correctly, but the left side of the equation "
-                            f"equals `/{Sandbox.clean_decimal(Decimal(latex(simplify(sympy_exprs['left']))))}` "
-                            f" while the right side equals `/{latex(simplify(sympy_exprs['usr_msg']))}`."
+                            f"equals `/{Sandbox.clean_decimal(Decimal(left_value))}` "
+                            f" while the right side equals `/{right_value}`."
                         )
                         responses.append(
                             f"It looks like `/{check_process.expr1_latex}` is not equal "
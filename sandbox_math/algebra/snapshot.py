@@ -0,0 +1,170 @@
+import json
+from hashlib import sha256
+
+from django.db import transaction
+
+from sandbox_math.algebra.models import CheckRewrite, Expression, Problem
+from sandbox_math.users.models import Mistake
+
+# The algebra views answer every change to a problem with its mistakes, whether the variable is isolated, the variable
+# options and the rewrite check badges. Each of those used to load the steps on its own, and some of them found every
+# step's mistakes again. A ProblemSnapshot loads the steps with their expressions and saved analyses in one query and
+# the problem's finished rewrite checks in one more, and works everything out from those.
+# Building a snapshot only reads, so the views that change a problem build it with no transaction open, while SymPy
+# finds the mistakes, and only hold one for reconcile and their own writes.
+
+# The session keeps the mistake titles it was last sent for one problem, so the algebra views can send only the steps
+# whose mistakes changed, see ProblemSnapshot.get_mistakes_feedback. A version is a hash of the titles, so two requests
+# that run at the same time can't give the page changes from a version it doesn't have.
+SENT_MISTAKES_SESSION_KEY = "algebra_sent_mistakes"
+# How many of the versions last sent are kept for the page to send changes against
+SENT_MISTAKES_KEPT = 4
+
+
+class ProblemSnapshot:
+    def __init__(self, problem):
+        self.problem = problem
+        self.steps = Problem.get_steps_to_analyze(problem)
+        self.step_analyses = Problem.analyze_steps(problem, self.steps)
+        self.all_mistake_titles = Problem.get_all_steps_mistake_titles(problem, self.step_analyses)
+        self.positions = {step.id: index for index, step in enumerate(self.steps)}
+        self._rewrite_checks = None
+
+    # Saves the analysis and marks fixed mistakes, see Problem.reconcile_mistakes
+    # Views that change the problem call this once
+    def reconcile(self):
+        with transaction.atomic():
+            Problem.reconcile_mistakes(self.problem, self.step_analyses)
+
+    def get_mistakes(self):
+        return Problem.get_all_steps_mistakes(self.problem, self.step_analyses)
+
+    # The mistakes shown in the help popovers of a step, in the shape base.html wants them
+    def get_help_mistakes(self, step):
+        mistake_titles = self.all_mistake_titles[step.id]
+        return [
+            {"side": side, "title": title, "content": Mistake.CATALOG.get_message(title, "")}
+            for side, title in zip(["left", "right"], mistake_titles)
+        ]
+
+    # This puts everything algebra/base.html shows about each step on the step itself, as help_mistakes and
+    # rewrite_badges, so the algebra_extras filters only have to look them up
+    def add_step_views(self):
+        for step in self.steps:
+            step.help_mistakes = self.get_help_mistakes(step)
+            step.rewrite_badges = {side: self.get_badge(step, side) for side in ["left", "right"]}
+
+    # The mistake titles of every step as they are kept in the session, and their version
+    def get_sent_mistakes(self):
+        sent_mistakes = {str(step_id): list(titles) for step_id, titles in self.all_mistake_titles.items()}
+        version = sha256(json.dumps(sent_mistakes, sort_keys=True).encode()).hexdigest()[:16]
+
+        return version, sent_mistakes
+
+    # Keeps this snapshot's mistake titles in the session as a version the page has, and returns the version
+    def remember_sent_mistakes(self, session):
+        version, sent_mistakes = self.get_sent_mistakes()
+        sent = session.get(SENT_MISTAKES_SESSION_KEY)
+        if not sent or sent["problem"] != self.problem.id:
+            sent = {"problem": self.problem.id, "versions": {}}
+        # The versions are kept oldest first
+        sent["versions"].pop(version, None)
+        sent["versions"][version] = sent_mistakes
+        while len(sent["versions"]) > SENT_MISTAKES_KEPT:
+            del sent["versions"][next(iter(sent["versions"]))]
+        session[SENT_MISTAKES_SESSION_KEY] = sent
+
+        return version
+
+    # The mistakes part of an algebra view's feedback
+    # page_version is the version of the mistakes the page is showing. If the session still has it, mistakes only has
+    # the steps whose mistakes are different from it and mistakes_base is page_version. Otherwise, like after the
+    # session expired, mistakes has every step and mistakes_base is None.
+    def get_mistakes_feedback(self, session, page_version):
+        base = None
+        sent = session.get(SENT_MISTAKES_SESSION_KEY)
+        if sent and sent["problem"] == self.problem.id:
+            base = sent["versions"].get(page_version)
+
+        mistakes = self.get_mistakes()
+        if base is not None:
+            mistakes = {
+                step_id: step_mistakes
+                for step_id, step_mistakes in mistakes.items()
+                if base.get(str(step_id)) != list(self.all_mistake_titles[step_id])
+            }
+
+        return {
+            "mistakes": mistakes,
+            "mistakes_version": self.remember_sent_mistakes(session),
+            "mistakes_base": page_version if base is not None else None,
+        }
+
+    def has_mistakes(self):
+        return any(
+            mistake_titles[0] != Mistake.NONE or mistake_titles[1] != Mistake.NONE
+            for mistake_titles in self.all_mistake_titles.values()
+        )
+
+    def get_variable_isolated(self):
+        if not self.steps:
+            return None
+
+        return Problem.variable_isolated_side(self.problem, self.steps[-1], self.all_mistake_titles)
+
+    # The variables that can be picked to solve for, which are the ones in the first step
+    def get_variable_options(self):
+        if not self.steps:
+            return []
+
+        variable_options = set()
+        for expression in [self.steps[0].left_expr, self.steps[0].right_expr]:
+            if expression.latex:
+                variable_options.update(Expression.get_variables(expression))
+
+        return sorted(variable_options)
+
+    def get_prev(self, step):
+        position = self.positions[step.id]
+        if position == 0:
+            return None
+
+        return self.steps[position - 1]
+
+    def get_next(self, step):
+        position = self.positions[step.id]
+        if position + 1 == len(self.steps):
+            return None
+
+        return self.steps[position + 1]
+
+    # Every finished rewrite check in the problem, loaded the first time they are needed
+    def get_rewrite_checks(self):
+        if self._rewrite_checks is None:
+            self._rewrite_checks = list(
+                CheckRewrite.objects.filter(problem=self.problem, are_equivalent__isnull=False, end_time__isnull=False)
+            )
+
+        return self._rewrite_checks
+
+    # The same as CheckRewrite.get_matching_completed_checks(None, step, side), without a query
+    def get_matching_rewrite_checks(self, step, side):
+        # The snapshot's copy of step already has its expressions loaded
+        step = self.steps[self.positions[step.id]]
+        prev_step = self.get_prev(step)
+        if prev_step is None:
+            return []
+
+        this_latex = getattr(step, f"{side}_expr").latex
+        prev_latex = getattr(prev_step, f"{side}_expr").latex
+        return [c for c in self.get_rewrite_checks() if c.expr1_latex == this_latex and c.expr2_latex == prev_latex]
+
+    # The number of matching rewrite checks on the badge next to a step's expression, and "danger" for its color if
+    # any of them showed the rewrite was wrong
+    def get_badge(self, step, side):
+        matching_checks = self.get_matching_rewrite_checks(step, side)
+        color = "info"
+        if any(not c.are_equivalent for c in matching_checks):
+            color = "danger"
+
+        return {"count": len(matching_checks), "color": color}
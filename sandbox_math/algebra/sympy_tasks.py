@@ -0,0 +1,25 @@
+from sympy import simplify, srepr
+from sympy.parsing.sympy_parser import implicit_multiplication_application, parse_expr, standard_transformations
+
+# These functions are sent to the worker processes in utils/sympy_pool.py, so they can't use anything that needs Django
+# to be set up, like models
+
+
+# Returns the srepr of the parsed expression, because unpickling a SymPy expression evaluates it, and the expression
+# has to stay exactly as it was typed. Returns None if it can't be parsed
+def parse_to_srepr(sympy_friendly_str):
+    try:
+        sympy_expr = parse_expr(
+            sympy_friendly_str,
+            None,
+            transformations=standard_transformations + (implicit_multiplication_application,),
+            evaluate=False,
+        )
+    except (SyntaxError, TypeError, NameError, IndexError):
+        return None
+
+    return srepr(sympy_expr, order="none")
+
+
+def simplifies_to_zero(expr_a, expr_b):
+    return simplify(expr_a - expr_b) == 0
@@ -0,0 +1,128 @@
+import random
+
+import pytest
+from django.core.cache import caches
+from sympy import expand, factor, simplify
+
+from sandbox_math.algebra import equivalence
+from sandbox_math.algebra.equivalence import (
+    CannotEvaluate,
+    are_equivalent,
+    check_equivalence,
+    differ_at_points,
+    equivalence_cache,
+    get_cache_key,
+    get_canonical_form,
+    get_rational_function,
+)
+from sandbox_math.algebra.models import Expression
+
+
+# Builds a random expression in x and y, written the way parse_latex writes them
+def random_expression(rng, depth=0):
+    r = rng.random()
+    if depth > 2 or r < 0.3:
+        return rng.choice(["x", "y", str(rng.randint(1, 9)), f"{rng.randint(1, 9)}x"])
+    elif r < 0.5:
+        return f"({random_expression(rng, depth + 1)})+({random_expression(rng, depth + 1)})"
+    elif r < 0.65:
+        return f"({random_expression(rng, depth + 1)})-({random_expression(rng, depth + 1)})"
+    elif r < 0.8:
+        return f"({random_expression(rng, depth + 1)})*({random_expression(rng, depth + 1)})"
+    elif r < 0.9:
+        return f"(({random_expression(rng, depth + 1)})/({random_expression(rng, depth + 1)}))"
+    return f"({random_expression(rng, depth + 1)})**{rng.randint(0, 3)}"
+
+
+# Returns pairs of expressions that are sometimes equivalent and sometimes only close
+def random_pairs(rng, count):
+    pairs = []
+    for _ in range(count):
+        expr_str = random_expression(rng)
+        expr = Expression.get_sympy_expression_from_str(expr_str)
+        rewritten = rng.choice([expand, factor, lambda e: e])(expr)
+        other_str = str(rewritten).replace(" ", "")
+        if rng.random() < 0.5:
+            other_str = f"{other_str}+{rng.choice(['x', '1', '(1/7)', 'x*y-y*x'])}"
+        pairs.append((expr, Expression.get_sympy_expression_from_str(other_str)))
+
+    return pairs
+
+
+@pytest.mark.parametrize("point_count", [0, 3])
+def test_are_equivalent_matches_simplify(settings, point_count):
+    settings.ALGEBRA_EQUIVALENCE_POINTS = point_count
+    equivalence_cache.clear()
+    for expr_a, expr_b in random_pairs(random.Random(2023), 150):
+        assert are_equivalent(expr_a, expr_b) == (simplify(expr_a - expr_b) == 0), (expr_a, expr_b)
+
+
+def test_are_equivalent_without_points(settings):
+    settings.ALGEBRA_EQUIVALENCE_POINTS = 0
+    assert are_equivalent(
+        Expression.get_sympy_expression_from_str("2*(x+1)"), Expression.get_sympy_expression_from_str("2x+2")
+    )
+    assert not are_equivalent(
+        Expression.get_sympy_expression_from_str("2*(x+1)"), Expression.get_sympy_expression_from_str("2x+1")
+    )
+
+
+def test_differ_at_points():
+    assert differ_at_points(
+        Expression.get_sympy_expression_from_str("((x)/(3))"), Expression.get_sympy_expression_from_str("3x"), 3
+    )
+    # x/x is 1 everywhere it is defined, and the point where it isn't gets skipped
+    assert not differ_at_points(
+        Expression.get_sympy_expression_from_str("((x)/(x))+y"), Expression.get_sympy_expression_from_str("1+y"), 3
+    )
+
+
+@pytest.mark.parametrize(
+    "expr_str_a, expr_str_b",
+    [
+        ("2*(x+1)", "2x+2"),
+        ("((x*y)/(2y))", "((1)/(2))x"),
+        ("(x+1)**2-1", "x**2+2x"),
+        ("((3)/(x**2))", "3*x**(-2)"),
+    ],
+)
+def test_get_canonical_form(expr_str_a, expr_str_b, monkeypatch):
+    assert get_canonical_form(
+        *get_rational_function(Expression.get_sympy_expression_from_str(expr_str_a))
+    ) == get_canonical_form(*get_rational_function(Expression.get_sympy_expression_from_str(expr_str_b)))
+
+    # Expressions with the same canonical form are equivalent without multiplying out their cross products
+    def have_same_cross_products(*rational_functions):
+        raise AssertionError()
+
+    monkeypatch.setattr(equivalence, "have_same_cross_products", have_same_cross_products)
+    assert check_equivalence(
+        Expression.get_sympy_expression_from_str(expr_str_a), Expression.get_sympy_expression_from_str(expr_str_b)
+    )
+
+
+@pytest.mark.parametrize(
+    "expr_str", ["0.5x", "x**y", "x**((1)/(2))", "((1)/(x-x))", "pi*x", "((x+1)**64)**64", "(x+y+1)**64"]
+)
+def test_get_rational_function_outside_the_sandbox(expr_str):
+    with pytest.raises(CannotEvaluate):
+        get_rational_function(Expression.get_sympy_expression_from_str(expr_str))
+
+
+def test_are_equivalent_is_cached(settings):
+    settings.ALGEBRA_EQUIVALENCE_SHARED_CACHE = "default"
+    caches["default"].clear()
+    equivalence_cache.clear()
+    expr_a = Expression.get_sympy_expression_from_str("2x+4")
+    expr_b = Expression.get_sympy_expression_from_str("2*(x+2)")
+
+    assert are_equivalent(expr_a, expr_b)
+    # Either order, and terms in a different order, is the same answer
+    assert get_cache_key(expr_a, expr_b) == get_cache_key(expr_b, Expression.get_sympy_expression_from_str("4+2x"))
+    assert are_equivalent(expr_b, expr_a)
+    assert equivalence_cache.stats()["hits"] == 1
+
+    # Another process would find the answer in the shared cache
+    equivalence_cache.clear()
+    assert caches["default"].get(get_cache_key(expr_a, expr_b)) is True
+    assert are_equivalent(expr_a, expr_b)
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from sandbox_math.algebra.latex_parser import (
+    EMPTY_GROUP,
+    UNBALANCED,
+    UNKNOWN_SYMBOL,
+    ScanIssue,
+    compile_latex,
+    scan_expression,
+)
+from sandbox_math.algebra.management.commands.benchmark_latex_parser import (
+    find_mistake,
+    legacy_find_mistake,
+    legacy_parse_latex,
+)
+
+SCAN_CHARACTERS = "x2+-*/. ()[]{}_%~|\t\u00e9\u00b2"
+ATOMS = ["x", "y", "2", "13", "0.5", "\\cdot ", "\\ ", "+", "-", " ", "\\%", "\\sim ", "_", "{}"]
+
+
+# Builds a random expression out of the same pieces MathQuill puts in its latex
+def random_latex(rng, depth=0):
+    r = rng.random()
+    if depth > 4 or r < 0.35:
+        return "".join(rng.choice(ATOMS) for _ in range(rng.randint(0, 3)))
+    elif r < 0.5:
+        return f"\\frac{{{random_latex(rng, depth + 1)}}}{{{random_latex(rng, depth + 1)}}}"
+    elif r < 0.6:
+        return f"x_{{{random_latex(rng, depth + 1)}}}"
+    elif r < 0.7:
+        return f"{random_latex(rng, depth + 1)}^{{{random_latex(rng, depth + 1)}}}"
+    elif r < 0.8:
+        return f"\\left({random_latex(rng, depth + 1)}\\right)"
+    elif r < 0.85:
+        return f"\\left\\{{{random_latex(rng, depth + 1)}\\right\\}}"
+    elif r < 0.9:
+        return f"\\left|{random_latex(rng, depth + 1)}\\right|"
+    return random_latex(rng, depth + 1) + random_latex(rng, depth + 1)
+
+
+@pytest.mark.parametrize(
+    "latex_expression, expected",
+    [
+        ("", ""),
+        ("2x+3", "2x+3"),
+        ("3\\cdot x", "3*x"),
+        ("\\left(x+1\\right)\\cdot 3", "(x+1)*3"),
+        ("\\frac{3}{4}+2^{5}", "((3)/(4))+2**{5}"),
+        ("\\frac{\\frac{1}{2}}{x}", "((((1)/(2)))/(x))"),
+        ("x_{1}y_{2}", "x_1y_2"),
+        ("x_{{1}}", "x_1"),
+        ("x_{}{2}", "x_2"),
+        ("\\frac{1}x", "\\frac{1}x"),
+        ("x_{1", "x_{1"),
+    ],
+)
+def test_compile_latex(latex_expression, expected):
+    assert compile_latex(latex_expression) == expected
+
+
+def test_compile_latex_matches_legacy_parser():
+    rng = random.Random(2023)
+    for _ in range(5000):
+        latex_expression = random_latex(rng)
+        assert compile_latex(latex_expression) == legacy_parse_latex(latex_expression), latex_expression
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("2*x+3", []),
+        ("((3)/( ))+x_1", [ScanIssue(EMPTY_GROUP, 5, 8), ScanIssue(UNKNOWN_SYMBOL, 11, 12)]),
+        ("%x{}", [ScanIssue(UNKNOWN_SYMBOL, 0, 1), ScanIssue(EMPTY_GROUP, 2, 4)]),
+        ("(x))+(2", [ScanIssue(UNBALANCED, 3, 4), ScanIssue(UNBALANCED, 5, 6)]),
+        ("(x]", [ScanIssue(UNBALANCED, 0, 1), ScanIssue(UNBALANCED, 2, 3)]),
+    ],
+)
+def test_scan_expression(text, expected):
+    assert scan_expression(text) == expected
+
+
+def test_scan_expression_matches_legacy_mistake_loop():
+    rng = random.Random(2023)
+    for _ in range(5000):
+        text = "".join(rng.choice(SCAN_CHARACTERS) for _ in range(rng.randint(0, 12)))
+        # The old loop only ran after parse_expr worked, which means the brackets were balanced
+        if any(issue.kind == UNBALANCED for issue in scan_expression(text)):
+            continue
+        assert find_mistake(text) == legacy_find_mistake(text), text
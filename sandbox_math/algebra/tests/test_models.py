@@ -0,0 +1,300 @@
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from sympy import Symbol, srepr
+
+from sandbox_math.algebra.models import Expression, Problem, Step, StepAnalysis
+from sandbox_math.algebra.snapshot import ProblemSnapshot
+from sandbox_math.algebra.sympy_tasks import parse_to_srepr
+from sandbox_math.sandbox.models import Sandbox
+from sandbox_math.users.mistake_catalog import ParseMistake
+from sandbox_math.users.models import HelpClick, Mistake, Proceed
+from sandbox_math.users.tests.factories import UserFactory
+from sandbox_math.utils.cache import MISSING, LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 3, "misses": 1}
+
+
+def test_get_sympy_expression_from_latex_is_cached():
+    Expression.sympy_cache.clear()
+
+    first = Expression.get_sympy_expression_from_latex("2x+3")
+    assert Expression.get_sympy_expression_from_latex("2x+3") is first
+    # Different latex with the same SymPy-friendly string shares the cached expression
+    assert Expression.get_sympy_expression_from_latex("2x+3\\ ") is first
+    assert Symbol("x") in first.free_symbols
+
+    assert Expression.get_sympy_expression_from_latex("2x+") == Mistake.NON_MATH
+    assert isinstance(Expression.get_sympy_expression_from_latex("2x+"), ParseMistake)
+    assert Expression.sympy_cache.stats()["hits"] == 3
+
+
+def test_expression_saves_its_parse(db):
+    expression = Expression(latex="x-x+2y")
+    expression.save()
+    expression.refresh_from_db()
+
+    assert Expression.has_current_parse(expression)
+    assert expression.variables == ["x", "y"]
+    assert expression.parse_mistake == ""
+    # The saved parse loads back unevaluated, exactly like parsing the latex again
+    assert Expression.get_sympy_expression(expression) == Expression.get_sympy_expression_from_str("x-x+2y")
+    assert Expression.get_variables(expression) == ["x", "y"]
+
+    expression.latex = "2x+"
+    expression.save(update_fields=["latex"])
+    expression.refresh_from_db()
+    assert expression.parse_mistake == Mistake.NON_MATH
+    assert Expression.get_sympy_expression(expression) == Mistake.NON_MATH
+    assert isinstance(Expression.get_sympy_expression(expression), ParseMistake)
+    assert Expression.get_variables(expression) == []
+
+
+def test_load_srepr_rejects_what_is_not_srepr(db, tmp_path):
+    ran = tmp_path / "ran"
+    for not_srepr in [
+        f"__import__('pathlib').Path({str(ran)!r}).touch()",
+        "Integer.__init__.__globals__",
+        "Symbol('x').subs(Symbol('x'), Integer(1))",
+        "sympify('x')",
+        "__builtins__",
+        "[c for c in 'x']",
+        # Constructors sympify the strings they are given, and sympify runs them
+        f"Tuple(\"__import__('pathlib').Path({str(ran)!r}).touch()\")",
+        f"Add(Integer(1), \"__import__('pathlib').Path({str(ran)!r}).touch()\")",
+        f"Symbol('x', commutative=\"__import__('pathlib').Path({str(ran)!r}).touch()\")",
+        "Symbol('x y')",
+        "Integer('7')",
+        "Float('1e1000000000')",
+    ]:
+        with pytest.raises(ValueError):
+            Expression.load_srepr(not_srepr)
+    assert not ran.exists()
+
+    # Everything parse_to_srepr makes of an algebra expression still loads
+    for sympy_friendly_str in ["x-x+2y", "0.5x_1**{2}", "-3(x+1)", "((1)/(2))E+I+pi"]:
+        sympy_srepr = parse_to_srepr(sympy_friendly_str)
+        assert srepr(Expression.load_srepr(sympy_srepr), order="none") == sympy_srepr
+
+    # A saved parse that isn't a srepr string is never loaded, the latex is parsed again instead
+    expression = Expression(latex="x+2")
+    expression.save()
+    Expression.objects.filter(id=expression.id).update(sympy_srepr=f"__import__('pathlib').Path({str(ran)!r}).touch()")
+    expression.refresh_from_db()
+    Expression.sympy_cache.clear()
+    assert Expression.get_sympy_expression(expression) == Expression.get_sympy_expression_from_str("x+2")
+    assert not ran.exists()
+
+
+def test_backfill_expression_parse(db):
+    expression = Expression(latex="3y")
+    expression.save()
+    Expression.objects.filter(id=expression.id).update(content_hash="", variables=[])
+
+    call_command("backfill_expression_parse", batch_size=1)
+
+    expression.refresh_from_db()
+    assert Expression.has_current_parse(expression)
+    assert expression.variables == ["y"]
+
+
+# Builds a problem from (step type, left latex, right latex) triples
+def make_problem(user, variable, steps):
+    problem = Problem.save_new(user.id)
+    problem.variable = variable
+    problem.save()
+    for step_type, left_latex, right_latex in steps:
+        step = Step.save_new(problem)
+        step.step_type = step_type
+        step.save()
+        Expression.objects.filter(id=step.left_expr.id).update(latex=left_latex)
+        Expression.objects.filter(id=step.right_expr.id).update(latex=right_latex)
+
+    return problem
+
+
+def test_analyze_steps_only_checks_changed_steps(user, monkeypatch, django_assert_num_queries):
+    problem = make_problem(
+        user,
+        "x",
+        [(Step.DEFINE, "2x+4", "10"), (Step.ARITHMETIC, "2x+4-4", "10-4"), (Step.REWRITE, "2x", "6")],
+    )
+    step_ids = list(Step.objects.filter(problem=problem).order_by("position").values_list("id", flat=True))
+    checked = []
+    get_mistakes = Step.get_mistakes
+    monkeypatch.setattr(Step, "get_mistakes", lambda step: checked.append(step.id) or get_mistakes(step))
+
+    all_mistake_titles = Problem.get_all_steps_mistake_titles(problem)
+    assert list(all_mistake_titles) == step_ids
+    assert all_mistake_titles[step_ids[1]] == [Mistake.NONE, Mistake.NONE]
+    assert checked == step_ids
+    # Reading doesn't save anything, so the steps are checked again until the analysis is saved
+    checked.clear()
+    Problem.reconcile_mistakes(problem, Problem.analyze_steps(problem))
+    assert checked == step_ids
+
+    checked.clear()
+    with django_assert_num_queries(1):
+        assert Problem.get_all_steps_mistake_titles(problem) == all_mistake_titles
+    assert checked == []
+    assert StepAnalysis.objects.get(step_id=step_ids[0]).left_mistake == Mistake.NONE
+
+    # The step after an edited step is checked again too, because it is compared to the edited one
+    middle_step = Step.objects.get(id=step_ids[1])
+    middle_step.left_expr.latex = "2x+4-3"
+    middle_step.left_expr.save()
+    all_mistake_titles = Problem.get_all_steps_mistake_titles(problem, Problem.analyze_steps(problem))
+    assert checked == step_ids[1:]
+    assert all_mistake_titles[step_ids[1]][0] == Mistake.UNEQUAL_ARITHMETIC
+
+    checked.clear()
+    problem.variable = "y"
+    problem.save()
+    ProblemSnapshot(problem).reconcile()
+    assert checked == step_ids
+
+    checked.clear()
+    monkeypatch.setattr(StepAnalysis, "ANALYZER_VERSION", StepAnalysis.ANALYZER_VERSION + 1)
+    Problem.get_all_steps_mistake_titles(problem)
+    assert checked == step_ids
+
+
+def test_step_neighbors_use_position(user, django_assert_num_queries):
+    problem = make_problem(user, "x", [(Step.DEFINE, "x", "1"), (Step.REWRITE, "x", "1"), (Step.REWRITE, "x", "1")])
+    first, middle, last = Step.objects.filter(problem=problem).order_by("position")
+    assert [first.position, middle.position, last.position] == [1, 2, 3]
+
+    with django_assert_num_queries(1):
+        assert Step.get_prev(middle) == first
+    with django_assert_num_queries(1):
+        assert Step.get_next(middle) == last
+    assert Step.is_first(first) and not Step.is_first(middle)
+    assert Step.is_last(last) and not Step.is_last(middle)
+    assert Step.get_prev(first) is None and Step.get_next(last) is None
+    assert Step.get_number(last) == 3
+
+    Step.delete_step(middle)
+    last.refresh_from_db()
+    assert last.position == 2
+    assert Step.get_prev(last) == first
+    assert Step.save_new(problem).position == 3
+
+
+def test_step_position_migration(user):
+    set_positions = import_module("sandbox_math.algebra.migrations.0019_step_position").set_positions
+    problem = make_problem(user, "x", [(Step.DEFINE, "x", "1"), (Step.REWRITE, "x", "1")])
+    step_ids = list(Step.objects.filter(problem=problem).order_by("created", "id").values_list("id", flat=True))
+    Step.objects.filter(problem=problem).update(position=1)
+
+    set_positions(apps, None)
+
+    assert list(Step.objects.filter(problem=problem).order_by("position").values_list("id", flat=True)) == step_ids
+    assert Step.objects.get(id=step_ids[1]).position == 2
+
+
+def test_reconcile_mistakes_fixes_help_clicks_and_proceeds(user):
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+", "10")])
+    step = Step.objects.get(problem=problem)
+    help_click = HelpClick(sandbox=Sandbox.ALGEBRA, object_type=HelpClick.EXPRESSION, object_id=step.left_expr_id)
+    help_click.save()
+    help_click_mistake = Mistake.save_new(problem.id, help_click, Mistake.NON_MATH)
+    proceed = Proceed(sandbox=Sandbox.ALGEBRA, problem_id=problem.id, proceed_type=Proceed.ADD_STEP)
+    proceed.save()
+    proceed_mistake = Mistake.save_new(problem.id, proceed, Mistake.NON_MATH)
+
+    ProblemSnapshot(problem).reconcile()
+    help_click_mistake.refresh_from_db()
+    assert not help_click_mistake.is_fixed
+
+    step.left_expr.latex = "2x+4"
+    step.left_expr.save()
+    # Reading never marks anything fixed
+    assert Problem.get_all_steps_mistakes(problem)[step.id][0]["title"] == Mistake.NONE
+    help_click_mistake.refresh_from_db()
+    assert not help_click_mistake.is_fixed
+    assert not StepAnalysis.objects.filter(step=step, left_mistake=Mistake.NONE).exists()
+
+    ProblemSnapshot(problem).reconcile()
+    help_click_mistake.refresh_from_db()
+    proceed_mistake.refresh_from_db()
+    assert help_click_mistake.is_fixed
+    assert proceed_mistake.is_fixed
+    assert StepAnalysis.objects.filter(step=step, left_mistake=Mistake.NONE).exists()
+
+
+def test_copy_for_student(user, django_assert_num_queries):
+    problem = make_problem(
+        user,
+        "x",
+        [(Step.DEFINE, "2x+4", "10"), (Step.ARITHMETIC, "2x+4-4", "10-4"), (Step.REWRITE, "2x", "6")],
+    )
+    # make_problem doesn't parse the expressions
+    for step in Problem.get_steps_to_analyze(problem):
+        step.left_expr.save()
+        step.right_expr.save()
+    ProblemSnapshot(problem).reconcile()
+    steps = Problem.get_steps_to_analyze(problem)
+    other_user = UserFactory()
+
+    # One insert each for the problem, the expressions, the steps and the analyses, however many steps there are
+    with django_assert_num_queries(4):
+        new_problem = Problem.copy_for_student(problem, other_user.id, steps)
+
+    assert new_problem.student_id == other_user.id
+    assert new_problem.variable == "x"
+    new_steps = Problem.get_steps_to_analyze(new_problem)
+    assert [(s.position, s.step_type, s.left_expr.latex, s.right_expr.latex) for s in new_steps] == [
+        (1, Step.DEFINE, "2x+4", "10"),
+        (2, Step.ARITHMETIC, "2x+4-4", "10-4"),
+        (3, Step.REWRITE, "2x", "6"),
+    ]
+    assert all(
+        Expression.has_current_parse(s.left_expr) and Expression.has_current_parse(s.right_expr) for s in new_steps
+    )
+    # The copied analyses are still current, so nothing is checked again
+    assert all(new_analysis is None for step, mistakes, new_analysis in Problem.analyze_steps(new_problem))
+    assert Problem.get_all_steps_mistake_titles(new_problem) == {
+        new_step.id: titles
+        for new_step, titles in zip(new_steps, Problem.get_all_steps_mistake_titles(problem).values())
+    }
+
+
+def test_step_positions_are_unique(user):
+    problem = make_problem(user, "x", [(Step.DEFINE, "x", "1"), (Step.REWRITE, "x", "1")])
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Step.objects.filter(problem=problem, position=2).update(position=1)
+        connection.cursor().execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+# Each thread has its own connection, so the steps are added at the same time in separate transactions
+@pytest.mark.django_db(transaction=True)
+def test_steps_added_at_the_same_time_get_their_own_positions():
+    problem = Problem.save_new(UserFactory().id)
+
+    def add_steps():
+        try:
+            return [Step.save_new(problem).position for _ in range(5)]
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(4) as executor:
+        positions = [
+            position for result in [executor.submit(add_steps) for _ in range(4)] for position in result.result()
+        ]
+
+    assert sorted(positions) == list(range(1, 21))
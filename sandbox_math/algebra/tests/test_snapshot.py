@@ -0,0 +1,43 @@
+from sandbox_math.algebra.models import CheckRewrite, Problem, Step
+from sandbox_math.algebra.snapshot import ProblemSnapshot
+from sandbox_math.algebra.tests.test_models import make_problem
+from sandbox_math.users.models import Mistake
+
+
+def test_problem_snapshot(user, django_assert_num_queries):
+    problem = make_problem(
+        user,
+        "x",
+        [
+            (Step.DEFINE, "2x+4", "10"),
+            (Step.REWRITE, "2x+4", "10"),
+            (Step.REWRITE, "2x", "6"),
+            (Step.REWRITE, "x", "3"),
+        ],
+    )
+    ProblemSnapshot(problem).reconcile()
+    first, second, third, last = Step.objects.filter(problem=problem).order_by("position")
+    check = CheckRewrite(problem=problem, expr1_latex="2x", expr2_latex="2x+4", are_equivalent=False)
+    check.save()
+    CheckRewrite.objects.filter(id=check.id).update(end_time=check.start_time)
+
+    # One query for the steps and one for the rewrite checks, however many steps there are
+    with django_assert_num_queries(2):
+        snapshot = ProblemSnapshot(problem)
+        mistakes = snapshot.get_mistakes()
+        assert snapshot.get_variable_isolated() == "right"
+        assert snapshot.get_variable_options() == ["x"]
+        assert snapshot.get_badge(third, "left") == {"count": 1, "color": "danger"}
+        assert snapshot.get_badge(third, "right") == {"count": 0, "color": "info"}
+
+    assert mistakes == Problem.get_all_steps_mistakes(problem)
+    assert mistakes[second.id][0]["title"] == Mistake.NONE
+    # x is not a rewrite of 2x
+    assert mistakes[last.id][0]["title"] == Mistake.REWRITE
+    assert snapshot.has_mistakes()
+    assert snapshot.get_prev(first) is None
+    assert snapshot.get_next(third).id == last.id
+    assert snapshot.get_variable_isolated() == Problem.variable_isolated_side(problem)
+    assert len(snapshot.get_matching_rewrite_checks(third, "left")) == len(
+        CheckRewrite.get_matching_completed_checks(None, third, "left")
+    )
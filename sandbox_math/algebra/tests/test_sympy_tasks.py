@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from sandbox_math.algebra.models import Expression
+from sandbox_math.algebra.sympy_tasks import parse_to_srepr, simplifies_to_zero
+from sandbox_math.utils.sympy_pool import SympyPool, SympyTimeout
+
+
+@pytest.fixture(scope="module")
+def pool():
+    return SympyPool(1, 1.0)
+
+
+def test_pool_runs_sympy_tasks(pool):
+    # The parse comes back unevaluated, even though x-x is 0
+    assert Expression.load_srepr(pool.run(parse_to_srepr, "x-x+2y")) == Expression.get_sympy_expression_from_str(
+        "x-x+2y"
+    )
+    assert pool.run(parse_to_srepr, "2x+") is None
+    assert pool.run(
+        simplifies_to_zero,
+        Expression.get_sympy_expression_from_str("2*(x+1)"),
+        Expression.load_srepr(pool.run(parse_to_srepr, "2x+2")),
+    )
+    with pytest.raises(ValueError):
+        pool.run(int, "x")
+
+
+def test_pool_times_out_and_replaces_the_worker(pool):
+    timeouts = pool.stats()["timeouts"]
+    start = time.monotonic()
+    with pytest.raises(SympyTimeout):
+        pool.run(time.sleep, 30)
+    assert time.monotonic() - start < 5
+
+    assert pool.run(abs, -3) == 3
+    stats = pool.stats()
+    assert stats["timeouts"] == timeouts + 1
+    assert stats["idle"] == 1
+    assert stats["waiting"] == 0
@@ -0,0 +1,286 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from sandbox_math.algebra.models import Problem, Step
+from sandbox_math.algebra.snapshot import ProblemSnapshot
+from sandbox_math.algebra.tests.test_models import make_problem
+from sandbox_math.algebra.views import UpdateExpressionView
+from sandbox_math.users.models import Mistake
+from sandbox_math.users.tests.factories import UserFactory
+
+
+def get_base_page_queries(client, problem):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse("algebra:load", kwargs={"problem_id": problem.id}))
+    assert response.status_code == 200
+
+    return len(queries)
+
+
+# The help popovers and rewrite check badges of every step come from one ProblemSnapshot
+def test_base_view_queries_do_not_grow_with_steps(client, user):
+    client.force_login(user)
+    short_problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10"), (Step.REWRITE, "2x", "6")])
+    long_problem = make_problem(
+        user,
+        "x",
+        [
+            (Step.DEFINE, "2x+4", "10"),
+            (Step.REWRITE, "2x", "6"),
+            (Step.REWRITE, "x", "3"),
+            (Step.REWRITE, "x", "3"),
+            (Step.REWRITE, "x", "3"),
+        ],
+    )
+
+    # Saving the analyses first, the way the views that add steps do
+    ProblemSnapshot(short_problem).reconcile()
+    ProblemSnapshot(long_problem).reconcile()
+
+    assert get_base_page_queries(client, short_problem) == get_base_page_queries(client, long_problem)
+    response = client.get(reverse("algebra:load", kwargs={"problem_id": long_problem.id}))
+    assert len(response.context["steps"]) == 5
+    assert response.context["steps"][1].rewrite_badges["left"] == {"count": 0, "color": "info"}
+
+
+# UpdateExpressionView is async and does its work on other threads, which can't see a test's transaction, so the tests
+# that post to it use transaction=True
+def post_edit(client, step, latex_expr, version=None, mistakes_version=None):
+    data = {"step-id": step.id, "side": "right-mq-input", "expression": latex_expr}
+    if version is not None:
+        data["version"] = version
+    if mistakes_version is not None:
+        data["mistakes-version"] = mistakes_version
+
+    return client.post(reverse("algebra:update-expression"), data).json()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_update_expression_drops_late_edits(client, user):
+    client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10")])
+    step = Step.objects.get(problem=problem)
+
+    assert post_edit(client, step, "12", version=2)["version"] == 2
+    assert post_edit(client, step, "11", version=1) == {"stale": True, "version": 1}
+    step.right_expr.refresh_from_db()
+    assert step.right_expr.latex == "12"
+    assert step.right_expr.sympy_srepr == "Integer(12)"
+    # Edits without a version are always saved
+    assert "mistakes" in post_edit(client, step, "14")
+
+
+@pytest.mark.django_db(transaction=True)
+# After the page is loaded, only the steps whose mistakes changed are sent
+def test_update_expression_sends_changed_mistakes(client, user):
+    client.force_login(user)
+    problem = make_problem(
+        user, "x", [(Step.DEFINE, "2x+4", "10"), (Step.REWRITE, "2x", "6"), (Step.REWRITE, "x", "3")]
+    )
+    ProblemSnapshot(problem).reconcile()
+    first, second, third = Step.objects.filter(problem=problem).order_by("position")
+    response = client.get(reverse("algebra:load", kwargs={"problem_id": problem.id}))
+    page_version = response.context["mistakes_version"]
+
+    # 6 is a rewrite of 6, and no other step's mistakes change
+    feedback = post_edit(client, third, "6", mistakes_version=page_version)
+    assert list(feedback["mistakes"]) == [str(third.id)]
+    assert feedback["mistakes"][str(third.id)][1]["title"] == Mistake.NONE
+    assert feedback["mistakes_base"] == page_version
+
+    # Changing it back changes it from that version
+    changed_feedback = post_edit(client, third, "3", mistakes_version=feedback["mistakes_version"])
+    assert changed_feedback["mistakes_version"] == page_version
+    assert list(changed_feedback["mistakes"]) == [str(third.id)]
+
+    # Every step is sent to a page with a version the session doesn't have
+    full_feedback = post_edit(client, third, "3", mistakes_version="unknown")
+    assert full_feedback["mistakes_base"] is None
+    assert len(full_feedback["mistakes"]) == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_update_expression_coalesces_edits(async_client, user, settings):
+    async_client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10")])
+    step = Step.objects.get(problem=problem)
+    settings.ALGEBRA_EDIT_COALESCE_SECONDS = 0.5
+
+    # The second edit is saved while the view waits with the first, so the first one is never checked
+    def post_later(expression, version):
+        data = {"step-id": step.id, "side": "right-mq-input", "expression": expression, "version": version}
+        # The test AsyncClient can't read multipart data from two requests at once
+        return async_client.post(
+            reverse("algebra:update-expression"), urlencode(data), content_type="application/x-www-form-urlencoded"
+        )
+
+    @async_to_sync
+    async def post_two_edits():
+        return await asyncio.gather(post_later("12", 5), post_later("13", 6))
+
+    first_response, second_response = post_two_edits()
+    assert first_response.json() == {"stale": True, "version": 5}
+    assert second_response.json()["version"] == 6
+    step.right_expr.refresh_from_db()
+    assert step.right_expr.latex == "13"
+
+
+def post_batch(client, problem, edits, **data):
+    data.update({"problem-id": problem.id, "edits": json.dumps(edits)})
+
+    return client.post(reverse("algebra:batch-edit"), data).json()
+
+
+def test_batch_edit(client, user):
+    client.force_login(user)
+    problem = make_problem(
+        user, "x", [(Step.DEFINE, "2x+4", "10"), (Step.REWRITE, "2x", "6"), (Step.DEFINE, "x", "3")]
+    )
+    first, second, third = Step.objects.filter(problem=problem).order_by("position")
+
+    feedback = post_batch(
+        client,
+        problem,
+        [
+            {"edit": "delete", "step-id": second.id},
+            {"edit": "expression", "step-id": third.id, "side": "left", "expression": "2x"},
+            {"edit": "expression", "step-id": third.id, "side": "right", "expression": "6"},
+            {"edit": "step-type", "step-id": third.id, "step-type": "Rewrite"},
+        ],
+    )
+    third.refresh_from_db()
+    assert (third.position, third.step_type, third.left_expr.latex, third.right_expr.latex) == (
+        2,
+        Step.REWRITE,
+        "2x",
+        "6",
+    )
+    assert feedback == {
+        "variable_options": ["x"],
+        # Step ids are strings in JSON
+        "mistakes": json.loads(json.dumps(ProblemSnapshot(problem).get_mistakes())),
+        "stop_check": None,
+        # The badges are for the side of the last expression edit, like they are for the side of a single edit
+        "badge_updates": {str(first.id): {"count": 0, "color": "info"}, str(third.id): {"count": 0, "color": "info"}},
+        "variable_isolated": ProblemSnapshot(problem).get_variable_isolated(),
+        "mistakes_version": ProblemSnapshot(problem).get_sent_mistakes()[0],
+        "mistakes_base": None,
+        "version": None,
+    }
+
+
+# The response has the same keys as UpdateExpressionView's, so the page can tell which edit it is for
+def test_batch_edit_side_and_version(client, user):
+    client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10"), (Step.REWRITE, "2x", "6")])
+    first, second = Step.objects.filter(problem=problem).order_by("position")
+
+    feedback = post_batch(
+        client,
+        problem,
+        [
+            {"edit": "expression", "step-id": first.id, "side": "left", "expression": "2x+5"},
+            {"edit": "expression", "step-id": second.id, "side": "right", "expression": "5"},
+        ],
+        side="left-mq-input",
+        version=7,
+    )
+    single_edit_feedback = UpdateExpressionView.update(
+        {"step-id": second.id, "side": "right-mq-input", "expression": "5"}, {}
+    )
+    assert feedback.keys() == single_edit_feedback.keys()
+    assert feedback["version"] == 7
+    assert feedback["badge_updates"] == {
+        str(second.id): {"count": 0, "color": "info"},
+        str(first.id): {"count": 0, "color": "info"},
+    }
+
+
+# A problem that isn't the student's gets an error, not a server error
+def test_batch_edit_other_problem(client, user):
+    client.force_login(user)
+    problem = make_problem(UserFactory(), "x", [(Step.DEFINE, "2x+4", "10")])
+    step = Step.objects.get(problem=problem)
+
+    feedback = post_batch(
+        client, problem, [{"edit": "expression", "step-id": step.id, "side": "left", "expression": "2x"}]
+    )
+    assert feedback == {"error": "there was an error applying the edits"}
+    step.left_expr.refresh_from_db()
+    assert step.left_expr.latex == "2x+4"
+
+
+# None of the edits are saved if one of them is wrong
+def test_batch_edit_error(client, user):
+    client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10")])
+    step = Step.objects.get(problem=problem)
+
+    feedback = post_batch(
+        client,
+        problem,
+        [
+            {"edit": "expression", "step-id": step.id, "side": "left", "expression": "2x"},
+            {"edit": "step-type", "step-id": step.id, "step-type": "Divide"},
+        ],
+    )
+    assert feedback == {"error": "there was an error applying the edits"}
+    step.left_expr.refresh_from_db()
+    assert step.left_expr.latex == "2x+4"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_attempt_new_step_records_mistakes(client, user):
+    client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10"), (Step.REWRITE, "2x", "7")])
+
+    response = client.post(reverse("algebra:attempt-new-step"), {"problem-id": problem.id})
+    assert response.json()["next_action"] == "append"
+    assert Step.objects.filter(problem=problem).count() == 3
+    # 2x=7 is not a rewrite of 2x+4=10
+    assert Mistake.objects.filter(owner=user, mistake_event_type=Mistake.PROCEED).exists()
+
+
+# The mistakes are found before any transaction is started, so SymPy never runs while one holds locks
+@pytest.mark.django_db(transaction=True)
+def test_update_variable_finds_mistakes_outside_transactions(client, user, monkeypatch):
+    client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10"), (Step.REWRITE, "2x", "6")])
+    get_mistakes = Step.get_mistakes
+    in_atomic_blocks = []
+
+    def record_get_mistakes(step):
+        in_atomic_blocks.append(connection.in_atomic_block)
+        return get_mistakes(step)
+
+    monkeypatch.setattr(Step, "get_mistakes", record_get_mistakes)
+    response = client.post(reverse("algebra:update-variable"), {"problem-id": problem.id, "variable": "y"})
+    assert response.status_code == 200
+    assert in_atomic_blocks == [False, False]
+
+
+# Someone who isn't signed in gets their own copy of a shared problem, starting from its first step
+def test_shared_problem_is_copied_for_guest(client, user):
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10"), (Step.REWRITE, "2x", "6")])
+    ProblemSnapshot(problem).reconcile()
+
+    response = client.get(reverse("algebra:load", kwargs={"problem_id": problem.id}))
+    new_problem = Problem.objects.exclude(id=problem.id).get()
+    assert response.status_code == 302
+    assert response.url == f"/algebra/{new_problem.id}"
+    assert new_problem.student_id != user.id
+    new_step = Step.objects.select_related("left_expr", "right_expr", "analysis").get(problem=new_problem)
+    assert (new_step.position, new_step.step_type, new_step.left_expr.latex, new_step.right_expr.latex) == (
+        1,
+        Step.DEFINE,
+        "2x+4",
+        "10",
+    )
+    assert new_step.analysis.left_mistake == Mistake.NONE
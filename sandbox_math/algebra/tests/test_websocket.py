@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+
+from config.websocket import websocket_application
+from sandbox_math.algebra.models import Step
+from sandbox_math.algebra.tests.test_models import make_problem
+from sandbox_math.algebra.websocket import get_latest_messages
+from sandbox_math.users.models import Mistake
+
+# The socket does its database work on its own thread, which can't see a test's transaction
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def get_scope(client, problem, origin="http://testserver"):
+    session_cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    return {
+        "type": "websocket",
+        "path": f"/ws/algebra/{problem.id}/",
+        "headers": [(b"cookie", session_cookie.encode()), (b"origin", origin.encode())],
+    }
+
+
+# Opens the socket, sends each message and waits for its answer, and returns the first event and the answers
+@async_to_sync
+async def talk(scope, messages):
+    communicator = ApplicationCommunicator(websocket_application, scope)
+    await communicator.send_input({"type": "websocket.connect"})
+    opened = await communicator.receive_output(10)
+    answers = []
+    if opened["type"] == "websocket.accept":
+        for message in messages:
+            await communicator.send_input({"type": "websocket.receive", "text": json.dumps(message)})
+            answers.append(json.loads((await communicator.receive_output(30))["text"]))
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+    await communicator.wait(10)
+
+    return opened, answers
+
+
+def test_algebra_websocket(client, user):
+    client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10"), (Step.REWRITE, "2x", "6")])
+    first, second = Step.objects.filter(problem=problem).order_by("position")
+
+    opened, (feedback, response) = talk(
+        get_scope(client, problem),
+        [
+            {"type": "expression", "step-id": second.id, "side": "right-mq-input", "expression": "7", "version": 1},
+            {"type": "message", "sandbox": "Algebra", "message": "3+4", "caller": "SubmitUserMessage"},
+        ],
+    )
+    assert opened["type"] == "websocket.accept"
+    assert feedback["type"] == "feedback"
+    assert (feedback["step-id"], feedback["version"]) == (second.id, 1)
+    assert feedback["mistakes"][str(second.id)][1]["title"] == Mistake.REWRITE
+    second.right_expr.refresh_from_db()
+    assert second.right_expr.latex == "7"
+    assert response["type"] == "response"
+    assert "7" in response["html"]
+
+
+def test_algebra_websocket_refuses_other_problems_and_sites(client, user, admin_user):
+    client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10")])
+    other_problem = make_problem(admin_user, "x", [(Step.DEFINE, "2x+4", "10")])
+
+    assert talk(get_scope(client, other_problem), [])[0] == {"type": "websocket.close", "code": 4403}
+    assert talk(get_scope(client, problem, "http://example.com"), [])[0] == {"type": "websocket.close", "code": 4403}
+
+
+def test_get_latest_messages():
+    first_edit = {"type": "expression", "step-id": 1, "side": "left-mq-input", "expression": "2"}
+    other_side_edit = {"type": "expression", "step-id": 1, "side": "right-mq-input", "expression": "3"}
+    message = {"type": "message", "message": "3+4"}
+    last_edit = {"type": "expression", "step-id": 1, "side": "left-mq-input", "expression": "23"}
+
+    assert get_latest_messages([first_edit, other_side_edit, message, last_edit]) == [
+        other_side_edit,
+        message,
+        last_edit,
+    ]
@@ -3,11 +3,13 @@ from django.urls import path
 from sandbox_math.algebra.views import (
     AttemptNewStepView,
     BaseView,
+    BatchEditView,
     DeleteStepView,
     NewStepView,
     RecentTableView,
     SaveNewView,
     StartNewView,
+    SympyStatsView,
     UpdateExpressionView,
     UpdateHelpClickView,
     UpdateStepTypeView,
@@ -25,7 +27,9 @@ urlpatterns = [
     path("update-help-click/", UpdateHelpClickView.as_view(), name="update-help-click", ),  # fmt: skip
     path("update-variable/", UpdateVariableView.as_view(), name="update-variable", ),  # fmt: skip
     path("delete-step/", DeleteStepView.as_view(), name="delete-step", ),  # fmt: skip
+    path("batch-edit/", BatchEditView.as_view(), name="batch-edit", ),  # fmt: skip
     path("attempt-new-step/", AttemptNewStepView.as_view(), name="attempt-new-step", ),  # fmt: skip
     path("new-step/", NewStepView.as_view(), name="new-step", ),  # fmt: skip
     path("recent-table/", RecentTableView.as_view(), name="recent-table", ),  # fmt: skip
+    path("sympy-stats/", SympyStatsView.as_view(), name="sympy-stats", ),  # fmt: skip
 ]
@@ -1,18 +1,32 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.db import transaction
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views.generic.base import TemplateView, View
 from django.views.generic.list import ListView
 from guest_user.mixins import AllowGuestUserMixin
 from guest_user.models import is_guest_user
 
+from sandbox_math.algebra.equivalence import equivalence_cache
 from sandbox_math.algebra.models import CheckRewrite, CheckSolution, Expression, Problem, Step
+from sandbox_math.algebra.snapshot import ProblemSnapshot
 from sandbox_math.calculator.models import UserMessage
 from sandbox_math.sandbox.models import Sandbox
-from sandbox_math.users.models import HelpClick, Mistake, Proceed, User
+from sandbox_math.users.models import HelpClick, Mistake, MistakeRecorder, Proceed, User
+from sandbox_math.utils.blocking import run_blocking
+from sandbox_math.utils.sympy_pool import get_sympy_pool
 
 
 # Create your views here.
+# The algebra views that find mistakes aren't one transaction for the whole request. They make their change, find the
+# mistakes with a ProblemSnapshot while no transaction is open, and then save what it found in a short one.
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class BaseView(AllowGuestUserMixin, TemplateView):
     template_name = "algebra/base.html"
     step_prompts = {
@@ -43,15 +57,7 @@ class BaseView(AllowGuestUserMixin, TemplateView):
                     requester = User.objects.get(id=self.request.user.id)
                     if is_guest_user(requester):
                         # create a new problem like this one
-                        new_saved_problem = Problem.save_new(request.user.id)
-                        new_saved_problem.last_view = timezone.now()
-                        new_saved_problem.variable = problem.variable
-                        new_saved_problem.save()
-
-                        step_one = Step.save_new(new_saved_problem)
-                        Step.copy_step(
-                            Step.objects.filter(problem_id=problem.id).order_by("created").first(), step_one
-                        )
+                        new_saved_problem = BaseView.copy_problem(problem, request.user.id)
 
                         return redirect(f"/algebra/{new_saved_problem.id}")
                     else:
@@ -66,21 +72,30 @@ class BaseView(AllowGuestUserMixin, TemplateView):
                             return redirect(f"/algebra/{saved_problem_id}")
                         else:
                             # create a new problem like this one
-                            new_saved_problem = Problem.save_new(request.user.id)
-                            new_saved_problem.last_view = timezone.now()
-                            new_saved_problem.variable = problem.variable
-                            new_saved_problem.save()
-
-                            step_one = Step.save_new(new_saved_problem)
-                            Step.copy_step(
-                                Step.objects.filter(problem_id=problem.id).order_by("created").first(), step_one
-                            )
+                            new_saved_problem = BaseView.copy_problem(problem, request.user.id)
 
                             return redirect(f"/algebra/{new_saved_problem.id}")
                 except Problem.DoesNotExist:
                     # there was a problem id on the URL but it not a known problem
                     return redirect("/algebra/")
 
+    # A new problem for the student like one someone else shared, which starts from its first step
+    # This is what a shared link does for each student who opens it, so it is a few inserts, see
+    # Problem.copy_for_student
+    @classmethod
+    def copy_problem(cls, problem, student_id):
+        first_steps = list(
+            Step.objects.filter(problem=problem)
+            .select_related("left_expr", "right_expr", "analysis")
+            .order_by("position")[:1]
+        )
+        with transaction.atomic():
+            new_problem = Problem.copy_for_student(problem, student_id, first_steps)
+            if not first_steps:
+                Step.save_new(new_problem)
+
+        return new_problem
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
@@ -104,19 +119,19 @@ class BaseView(AllowGuestUserMixin, TemplateView):
                 problem.save()
                 context["is_new_problem"] = False
                 context["problem"] = problem
-                context["steps"] = Step.objects.filter(problem_id=saved_problem_id).order_by("created")
+                # Everything the page shows about each step is worked out here, in a fixed number of queries
+                snapshot = ProblemSnapshot(problem)
+                snapshot.add_step_views()
+                context["steps"] = snapshot.steps
+                context["mistakes_version"] = snapshot.remember_sent_mistakes(self.request.session)
                 context["previous_user_messages"] = UserMessage.get_all_previous_for_problem(
                     Sandbox.ALGEBRA, saved_problem_id
                 )
                 solved_states = [CheckSolution.SOLVED, CheckSolution.INFINITELY_MANY, CheckSolution.NO_SOLUTION]
                 if CheckSolution.objects.filter(problem=context["problem"], problem_solved__in=solved_states):
                     context["problem_finished"] = "finished"
-                    for step_mistakes in Problem.get_all_steps_mistakes(context["problem"]).items():
-                        if (
-                            step_mistakes[1][0]["title"] != Mistake.NONE
-                            or step_mistakes[1][1]["title"] != Mistake.NONE
-                        ):
-                            context["problem_finished"] = "unfinished"
+                    if snapshot.has_mistakes():
+                        context["problem_finished"] = "unfinished"
             except Problem.DoesNotExist:
                 # the problem that is trying to be accessed is not associated with the account trying to access it
                 # This must be an invalid problem and I am not sure how we would have gotten here
@@ -150,22 +165,53 @@ class SaveNewView(View):
         return JsonResponse({"unique-problem-id": new_saved_problem.id, "unique-step-id": first_step.id})
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class UpdateStepTypeView(View):
     @classmethod
     def post(cls, request):
         response = None
         step = Step.objects.get(id=int(request.POST["step-id"]))
-        if "Define" in request.POST["step-type"]:
-            step.step_type = Step.DEFINE
-        elif "Rewrite" in request.POST["step-type"]:
-            step.step_type = Step.REWRITE
-        elif "Arithmetic" in request.POST["step-type"]:
-            step.step_type = Step.ARITHMETIC
-        elif "Delete" in request.POST["step-type"]:
-            step.step_type = Step.DELETE
+        step_type = UpdateStepTypeView.get_step_type(request.POST["step-type"])
+        if step_type:
+            step.step_type = step_type
         else:
             response = JsonResponse({"error": "there was an error updating the step type"})
 
+        stop_check_rewrite, stop_check_solution = UpdateStepTypeView.get_stop_checks(step)
+
+        if not response:
+            step.save()
+
+            snapshot = ProblemSnapshot(step.problem)
+            snapshot.reconcile()
+            feedback = {
+                **snapshot.get_mistakes_feedback(request.session, request.POST.get("mistakes-version")),
+                "stop_check_rewrite": stop_check_rewrite,
+                "stop_check_solution": stop_check_solution,
+                "variable_isolated": snapshot.get_variable_isolated(),
+            }
+
+            response = JsonResponse(feedback)
+
+        return response
+
+    # The step type picked in the step type menu, from the menu item's html, or None if it isn't one
+    @classmethod
+    def get_step_type(cls, step_type_html):
+        for label, step_type in [
+            ("Define", Step.DEFINE),
+            ("Rewrite", Step.REWRITE),
+            ("Arithmetic", Step.ARITHMETIC),
+            ("Delete", Step.DELETE),
+        ]:
+            if label in step_type_html:
+                return step_type
+
+        return None
+
+    # Whether changing this step's type has to stop the check rewrite and the check solution that are running
+    @classmethod
+    def get_stop_checks(cls, step):
         stop_check_rewrite = False
 
         active_processes = CheckRewrite.objects.filter(problem=step.problem, end_time__isnull=True)
@@ -181,51 +227,126 @@ class UpdateStepTypeView(View):
         if CheckSolution.objects.filter(problem=step.problem, end_time__isnull=True):
             stop_check_solution = True
 
-        if not response:
-            step.save()
+        return stop_check_rewrite, stop_check_solution
 
-            feedback = {
-                "mistakes": Problem.get_all_steps_mistakes(step.problem),
-                "stop_check_rewrite": stop_check_rewrite,
-                "stop_check_solution": stop_check_solution,
-                "variable_isolated": Problem.variable_isolated_side(step.problem),
-            }
 
-            response = JsonResponse(feedback)
+# The page numbers the edits of each expression with a version that only goes up. An edit that comes in after a later
+# one was saved is dropped, and after saving an edit this waits ALGEBRA_EDIT_COALESCE_SECONDS and drops it too if
+# another edit of the expression was saved in the meantime. Either way the response is just {"stale": True}, so while
+# someone types, the mistakes are only found for the last thing they typed.
+# This view is async. The edit is saved with the async ORM and the wait holds no thread, and only the edits that are
+# still the latest after it get a thread from utils/blocking.py to find the mistakes. It isn't one transaction, so that
+# a later edit can be saved while an earlier one waits.
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class UpdateExpressionView(View):
+    async def post(self, request):
+        step = await Step.objects.select_related("problem", "left_expr", "right_expr").aget(
+            id=int(request.POST["step-id"])
+        )
+        side = UpdateExpressionView.get_side(request.POST)
+        version = UpdateExpressionView.get_version(request.POST, side)
+        if version is not None:
+            latex_expr = UpdateExpressionView.get_latex(request.POST)
+            if not await Expression.asave_edit(getattr(step, f"{side}_expr"), latex_expr, version):
+                return JsonResponse({"stale": True, "version": version})
+            await asyncio.sleep(settings.ALGEBRA_EDIT_COALESCE_SECONDS)
+
+        feedback = await run_blocking(
+            UpdateExpressionView.finish_update, request.POST, request.session, step, side, version
+        )
 
-        return response
+        return JsonResponse(feedback)
+
+    # Saves the edit in data, which has the same keys as this view's POST data, and returns the feedback for it
+    # algebra/websocket.py uses this, without waiting, because it already only answers the last edit it was sent
+    @classmethod
+    def update(cls, data, session):
+        step = Step.objects.select_related("problem", "left_expr", "right_expr").get(id=int(data["step-id"]))
+        side = UpdateExpressionView.get_side(data)
+        version = UpdateExpressionView.get_version(data, side)
+        if version is not None:
+            latex_expr = UpdateExpressionView.get_latex(data)
+            if not Expression.save_edit(getattr(step, f"{side}_expr"), latex_expr, version):
+                return {"stale": True, "version": version}
 
+        return UpdateExpressionView.finish_update(data, session, step, side, version)
 
-class UpdateExpressionView(View):
     @classmethod
-    def post(cls, request):
-        response = None
-        step = Step.objects.get(id=int(request.POST["step-id"]))
+    def get_side(cls, data):
+        if "left" in data["side"]:
+            return "left"
+        elif "right" in data["side"]:
+            return "right"
 
-        side = None
+        return None
+
+    # The edit's version, or None if it doesn't have one or isn't for a side
+    @classmethod
+    def get_version(cls, data, side):
+        if side and data.get("version"):
+            return int(data["version"])
+
+        return None
+
+    @classmethod
+    def get_latex(cls, data):
         expression_max_length = Expression._meta.get_field("latex").max_length
-        if "left" in request.POST["side"]:
-            side = "left"
-            if len(request.POST["expression"]) < expression_max_length:
-                step.left_expr.latex = request.POST["expression"]
-            else:
-                step.left_expr.latex = request.POST["expression"][:expression_max_length]
-            step.left_expr.save()
-        elif "right" in request.POST["side"]:
-            side = "right"
-            if len(request.POST["expression"]) < expression_max_length:
-                step.right_expr.latex = request.POST["expression"]
+
+        return data["expression"][:expression_max_length]
+
+    # Saves the expression's parse, or the edit itself if it has no version, and returns the feedback
+    # An edit with a version was already saved, and is stale if a later one was saved since
+    @classmethod
+    def finish_update(cls, data, session, step, side, version):
+        if side:
+            expression = getattr(step, f"{side}_expr")
+            if version is None:
+                expression.latex = UpdateExpressionView.get_latex(data)
+                expression.save()
             else:
-                step.right_expr.latex = request.POST["expression"][:expression_max_length]
-            step.right_expr.save()
+                expression.refresh_from_db()
+                if expression.edit_version != version:
+                    return {"stale": True, "version": version}
+                # Only the parse is saved, so a later edit saved in the meantime isn't written over
+                expression.save(update_fields=Expression.PARSE_FIELDS)
+
+        return UpdateExpressionView.get_feedback(data, session, step, side, version)
+
+    @classmethod
+    def get_feedback(cls, data, session, step, side, version):
+        stop_check = UpdateExpressionView.get_stop_check(step, side)
+
+        snapshot = ProblemSnapshot(step.problem)
+        snapshot.reconcile()
+        badge_updates = {}
+        if side:
+            badge_updates = UpdateExpressionView.get_badge_updates(snapshot, step, side)
+        feedback = {
+            "variable_options": snapshot.get_variable_options(),
+            **snapshot.get_mistakes_feedback(session, data.get("mistakes-version")),
+            "stop_check": stop_check,
+            "badge_updates": badge_updates,
+            "variable_isolated": snapshot.get_variable_isolated(),
+            "version": version,
+        }
 
-        stop_check = None  # could be stopping a check rewrite or a check solution
-        all_steps = Step.objects.filter(problem=step.problem).order_by("created")
+        return feedback
 
-        left_var_options = Expression.get_variables_in_latex_expression(all_steps.first().left_expr.latex)
-        right_var_options = Expression.get_variables_in_latex_expression(all_steps.first().right_expr.latex)
-        variable_options = set(left_var_options + right_var_options)
+    # Editing an expression could have an effect on it's badge count, the previous step's badge count, or the next
+    # one's, so this is {step id: badge} for those steps on the edited side
+    @classmethod
+    def get_badge_updates(cls, snapshot, step, side):
+        badge_updates = {}
+        for step_to_match in [snapshot.get_prev(step), snapshot.get_next(step), step]:
+            if step_to_match:
+                badge_updates[step_to_match.id] = snapshot.get_badge(step_to_match, side)
+
+        return badge_updates
 
+    # "rewrite" or "solution" if the edited expression has to stop the check that is running, or None
+    @classmethod
+    def get_stop_check(cls, step, side):
+        stop_check = None
         if CheckRewrite.is_currently_checking(step.id, side):
             active_process = CheckRewrite.objects.get(problem=step.problem, end_time__isnull=True)
             if active_process.expr1 == getattr(step, f"{side}_expr"):
@@ -239,38 +360,10 @@ class UpdateExpressionView(View):
         elif CheckSolution.objects.filter(problem=step.problem, end_time__isnull=True).count():
             stop_check = "solution"
 
-        # Editing an expression could have an effect on it's badge count, the previous step's badge count, or the
-        # next one's
-        badge_updates = {}
-        for e in range(0, 3):
-            step_to_match = step
-            if e == 0:
-                step_to_match = Step.get_prev(step)
-            elif e == 1:
-                step_to_match = Step.get_next(step)
-
-            if step_to_match:
-                completed_checks = CheckRewrite.get_matching_completed_checks("CheckRewrite", step_to_match, side)
-                badge_updates[step_to_match.id] = {
-                    "count": completed_checks.count(),
-                    "color": "info",
-                }
-                for p in completed_checks:
-                    if not p.are_equivalent:
-                        badge_updates[step_to_match.id]["color"] = "danger"
-        feedback = {
-            "variable_options": sorted(list(variable_options)),
-            "mistakes": Problem.get_all_steps_mistakes(step.problem),
-            "stop_check": stop_check,
-            "badge_updates": badge_updates,
-            "variable_isolated": Problem.variable_isolated_side(step.problem),
-        }
-
-        response = JsonResponse(feedback)
-
-        return response
+        return stop_check
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class UpdateVariableView(View):
     @classmethod
     def post(cls, request):
@@ -278,14 +371,17 @@ class UpdateVariableView(View):
         problem.variable = request.POST["variable"]
         problem.save()
 
+        snapshot = ProblemSnapshot(problem)
+        snapshot.reconcile()
         feedback = {
-            "mistakes": Problem.get_all_steps_mistakes(problem),
-            "variable_isolated": Problem.variable_isolated_side(problem),
+            **snapshot.get_mistakes_feedback(request.session, request.POST.get("mistakes-version")),
+            "variable_isolated": snapshot.get_variable_isolated(),
         }
 
         return JsonResponse(feedback)
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class UpdateHelpClickView(View):
     @classmethod
     def post(cls, request):
@@ -299,65 +395,65 @@ class UpdateHelpClickView(View):
             help_obj = HelpClick(
                 sandbox=Sandbox.ALGEBRA, object_type=HelpClick.EXPRESSION, object_id=step.left_expr.id
             )
-            help_obj.save()
             mistake_index = 0
         elif "right" in request.POST["side"]:
             help_obj = HelpClick(
                 sandbox=Sandbox.ALGEBRA, object_type=HelpClick.EXPRESSION, object_id=step.right_expr.id
             )
-            help_obj.save()
             mistake_index = 1
         else:
             response = JsonResponse({"error": "there was an error updating the help clicks"})
 
         if not response:
-            Mistake.save_new(step.problem.id, help_obj, mistake_titles[mistake_index])
+            with transaction.atomic():
+                help_obj.save()
+                mistake_recorder = MistakeRecorder(step.problem.student_id)
+                mistake_recorder.add(help_obj, mistake_titles[mistake_index])
+                mistake_recorder.save()
             # remind them how often they check for help or something?
             response = JsonResponse({})
 
         return response
 
 
+# Async, with the work done on a thread from utils/blocking.py
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class AttemptNewStepView(View):
-    @classmethod
-    def post(cls, request):
-        problem = Problem.objects.get(id=request.POST["problem-id"])
+    async def post(self, request):
+        problem = await Problem.objects.aget(id=request.POST["problem-id"])
 
-        proceed_obj = Proceed(sandbox=Sandbox.ALGEBRA, problem_id=problem.id, proceed_type=Proceed.ADD_STEP)
-        proceed_obj.save()
-
-        next_action = "append"
-        for step in Step.objects.filter(problem=problem).order_by("created"):
-            mistake_titles = Step.get_mistakes(step)
-            if mistake_titles[0] != Mistake.NONE or mistake_titles[1] != Mistake.NONE:
-                if mistake_titles[0] != Mistake.NONE:
-                    mistake_obj = Mistake(
-                        owner=problem.student,
-                        mistake_type=mistake_titles[0],
-                        mistake_event_type=Mistake.PROCEED,
-                        event_id=proceed_obj.id,
-                    )
-                    mistake_obj.save()
-                if mistake_titles[1] != Mistake.NONE:
-                    mistake_obj = Mistake(
-                        owner=problem.student,
-                        mistake_type=mistake_titles[1],
-                        mistake_event_type=Mistake.PROCEED,
-                        event_id=proceed_obj.id,
-                    )
-                    mistake_obj.save()
-
-            if not step.left_expr.latex or len(step.left_expr.latex) == 0:
-                next_action = "alert"
-            elif not step.right_expr.latex or len(step.right_expr.latex) == 0:
-                next_action = "alert"
-
-        if next_action == "append":
-            new_step = Step.save_new(problem)
-
-            return JsonResponse({"next_action": next_action, "new_step_id": new_step.id})
-        else:
-            return JsonResponse({"next_action": next_action})
+        return JsonResponse(await run_blocking(AttemptNewStepView.attempt_new_step, problem))
+
+    # Records the attempt and the mistakes it was made with, and adds a step if none of the steps are blank
+    # The mistakes are found first, and everything is saved together after
+    @classmethod
+    def attempt_new_step(cls, problem):
+        snapshot = ProblemSnapshot(problem)
+
+        with transaction.atomic():
+            proceed_obj = Proceed(sandbox=Sandbox.ALGEBRA, problem_id=problem.id, proceed_type=Proceed.ADD_STEP)
+            proceed_obj.save()
+
+            next_action = "append"
+            snapshot.reconcile()
+            mistake_recorder = MistakeRecorder(problem.student_id)
+            for step in snapshot.steps:
+                for mistake_title in snapshot.all_mistake_titles[step.id]:
+                    if mistake_title != Mistake.NONE:
+                        mistake_recorder.add(proceed_obj, mistake_title)
+
+                if not step.left_expr.latex or len(step.left_expr.latex) == 0:
+                    next_action = "alert"
+                elif not step.right_expr.latex or len(step.right_expr.latex) == 0:
+                    next_action = "alert"
+            mistake_recorder.save()
+
+            if next_action == "append":
+                new_step = Step.save_new(problem)
+
+                return {"next_action": next_action, "new_step_id": new_step.id}
+            else:
+                return {"next_action": next_action}
 
 
 class NewStepView(TemplateView):
@@ -380,6 +476,7 @@ class NewStepView(TemplateView):
         return context
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class DeleteStepView(View):
     @classmethod
     def post(cls, request):
@@ -389,15 +486,130 @@ class DeleteStepView(View):
         if CheckRewrite.is_currently_checking(step.id, "left") or CheckRewrite.is_currently_checking(step.id, "right"):
             stop_check = "rewrite"
 
-        step.left_expr.delete()
-        step.right_expr.delete()
-        step.delete()
+        with transaction.atomic():
+            Step.delete_step(step)
 
-        feedback = {"mistakes": Problem.get_all_steps_mistakes(step.problem), "stop_check": stop_check}
+        snapshot = ProblemSnapshot(step.problem)
+        snapshot.reconcile()
+        feedback = {
+            **snapshot.get_mistakes_feedback(request.session, request.POST.get("mistakes-version")),
+            "stop_check": stop_check,
+        }
 
         return JsonResponse(feedback)
 
 
+# Applies several edits to one problem in a single transaction and finds the problem's mistakes once, after the last
+# one. This is for changes the page makes together, like pasting an equation into both sides of a step and picking its
+# step type. request.POST["edits"] is a JSON list of edits, each one like
+#     {"edit": "expression", "step-id": 12, "side": "left", "expression": "2x+4"}
+#     {"edit": "step-type", "step-id": 12, "step-type": "Rewrite"}
+#     {"edit": "variable", "variable": "x"}
+#     {"edit": "delete", "step-id": 12}
+# The response is the same as UpdateExpressionView's, so the page shows it the same way. request.POST["side"] is the
+# side badge_updates is for, like UpdateExpressionView's, or the side of the last expression edit if it isn't there,
+# and request.POST["version"] is sent back as version. If any edit is wrong, none of them are saved.
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class BatchEditView(View):
+    @classmethod
+    def post(cls, request):
+        problem = Problem.objects.filter(id=request.POST["problem-id"], student_id=request.user.id).first()
+        if problem is None:
+            return JsonResponse({"error": "there was an error applying the edits"})
+        steps = {
+            step.id: step
+            for step in Step.objects.filter(problem=problem).select_related("problem", "left_expr", "right_expr")
+        }
+
+        try:
+            edits = json.loads(request.POST["edits"])
+            BatchEditView.parse_expressions(edits)
+            with transaction.atomic():
+                stop_checks = BatchEditView.apply_edits(problem, steps, edits)
+        except (KeyError, TypeError, ValueError):
+            return JsonResponse({"error": "there was an error applying the edits"})
+
+        expression_edits = [edit for edit in edits if edit["edit"] == "expression"]
+        side = None
+        if request.POST.get("side"):
+            side = UpdateExpressionView.get_side(request.POST)
+        elif expression_edits:
+            side = expression_edits[-1]["side"]
+
+        snapshot = ProblemSnapshot(problem)
+        snapshot.reconcile()
+        badge_updates = {}
+        for edit in expression_edits:
+            if edit["side"] == side and int(edit["step-id"]) in steps:
+                badge_updates.update(
+                    UpdateExpressionView.get_badge_updates(snapshot, steps[int(edit["step-id"])], side)
+                )
+        feedback = {
+            "variable_options": snapshot.get_variable_options(),
+            **snapshot.get_mistakes_feedback(request.session, request.POST.get("mistakes-version")),
+            "stop_check": next((stop_check for stop_check in stop_checks if stop_check), None),
+            "badge_updates": badge_updates,
+            "variable_isolated": snapshot.get_variable_isolated(),
+            "version": UpdateExpressionView.get_version(request.POST, side),
+        }
+
+        return JsonResponse(feedback)
+
+    # Parses the new expressions before the transaction is started, so saving them in it finds their parse in
+    # Expression.sympy_cache instead of waiting on SymPy
+    @classmethod
+    def parse_expressions(cls, edits):
+        expression_max_length = Expression._meta.get_field("latex").max_length
+        for edit in edits:
+            if edit["edit"] == "expression":
+                Expression.get_sympy_expression_from_latex(edit["expression"][:expression_max_length])
+
+    # Saves each edit in order, and returns the checks they have to stop the same way the single edit views do
+    # steps is every step in the problem by id, and deleted steps are taken out of it
+    @classmethod
+    def apply_edits(cls, problem, steps, edits):
+        expression_max_length = Expression._meta.get_field("latex").max_length
+        stop_checks = []
+        edited_sides = []
+        for edit in edits:
+            if edit["edit"] == "expression":
+                step = steps[int(edit["step-id"])]
+                if edit["side"] not in ["left", "right"]:
+                    raise ValueError(f"{edit['side']} is not a side")
+                expression = getattr(step, f"{edit['side']}_expr")
+                expression.latex = edit["expression"][:expression_max_length]
+                expression.save()
+                edited_sides.append((step, edit["side"]))
+            elif edit["edit"] == "step-type":
+                step = steps[int(edit["step-id"])]
+                step_type = UpdateStepTypeView.get_step_type(edit["step-type"])
+                if not step_type:
+                    raise ValueError(f"{edit['step-type']} is not a step type")
+                step.step_type = step_type
+                # Its position could be out of date if an earlier edit deleted a step
+                step.save(update_fields=["step_type"])
+                stop_check_rewrite, stop_check_solution = UpdateStepTypeView.get_stop_checks(step)
+                stop_checks += ["rewrite" if stop_check_rewrite else None, "solution" if stop_check_solution else None]
+            elif edit["edit"] == "variable":
+                problem.variable = edit["variable"]
+                problem.save()
+            elif edit["edit"] == "delete":
+                step = steps.pop(int(edit["step-id"]))
+                for side in ["left", "right"]:
+                    if CheckRewrite.is_currently_checking(step.id, side):
+                        stop_checks.append("rewrite")
+                Step.delete_step(step)
+            else:
+                raise ValueError(f"{edit['edit']} is not an edit")
+
+        # Expressions are compared with the check that is running once they have their final latex
+        for step, side in edited_sides:
+            if step.id in steps:
+                stop_checks.append(UpdateExpressionView.get_stop_check(step, side))
+
+        return stop_checks
+
+
 # Create your views here.
 class RecentTableView(ListView):
     model = Problem
@@ -434,3 +646,19 @@ class RecentTableView(ListView):
         }
         recent_qs = Problem.populate_recent_table(self.request.user.id, recent_filter)
         return recent_qs
+
+
+# Shows how busy this process's SymPy pool is and how well its caches are working, so they can be sized
+class SympyStatsView(UserPassesTestMixin, View):
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        pool = get_sympy_pool()
+        stats = {
+            "pool": pool.stats() if pool else None,
+            "parse_cache": Expression.sympy_cache.stats(),
+            "equivalence_cache": equivalence_cache.stats(),
+        }
+
+        return JsonResponse(stats)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import close_old_connections, connections
+from django.http import HttpRequest, QueryDict
+from django.http.cookie import parse_cookie
+from django.http.request import split_domain_port, validate_host
+
+from sandbox_math.algebra.models import Problem, Step
+from sandbox_math.algebra.snapshot import SENT_MISTAKES_SESSION_KEY
+from sandbox_math.algebra.views import UpdateExpressionView
+from sandbox_math.calculator.views import GetResponseView
+
+# The algebra page keeps a websocket open to /ws/algebra/<problem_id>/ and sends it the expression edits and calculator
+# messages it would otherwise post to UpdateExpressionView and GetResponseView, as JSON like
+#     {"type": "expression", "step-id": 12, "side": "left-mq-input", "expression": "2x+4", "version": 1697...}
+#     {"type": "message", "sandbox": "Algebra", "message": "3+4", "caller": "SubmitUserMessage"}
+# Each expression edit is answered with {"type": "feedback", "step-id": ..., "side": ...} and the same keys as
+# UpdateExpressionView's feedback, and each calculator message with {"type": "response", "html": ...}.
+# The session and user are loaded once when the socket connects, not for every keystroke. Messages are answered one at
+# a time in the order they came, and edits of an expression that are replaced by a later edit before they are answered
+# are dropped.
+
+logger = logging.getLogger(__name__)
+
+SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+
+
+def get_header(scope, name):
+    for header_name, value in scope["headers"]:
+        if header_name == name:
+            return value.decode("latin1")
+
+    return ""
+
+
+# Browsers send cookies with websockets opened by any site, so only pages from this site can open one
+def is_allowed_origin(scope):
+    host, port = split_domain_port(urlsplit(get_header(scope, b"origin")).netloc)
+
+    return bool(host) and validate_host(host, settings.ALLOWED_HOSTS)
+
+
+# The page's message, or {"type": "invalid"} if it isn't one
+def read_message(text):
+    try:
+        message = json.loads(text)
+    except (TypeError, ValueError):
+        return {"type": "invalid"}
+    if not isinstance(message, dict):
+        return {"type": "invalid"}
+
+    return message
+
+
+# Drops the edits that a later edit of the same expression replaces
+def get_latest_messages(messages):
+    latest_messages = []
+    for message in messages:
+        if message.get("type") == "expression":
+            latest_messages = [m for m in latest_messages if not is_same_expression(m, message)]
+        latest_messages.append(message)
+
+    return latest_messages
+
+
+def is_same_expression(message, other_message):
+    return (
+        message.get("type") == "expression"
+        and message.get("step-id") == other_message.get("step-id")
+        and message.get("side") == other_message.get("side")
+    )
+
+
+# Everything about one socket that is loaded from the database, which is only ever used from sync_to_async
+class LiveFeedback:
+    def __init__(self, scope, problem_id):
+        self.problem_id = problem_id
+        session_key = parse_cookie(get_header(scope, b"cookie")).get(settings.SESSION_COOKIE_NAME)
+        self.session = SessionStore(session_key)
+        request = HttpRequest()
+        request.session = self.session
+        self.user = auth.get_user(request)
+        # Mistakes are sent as changes from what this socket sent before, starting from what the page was rendered with
+        self.sent_mistakes = {}
+        if SENT_MISTAKES_SESSION_KEY in self.session:
+            self.sent_mistakes[SENT_MISTAKES_SESSION_KEY] = self.session[SENT_MISTAKES_SESSION_KEY]
+
+    def can_edit(self):
+        return (
+            self.user.is_authenticated and Problem.objects.filter(id=self.problem_id, student_id=self.user.id).exists()
+        )
+
+    def answer(self, message):
+        # What Django does at the start of each request, so a connection that was closed or is too old isn't used
+        close_old_connections()
+        try:
+            if message["type"] == "expression":
+                if not Step.objects.filter(id=int(message["step-id"]), problem_id=self.problem_id).exists():
+                    return {"type": "error", "error": "that step is not in this problem"}
+                feedback = UpdateExpressionView.update(message, self.sent_mistakes)
+                return {"type": "feedback", "step-id": message["step-id"], "side": message["side"], **feedback}
+            elif message["type"] == "message":
+                return {"type": "response", "html": self.get_response_html(message)}
+        except (KeyError, TypeError, ValueError, ObjectDoesNotExist):
+            pass
+
+        return {"type": "error", "error": "there was an error answering the message"}
+
+    # The same html GetResponseView sends back for the message
+    def get_response_html(self, message):
+        request = HttpRequest()
+        request.method = "GET"
+        request.GET = QueryDict(mutable=True)
+        request.GET.update(
+            {
+                "sandbox": message["sandbox"],
+                "problem_id": str(self.problem_id),
+                "message": message["message"],
+                "caller": message["caller"],
+            }
+        )
+        request.user = self.user
+        request.session = self.session
+        view = GetResponseView()
+        view.setup(request)
+
+        return view.respond(request).content.decode()
+
+
+async def algebra_feedback_application(scope, receive, send, problem_id):
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+
+    # Everything this socket does in sync_to_async runs on one thread of its own, like a request does
+    async with ThreadSensitiveContext():
+        live_feedback = None
+        if is_allowed_origin(scope):
+            live_feedback = await sync_to_async(LiveFeedback)(scope, problem_id)
+        if live_feedback is None or not await sync_to_async(live_feedback.can_edit)():
+            await send({"type": "websocket.close", "code": 4403})
+            return
+
+        await send({"type": "websocket.accept"})
+        messages = asyncio.Queue()
+        answering = asyncio.create_task(answer_messages(live_feedback, messages, send))
+        try:
+            while True:
+                event = await receive()
+                if event["type"] == "websocket.disconnect":
+                    break
+                elif event["type"] == "websocket.receive":
+                    messages.put_nowait(event.get("text"))
+        finally:
+            answering.cancel()
+            await asyncio.gather(answering, return_exceptions=True)
+            await sync_to_async(connections.close_all)()
+
+
+# Answers the messages as they come, taking all the ones that are waiting at once so replaced edits can be dropped
+async def answer_messages(live_feedback, messages, send):
+    while True:
+        texts = [await messages.get()]
+        while not messages.empty():
+            texts.append(messages.get_nowait())
+
+        for text in texts:
+            if text == "ping":
+                await send({"type": "websocket.send", "text": "pong!"})
+        for message in get_latest_messages([read_message(text) for text in texts if text != "ping"]):
+            try:
+                answer = await sync_to_async(live_feedback.answer)(message)
+            except Exception:
+                # The page goes back to sending everything over HTTP when the socket closes
+                logger.exception("Could not answer a message on the algebra websocket")
+                await send({"type": "websocket.close", "code": 1011})
+                return
+            await send({"type": "websocket.send", "text": json.dumps(answer)})
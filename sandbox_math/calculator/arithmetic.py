@@ -0,0 +1,162 @@
+import re
+from fractions import Fraction
+
+# The calculator mostly gets plain arithmetic like \frac{3}{4}+2^{5}, and parsing that with parse_expr and then calling
+# simplify just to get a number is slow. evaluate_arithmetic works out the exact value of a SymPy-friendly string from
+# algebra/latex_parser.py with Fractions, following the same rules parse_expr does: ** before unary minus before * and
+# /, implicit multiplication like 2(3), and ** grouping from the right. Anything else, like decimals, roots, variables
+# or dividing by zero, is left to SymPy.
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d+)|(\*\*|[-+*/(){}]))")
+CLOSING = {"(": ")", "{": "}"}
+# Values with more bits than this raise TooBig, so 9^{9^{9}} can't hang the request. Python won't turn an int with more
+# than 4300 digits into a string, and 14000 bits is about 4200 digits, so get_fraction_latex can always write a value.
+MAX_BITS = 14000
+
+
+# Raised when a string is not something evaluate_arithmetic can work out exactly
+class NotArithmetic(Exception):
+    pass
+
+
+# Raised when the value is plain arithmetic but too big to write out
+# SymPy can't write it either, so it isn't left to SymPy
+class TooBig(NotArithmetic):
+    pass
+
+
+# This returns the exact value of sympy_friendly_str as a Fraction, or raises NotArithmetic
+def evaluate_arithmetic(sympy_friendly_str):
+    tokens = get_tokens(sympy_friendly_str)
+    if not tokens:
+        raise NotArithmetic()
+
+    parser = ArithmeticParser(tokens)
+    value = parser.parse_sum()
+    if parser.peek() is not None:
+        raise NotArithmetic()
+    # Products of powers that are each small enough can still be too big
+    if max(value.numerator.bit_length(), value.denominator.bit_length()) > MAX_BITS:
+        raise TooBig()
+
+    return value
+
+
+# This returns the same latex that latex(simplify(...)) gives for a rational number
+def get_fraction_latex(value):
+    if value.denominator == 1:
+        return str(value.numerator)
+
+    sign = "- " if value < 0 else ""
+    return f"{sign}\\frac{{{abs(value.numerator)}}}{{{value.denominator}}}"
+
+
+# Numbers are returned as ints and everything else as the operator or bracket
+def get_tokens(sympy_friendly_str):
+    tokens = []
+    position = 0
+    end = len(sympy_friendly_str.rstrip())
+    while position < end:
+        token = TOKEN_PATTERN.match(sympy_friendly_str, position)
+        if not token:
+            raise NotArithmetic()
+
+        number, symbol = token.groups()
+        if number is not None:
+            if len(number) > 1 and number[0] == "0":
+                # parse_expr doesn't read numbers with leading zeros the way people do
+                raise NotArithmetic()
+            tokens.append(int(number))
+        else:
+            tokens.append(symbol)
+        position = token.end()
+
+    return tokens
+
+
+# A recursive descent parser that evaluates as it goes
+# MathQuill writes exponents like 2^{10}, so braces group the same way parentheses do
+class ArithmeticParser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise NotArithmetic()
+        self.position += 1
+        return token
+
+    def parse_sum(self):
+        value = self.parse_product()
+        while self.peek() in ("+", "-"):
+            if self.take() == "+":
+                value += self.parse_product()
+            else:
+                value -= self.parse_product()
+
+        return value
+
+    def parse_product(self):
+        value = self.parse_signed()
+        while True:
+            token = self.peek()
+            if token == "*":
+                self.take()
+                value *= self.parse_signed()
+            elif token == "/":
+                self.take()
+                divisor = self.parse_signed()
+                if divisor == 0:
+                    raise NotArithmetic()
+                value /= divisor
+            elif isinstance(token, int) or token in CLOSING:
+                # Implicit multiplication, like 2(3) or (2)(3)
+                value *= self.parse_signed()
+            else:
+                return value
+
+    def parse_signed(self):
+        if self.peek() == "-":
+            self.take()
+            return -self.parse_signed()
+        elif self.peek() == "+":
+            self.take()
+            return self.parse_signed()
+
+        return self.parse_power()
+
+    def parse_power(self):
+        base = self.parse_group()
+        if self.peek() != "**":
+            return base
+
+        self.take()
+        exponent = self.parse_signed()
+        if exponent.denominator != 1:
+            raise NotArithmetic()
+        if base == 0 and exponent < 0:
+            raise NotArithmetic()
+        bits = max(base.numerator.bit_length(), base.denominator.bit_length())
+        if bits * abs(exponent.numerator) > MAX_BITS:
+            raise TooBig()
+
+        return base**exponent.numerator
+
+    def parse_group(self):
+        token = self.take()
+        if isinstance(token, int):
+            return Fraction(token)
+        elif token in CLOSING:
+            value = self.parse_sum()
+            if self.take() != CLOSING[token]:
+                raise NotArithmetic()
+            return value
+
+        raise NotArithmetic()
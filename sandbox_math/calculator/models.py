@@ -2,8 +2,11 @@ from django.apps import apps
 from django.db import models
 from sympy import latex, simplify
 
+from sandbox_math.algebra.latex_parser import compile_latex
+from sandbox_math.calculator.arithmetic import NotArithmetic, TooBig, evaluate_arithmetic, get_fraction_latex
 from sandbox_math.sandbox.models import Sandbox
-from sandbox_math.users.models import Mistake
+from sandbox_math.users.mistake_catalog import ParseMistake
+from sandbox_math.utils.sympy_pool import run_sympy
 
 
 # Create your models here.
@@ -23,13 +26,21 @@ class UserMessage(models.Model):
         if any(msg in message_latex for msg in hidden_messages):
             content_type = Content.HIDDEN
 
+        message_content = Content(
+            user_message=new_message, content_type=content_type, content=UserMessage.get_content(message_latex)
+        )
+        message_content.save()
+
+        return new_message
+
+    # The message as it is saved in its Content
+    @classmethod
+    def get_content(cls, message_latex):
         message_max_length = Content._meta.get_field("content").max_length
         if len(message_latex.strip()) >= message_max_length:
             message_latex = message_latex[:message_max_length]
-        message_content = Content(user_message=new_message, content_type=content_type, content=message_latex)
-        message_content.save()
 
-        return new_message
+        return message_latex
 
     @classmethod
     def get_all_previous_for_problem(cls, problem_model, problem_id):
@@ -85,27 +96,53 @@ class Response(models.Model):
 
     @classmethod
     def get_context_of_last_response(cls, new_user_message_obj):
+        return Response.get_problem_context(new_user_message_obj.sandbox, new_user_message_obj.problem_id)
+
+    # The context of the last response in a problem's calculator
+    @classmethod
+    def get_problem_context(cls, sandbox, problem_id):
         last_response = Response.objects.filter(
-            user_message__sandbox=new_user_message_obj.sandbox,
-            user_message__problem_id=new_user_message_obj.problem_id,
+            user_message__sandbox=sandbox,
+            user_message__problem_id=problem_id,
         ).order_by("-timestamp")
         if not last_response:
             return Response.NO_CONTEXT
         else:
             return last_response.first().context
 
+    # responses is what get_no_context_responses returns for the message, if it was already worked out
+    @classmethod
+    def with_no_context(cls, user_message_obj, responses=None):
+        if responses is None:
+            user_message_latex = Content.objects.get(user_message=user_message_obj).content
+            responses = Response.get_no_context_responses(user_message_latex)
+
+        for r in responses:
+            Response.save_new(user_message_obj, r, Response.NO_CONTEXT)
+
+    # The responses to a message sent with no check going on, which only depend on the message, so they can be worked
+    # out before anything is saved
+    # Plain arithmetic is worked out exactly with calculator/arithmetic.py, and only anything else goes to SymPy
     @classmethod
-    def with_no_context(cls, user_message_obj):
+    def get_no_context_responses(cls, user_message_latex):
         expression_model = apps.get_model("algebra", "Expression")
         is_numeric = True
         responses = []
-        user_message_latex = Content.objects.get(user_message=user_message_obj).content
-        if expression_model.get_variables_in_latex_expression(user_message_latex):
+        try:
+            arithmetic_value = evaluate_arithmetic(compile_latex(user_message_latex))
+        except TooBig:
+            return ["That number is too big to show.", "Try something smaller."]
+        except NotArithmetic:
+            arithmetic_value = None
+
+        if arithmetic_value is not None:
+            responses.append(f"`/{get_fraction_latex(arithmetic_value)}`")
+        elif expression_model.get_variables_in_latex_expression(user_message_latex):
             is_numeric = False
         else:
             sympy_user_message = expression_model.get_sympy_expression_from_latex(user_message_latex)
-            if sympy_user_message not in list(zip(*Mistake.MISTAKE_TYPES))[0]:
-                response = simplify(sympy_user_message)
+            if not isinstance(sympy_user_message, ParseMistake):
+                response = run_sympy(simplify, sympy_user_message)
                 responses.append(f"`/{latex(response)}`")
             else:
                 is_numeric = False
@@ -117,8 +154,7 @@ class Response(models.Model):
                 responses.append(f"I don't know how to calculate `/{user_message_latex}`.")
             responses.append("Try something else.")
 
-        for r in responses:
-            Response.save_new(user_message_obj, r, Response.NO_CONTEXT)
+        return responses
 
 
 class Content(models.Model):
@@ -0,0 +1,65 @@
+from fractions import Fraction
+
+import pytest
+from sympy import latex, simplify
+
+from sandbox_math.algebra.latex_parser import compile_latex
+from sandbox_math.algebra.models import Expression
+from sandbox_math.calculator.arithmetic import NotArithmetic, TooBig, evaluate_arithmetic, get_fraction_latex
+from sandbox_math.calculator.models import Response
+
+
+@pytest.mark.parametrize(
+    "latex_expr",
+    [
+        "\\frac{3}{4}+2^5",
+        "-\\frac{3}{4}",
+        "2\\left(3\\right)",
+        "\\left(2\\right)\\left(3\\right)",
+        "3--2",
+        "-2^2",
+        "2^-3^2",
+        "2^3^2",
+        "\\frac{6}{3}",
+        "0^0",
+        "10^30",
+        "3\\cdot +2",
+        "\\frac{1}{\\frac{2}{3}}-7",
+    ],
+)
+def test_evaluate_arithmetic_matches_simplify(latex_expr):
+    sympy_expr = Expression.get_sympy_expression_from_latex(latex_expr)
+
+    value = evaluate_arithmetic(compile_latex(latex_expr))
+    assert get_fraction_latex(value) == latex(simplify(sympy_expr))
+
+
+# parse_expr reads {} as a set, but MathQuill uses them to group exponents
+def test_evaluate_arithmetic_braces():
+    assert evaluate_arithmetic(compile_latex("\\frac{3}{4}+2^{5}")) == Fraction(131, 4)
+    assert evaluate_arithmetic(compile_latex("2^{10}")) == 1024
+
+
+@pytest.mark.parametrize(
+    "latex_expr",
+    ["", "x+1", "0.5+1", "2^{\\frac{1}{2}}", "\\frac{1}{0}", "0^{-1}", "007", "3+", "(3", "()", "9^{9^9}"],
+)
+def test_evaluate_arithmetic_leaves_the_rest_to_sympy(latex_expr):
+    with pytest.raises(NotArithmetic):
+        evaluate_arithmetic(compile_latex(latex_expr))
+
+
+# Values too big to write out are answered without SymPy, which can't write them either
+@pytest.mark.parametrize("latex_expr", ["2^{20000}", "2^20000", "\\frac{1}{3^{10000}}", "2^{10000}\\cdot 2^{10000}"])
+def test_evaluate_arithmetic_too_big(latex_expr):
+    with pytest.raises(TooBig):
+        evaluate_arithmetic(compile_latex(latex_expr))
+    assert Response.get_no_context_responses(latex_expr) == [
+        "That number is too big to show.",
+        "Try something smaller.",
+    ]
+
+
+# The biggest values that aren't too big can still be written out
+def test_get_fraction_latex_largest_value():
+    assert get_fraction_latex(evaluate_arithmetic(compile_latex("2^{7000}\\cdot 2^{6999}"))) == str(2**13999)
@@ -0,0 +1,23 @@
+import pytest
+from django.urls import reverse
+
+from sandbox_math.algebra.models import Step
+from sandbox_math.algebra.tests.test_models import make_problem
+from sandbox_math.calculator.models import Response
+
+
+# GetResponseView is async and responds on another thread, which can't see a test's transaction
+# A number too big to write out, like 2^{20000}, gets an answer too
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("message, answer", [("3+4", "7"), ("2^{20000}", "too big to show")])
+def test_get_response(client, user, message, answer):
+    client.force_login(user)
+    problem = make_problem(user, "x", [(Step.DEFINE, "2x+4", "10")])
+
+    response = client.get(
+        reverse("calculator:get_response"),
+        {"sandbox": "Algebra", "problem_id": problem.id, "message": message, "caller": "SubmitUserMessage"},
+    )
+    assert response.status_code == 200
+    assert Response.objects.filter(user_message__problem_id=problem.id).exists()
+    assert answer in response.content.decode()
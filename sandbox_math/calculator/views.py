@@ -1,34 +1,88 @@
+from django.db import transaction
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views.generic.base import TemplateView
 
 from sandbox_math.algebra.models import CheckRewrite, CheckSolution, Problem, Step
 from sandbox_math.calculator.models import Response, UserMessage
 from sandbox_math.sandbox.models import Sandbox
 from sandbox_math.users.models import Mistake
+from sandbox_math.utils.blocking import run_blocking
+from sandbox_math.utils.sympy_pool import SympyTimeout
 
 
 # Create your views here.
+# This view is async, and responds on a thread from utils/blocking.py
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class GetResponseView(TemplateView):
     template_name = "calculator/response.html"
 
+    async def get(self, request, *args, **kwargs):
+        return await run_blocking(self.respond, request)
+
+    # If SymPy runs out of time while responding, everything this message did is undone and the student is told to
+    # try something simpler, so a check process is never left half way through a step
+    # The response is rendered here too, so its queries are in the same transaction and thread
+    def respond(self, request):
+        self.no_context_responses = self.get_no_context_responses()
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    response = super().get(request, *self.args, **self.kwargs)
+            except SympyTimeout:
+                user_message_obj = self.save_user_message()
+                Response.save_new(
+                    user_message_obj,
+                    Mistake.get_mistake_message(Mistake.TIMEOUT),
+                    Response.get_context_of_last_response(user_message_obj),
+                )
+                response = self.render_to_response(
+                    {"responses": Response.objects.filter(user_message=user_message_obj).order_by("id")}
+                )
+
+            return response.render()
+
+    # A message sent with no check going on is answered from the message alone, so its answer is worked out here,
+    # before the transaction is started, instead of while it holds locks. A check goes step by step from what it saved
+    # before, so its SymPy work still happens in the transaction.
+    # Returns None if the message isn't answered that way, or the answer has to be worked out again in the transaction
+    def get_no_context_responses(self):
+        sandbox = self.request.GET.get("sandbox")
+        problem_id = self.request.GET.get("problem_id")
+        if self.request.GET.get("caller") != "SubmitUserMessage" or sandbox not in dict(Sandbox.SANDBOX_TYPES):
+            return None
+        if Response.get_problem_context(sandbox, problem_id) != Response.NO_CONTEXT:
+            return None
+
+        try:
+            return Response.get_no_context_responses(UserMessage.get_content(self.request.GET.get("message")))
+        except SympyTimeout:
+            return None
+
+    def save_user_message(self):
+        user_message_obj = UserMessage.objects.none()
+        for s in Sandbox.SANDBOX_TYPES:
+            if s[0] == self.request.GET.get("sandbox"):
+                user_message_obj = UserMessage.save_new(
+                    s[0], self.request.GET.get("problem_id"), self.request.GET.get("message")
+                )
+
+        return user_message_obj
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user_message = self.request.GET.get("message")
         problem_id = self.request.GET.get("problem_id")
-        sandbox = self.request.GET.get("sandbox")
         caller = self.request.GET.get("caller")
 
-        user_message_obj = UserMessage.objects.none()
-        for s in Sandbox.SANDBOX_TYPES:
-            if s[0] == sandbox:
-                user_message_obj = UserMessage.save_new(s[0], problem_id, user_message)
+        user_message_obj = self.save_user_message()
 
         current_context = Response.get_context_of_last_response(user_message_obj)
 
         if caller == "SubmitUserMessage":
             if current_context == Response.NO_CONTEXT:
                 # User is submitting a message with no context (looking for an arithmetic response)
-                Response.with_no_context(user_message_obj)
+                Response.with_no_context(user_message_obj, self.no_context_responses)
             elif current_context == Response.CHOOSE_REWRITE_VALUES:
                 if user_message == "stop":
                     CheckRewrite.create_stop_response("CheckRewrite", user_message_obj, None)
@@ -80,10 +80,10 @@ class CheckAlgebra(models.Model):
             new_check.expr1 = getattr(expr1_step, f"{side}_expr")
             new_check.expr2 = getattr(step_model.get_prev(expr1_step), f"{side}_expr")
         else:
-            equation_step = step_model.objects.filter(problem=expr1_step.problem).order_by("created").first()
+            equation_step = step_model.objects.filter(problem=expr1_step.problem).order_by("position").first()
             new_check.expr1 = equation_step.left_expr
             new_check.expr2 = equation_step.right_expr
-            answer_step = step_model.objects.filter(problem=expr1_step.problem).order_by("created").last()
+            answer_step = step_model.objects.filter(problem=expr1_step.problem).order_by("position").last()
             if answer_step.left_expr.latex == new_check.solving_for:
                 new_check.attempt = answer_step.right_expr.latex
             elif answer_step.right_expr.latex == new_check.solving_for:
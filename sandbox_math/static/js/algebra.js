@@ -1,5 +1,9 @@
 let MQ = null;
 let studentID = null;
+// The version of the mistakes the page is showing, see UpdateMistakes
+let mistakesVersion = '';
+// The websocket expression edits and calculator messages are sent over, see OpenFeedbackSocket
+let feedbackSocket = null;
 
 window.onresize = onWindowResize;
 
@@ -30,6 +34,8 @@ $(document).ready(function () {
   MQ = MathQuill.getInterface(2);
   studentID = $('#userID').html();
   let problemID = $('#unique-problem-id').html();
+  mistakesVersion = $('#unique-problem-id').attr('data-mistakes-version');
+  OpenFeedbackSocket();
 
   if ($('#userID').hasClass('is-guest')) {
     $('#not-logged-in-alert').removeClass('d-none');
@@ -335,6 +341,7 @@ function SaveNewProblem() {
           $('#step0Help').attr('id', newStepID + 'Help');
           InitializeNewStep(newStepID);
           ToggleNewAndCheckButtons(false);
+          OpenFeedbackSocket();
           resolve(newStepID);
         })
         .fail(function (error) {
@@ -385,10 +392,14 @@ async function StepTypeChanged(menuButtonObject) {
       url: '/algebra/update-step-type/',
       type: 'POST',
       headers: { 'X-CSRFToken': csrfToken },
-      data: { 'step-id': uniqueStepID, 'step-type': selectedHTML },
+      data: {
+        'step-id': uniqueStepID,
+        'step-type': selectedHTML,
+        'mistakes-version': mistakesVersion,
+      },
     })
       .done(function (response) {
-        UpdateAllExpressionHelp(response['mistakes']);
+        UpdateMistakes(response);
         let stepNumber = parseInt(
           $('#' + stepID + ' .step-number-inner').html(),
         );
@@ -434,88 +445,160 @@ async function ExpressionChanged(expressionObject) {
   }
   let uniqueStepID = parseInt(stepID.substring('step'.length, stepID.length));
 
+  // Every edit of an expression gets a higher version than the one before, even after the page is reloaded, so the
+  // server can drop edits that were replaced before it got to them
+  let version = Math.max(
+    Date.now(),
+    (expressionObject.data('editVersion') || 0) + 1,
+  );
+  expressionObject.data('editVersion', version);
+
+  let data = {
+    'step-id': uniqueStepID,
+    expression: newExpression,
+    side: expressionObject.attr('class'),
+    version: version,
+    'mistakes-version': mistakesVersion,
+  };
+  if (SendOverFeedbackSocket({ type: 'expression', ...data })) {
+    return;
+  }
+
   let csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
   $.ajax({
     url: '/algebra/update-expression/',
     type: 'POST',
     headers: { 'X-CSRFToken': csrfToken },
-    data: {
-      'step-id': uniqueStepID,
-      expression: newExpression,
-      side: expressionObject.attr('class'),
-    },
+    data: data,
   })
     .done(function (response) {
-      UpdateAllExpressionHelp(response['mistakes']);
-      let stepNumber = parseInt($('#' + stepID + ' .step-number-inner').html());
-      if (stepNumber === 1) {
-        let varToggle = $('#variableDropdown .dropdown-toggle');
-        let varMenu = $('#variableDropdown .dropdown-menu');
-
-        varToggle.html(response['selected_variable']);
-        varMenu.html('');
-        if (response['variable_options'].length > 0) {
-          // varToggle.prop("disabled", false)
-          for (let i = 0; i < response['variable_options'].length; i++) {
-            varMenu.append(
-              '<button class ="dropdown-item">' +
-                response['variable_options'][i] +
-                '</button>',
-            );
-          }
-        } else if (varToggle.html().length === 0) {
-          // varToggle.prop("disabled", true)
-        }
-
-        $('#variableDropdown > div.dropdown-menu button').click(function () {
-          VariableChanged($(this).html());
-        });
-      }
+      ShowExpressionFeedback(expressionObject, stepID, response);
+    })
+    .fail(function () {
+      ToggleNewAndCheckButtons(false);
+    });
+}
 
-      if (
-        response['stop_check'] === 'rewrite' ||
-        response['stop_check'] === 'solution'
-      ) {
-        GetResponse(
-          'stop-check-' + response['stop_check'],
-          'ExpressionChanged',
+// Shows the feedback for an edit of expressionObject, from UpdateExpressionView or the feedback socket
+function ShowExpressionFeedback(expressionObject, stepID, response) {
+  if (
+    response['stale'] ||
+    response['version'] !== expressionObject.data('editVersion')
+  ) {
+    // A later edit of this expression was sent, and its response will update the page
+    return;
+  }
+  UpdateMistakes(response);
+  let stepNumber = parseInt($('#' + stepID + ' .step-number-inner').html());
+  if (stepNumber === 1) {
+    let varToggle = $('#variableDropdown .dropdown-toggle');
+    let varMenu = $('#variableDropdown .dropdown-menu');
+
+    varToggle.html(response['selected_variable']);
+    varMenu.html('');
+    if (response['variable_options'].length > 0) {
+      // varToggle.prop("disabled", false)
+      for (let i = 0; i < response['variable_options'].length; i++) {
+        varMenu.append(
+          '<button class ="dropdown-item">' +
+            response['variable_options'][i] +
+            '</button>',
         );
       }
+    } else if (varToggle.html().length === 0) {
+      // varToggle.prop("disabled", true)
+    }
 
-      let side = 'left';
-      if (expressionObject.attr('class').includes('right')) {
-        side = 'right';
-      }
-      for (const [key, value] of Object.entries(response['badge_updates'])) {
-        let badge = $(
-          '#step' + key + ' button.check-rewrite-' + side + ' .badge',
-        );
-        badge.html(value['count']);
-        if (value['color'] === 'info') {
-          badge.removeClass('bg-faded-danger text-danger');
-          badge.addClass('bg-faded-info text-info');
-        } else {
-          badge.removeClass('bg-faded-info text-info');
-          badge.addClass('bg-faded-danger text-danger');
-        }
-      }
+    $('#variableDropdown > div.dropdown-menu button').click(function () {
+      VariableChanged($(this).html());
+    });
+  }
 
-      if (
-        ['left', 'right', 'inf many', 'no solution'].includes(
-          response['variable_isolated'],
-        )
-      ) {
-        $('#checkSolutionButton').removeClass('d-none');
-      } else {
-        $('#checkSolutionButton').addClass('d-none');
-      }
-      ToggleNewAndCheckButtons(false);
+  if (
+    response['stop_check'] === 'rewrite' ||
+    response['stop_check'] === 'solution'
+  ) {
+    GetResponse('stop-check-' + response['stop_check'], 'ExpressionChanged');
+  }
 
-      SetCalculatorHeight();
-    })
-    .fail(function () {
+  let side = 'left';
+  if (expressionObject.attr('class').includes('right')) {
+    side = 'right';
+  }
+  for (const [key, value] of Object.entries(response['badge_updates'])) {
+    let badge = $('#step' + key + ' button.check-rewrite-' + side + ' .badge');
+    badge.html(value['count']);
+    if (value['color'] === 'info') {
+      badge.removeClass('bg-faded-danger text-danger');
+      badge.addClass('bg-faded-info text-info');
+    } else {
+      badge.removeClass('bg-faded-info text-info');
+      badge.addClass('bg-faded-danger text-danger');
+    }
+  }
+
+  if (
+    ['left', 'right', 'inf many', 'no solution'].includes(
+      response['variable_isolated'],
+    )
+  ) {
+    $('#checkSolutionButton').removeClass('d-none');
+  } else {
+    $('#checkSolutionButton').addClass('d-none');
+  }
+  ToggleNewAndCheckButtons(false);
+
+  SetCalculatorHeight();
+}
+
+// Opens the live feedback websocket for the problem, see sandbox_math/algebra/websocket.py
+// Everything is sent over HTTP until it is open, and again if it closes
+function OpenFeedbackSocket() {
+  let problemID = $('#unique-problem-id').html();
+  if (!problemID || !window.WebSocket || feedbackSocket) {
+    return;
+  }
+
+  let protocol = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+  let socket = new WebSocket(
+    protocol + window.location.host + '/ws/algebra/' + problemID + '/',
+  );
+  socket.onopen = function () {
+    feedbackSocket = socket;
+  };
+  socket.onclose = function () {
+    if (feedbackSocket === socket) {
+      feedbackSocket = null;
+    }
+  };
+  socket.onmessage = function (event) {
+    let answer = JSON.parse(event.data);
+    if (answer['type'] === 'feedback') {
+      let stepID = 'step' + answer['step-id'];
+      let side = answer['side'].includes('right') ? 'right' : 'left';
+      ShowExpressionFeedback(
+        $('#' + stepID + ' .' + side + '-mq-input'),
+        stepID,
+        answer,
+      );
+    } else if (answer['type'] === 'response') {
+      let responseParent = $('#calculatorDialog .pending-response').first();
+      responseParent.removeClass('pending-response').html(answer['html']);
+      ShowResponse(responseParent);
+    } else if (answer['type'] === 'error') {
       ToggleNewAndCheckButtons(false);
-    });
+    }
+  };
+}
+
+// Sends message over the feedback socket, or returns false if it isn't open
+function SendOverFeedbackSocket(message) {
+  if (feedbackSocket && feedbackSocket.readyState === WebSocket.OPEN) {
+    feedbackSocket.send(JSON.stringify(message));
+    return true;
+  }
+
+  return false;
 }
 
 function VariableChanged(varSelected) {
@@ -530,10 +613,11 @@ function VariableChanged(varSelected) {
     data: {
       'problem-id': parseInt($('#unique-problem-id').html()),
       variable: varSelected,
+      'mistakes-version': mistakesVersion,
     },
   })
     .done(function (response) {
-      UpdateAllExpressionHelp(response['mistakes']);
+      UpdateMistakes(response);
       if (
         ['left', 'right', 'inf many', 'no solution'].includes(
           response['variable_isolated'],
@@ -627,7 +711,7 @@ async function DeleteStep(stepID) {
     url: '/algebra/delete-step/',
     type: 'POST',
     headers: { 'X-CSRFToken': csrfToken },
-    data: { 'step-id': uniqueStepID },
+    data: { 'step-id': uniqueStepID, 'mistakes-version': mistakesVersion },
   })
     .done(function (response) {
       $('#' + stepID).remove();
@@ -637,7 +721,7 @@ async function DeleteStep(stepID) {
         stepCount++;
       });
 
-      UpdateAllExpressionHelp(response['mistakes']);
+      UpdateMistakes(response);
 
       if (
         response['stop_check'] === 'rewrite' ||
@@ -654,6 +738,20 @@ async function DeleteStep(stepID) {
     });
 }
 
+// The server only sends the steps whose mistakes changed since mistakes_base, the version the page said it had. If the
+// page has moved on to another version since, it asks for every step next time.
+function UpdateMistakes(response) {
+  UpdateAllExpressionHelp(response['mistakes']);
+  if (
+    response['mistakes_base'] === null ||
+    response['mistakes_base'] === mistakesVersion
+  ) {
+    mistakesVersion = response['mistakes_version'];
+  } else {
+    mistakesVersion = '';
+  }
+}
+
 function UpdateAllExpressionHelp(updatedHelpDict) {
   let stillBlank = false;
   let blankExprAlert = $('#blank-expr-alert');
@@ -671,15 +769,19 @@ function UpdateAllExpressionHelp(updatedHelpDict) {
     $('#step' + stepID + 'Help .right-help-button-content').html(
       helpDict[1]['content'],
     );
-
-    if (
-      helpDict[0]['title'] === 'No Blank Expressions' ||
-      helpDict[1]['title'] === 'No Blank Expressions'
-    ) {
-      stillBlank = true;
-    }
   }
 
+  // Steps that didn't change aren't in updatedHelpDict, so every step's help is checked
+  $('.algebra-step').each(function () {
+    $('#' + $(this).attr('id') + 'Help')
+      .find('.left-help-button-title, .right-help-button-title')
+      .each(function () {
+        if ($(this).html().trim() === 'No Blank Expressions') {
+          stillBlank = true;
+        }
+      });
+  });
+
   if (!blankExprAlert.hasClass('d-none') && !stillBlank) {
     blankExprAlert.addClass('d-none');
   }
@@ -111,126 +111,137 @@ function SubmitUserMessage() {
 }
 
 function GetResponse(userMessageLatex, callerFunctionName) {
-  let timeBetweenMessages = 4500;
+  $('#calculatorDialog .simplebar-content').append(
+    "<div class='mb-3 w-75 response'></div>",
+  );
+  // The answer from the feedback socket goes in the first response that is still waiting for one
+  if (
+    SendOverFeedbackSocket({
+      type: 'message',
+      sandbox: 'Algebra',
+      message: userMessageLatex,
+      caller: callerFunctionName,
+    })
+  ) {
+    $('#calculatorDialog .response').last().addClass('pending-response');
+    return;
+  }
+
   let responseParameters =
     'sandbox=Algebra&problem_id=' + $('#unique-problem-id').html();
   responseParameters += '&message=' + encodeURIComponent(userMessageLatex);
   responseParameters += '&caller=' + encodeURIComponent(callerFunctionName);
 
-  $('#calculatorDialog .simplebar-content').append(
-    "<div class='mb-3 w-75 response'></div>",
-  );
   $('#calculatorDialog .response')
     .last()
     .load('/calculator/get-response/?' + responseParameters, function () {
-      let lastResponseParent = $('#calculatorDialog .response').last();
-      let lastResponses = lastResponseParent.find('.d-flex.align-items-end');
+      ShowResponse($('#calculatorDialog .response').last());
+    });
+}
 
-      // For each message in the response to the last user message (it might be split up into more than 1)
-      // show the message load animation and do not display the message
-      lastResponses.first().removeClass('d-none');
+// Shows the messages in lastResponseParent one at a time, once the response to the user's message is loaded into it
+function ShowResponse(lastResponseParent) {
+  let timeBetweenMessages = 4500;
+  let lastResponses = lastResponseParent.find('.d-flex.align-items-end');
+
+  // For each message in the response to the last user message (it might be split up into more than 1)
+  // show the message load animation and do not display the message
+  lastResponses.first().removeClass('d-none');
+  lastResponseParent
+    .find('.fs-xs.text-muted')
+    .first()
+    .removeClass('d-none');
+  //Now, since each response message for the last user message is hidden, this will make the messages appear
+  //and make the loading animation disappear every 1.2 seconds
+  let responseIndex = 0;
+  let appearInterval = setInterval(function () {
+    //code that makes responses appear
+    lastResponses
+      .eq(responseIndex)
+      .find('p.no-margin')
+      .each(function () {
+        if ($(this).hasClass('message-load-animation')) {
+          $(this).addClass('d-none');
+        } else {
+          $(this).removeClass('d-none');
+        }
+      });
+    responseIndex++;
+    if (responseIndex < lastResponses.length) {
+      lastResponses.eq(responseIndex).removeClass('d-none');
       lastResponseParent
         .find('.fs-xs.text-muted')
-        .first()
+        .eq(responseIndex)
         .removeClass('d-none');
-      //Now, since each response message for the last user message is hidden, this will make the messages appear
-      //and make the loading animation disappear every 1.2 seconds
-      let responseIndex = 0;
-      let appearInterval = setInterval(function () {
-        //code that makes responses appear
-        lastResponses
-          .eq(responseIndex)
-          .find('p.no-margin')
-          .each(function () {
-            if ($(this).hasClass('message-load-animation')) {
-              $(this).addClass('d-none');
-            } else {
-              $(this).removeClass('d-none');
-            }
-          });
-        responseIndex++;
-        if (responseIndex < lastResponses.length) {
-          lastResponses.eq(responseIndex).removeClass('d-none');
-          lastResponseParent
-            .find('.fs-xs.text-muted')
-            .eq(responseIndex)
-            .removeClass('d-none');
-        }
-
-        lastResponseParent.find('.latex-message-span').each(function () {
-          MQ.StaticMath($(this)[0]);
-        });
-
-        //lastResponseParent.find('.latex-message-span .mq-root-block').addClass('d-flex flex-wrap');
-
-        let simplebarWrapper = $(
-          '#calculatorDialog .simplebar-content-wrapper',
-        );
-        simplebarWrapper.animate(
-          { scrollTop: simplebarWrapper.prop('scrollHeight') },
-          'slow',
-        );
-      }, timeBetweenMessages);
-
-      //Once the last response is shown...
-      let calcInputField = MQ.MathField($('#calculatorInput')[0]);
-      setTimeout(
-        function () {
-          let stepID = lastResponseParent.find('.badge-step-id').html();
-          let side = 'right';
-          let badgeObj = $(
-            '#step' + stepID + ' button.check-rewrite-right .badge',
-          );
-          if (lastResponseParent.find('.new-badge-count-left').length) {
-            badgeObj = $(
-              '#step' + stepID + ' button.check-rewrite-left .badge',
-            );
-            side = 'left';
-          }
-          badgeObj.html(
-            $(lastResponseParent)
-              .find('.new-badge-count-' + side)
-              .html(),
-          );
-          if (lastResponseParent.find('.danger').length) {
-            badgeObj.removeClass('bg-faded-info text-info');
-            badgeObj.addClass('bg-faded-danger text-danger');
-          }
-
-          if (lastResponseParent.find('.finished').length) {
-            LockEverything();
-            stopConfetti = false;
-            poof();
-          }
+    }
 
-          $('#calculatorSubmit').prop('disabled', false);
-          if (calcInputField) {
-            calcInputField.config({
-              handlers: {
-                enter: function () {
-                  if (
-                    calcInputField.latex().length &&
-                    calcInputField.latex().length < 250
-                  ) {
-                    SubmitUserMessage();
-                    calcInputField.latex('');
-                  }
-                },
-              },
-            });
-          }
+    lastResponseParent.find('.latex-message-span').each(function () {
+      MQ.StaticMath($(this)[0]);
+    });
 
-          clearInterval(appearInterval);
-        },
-        lastResponses.length * timeBetweenMessages + 100,
+    //lastResponseParent.find('.latex-message-span .mq-root-block').addClass('d-flex flex-wrap');
+
+    let simplebarWrapper = $('#calculatorDialog .simplebar-content-wrapper');
+    simplebarWrapper.animate(
+      { scrollTop: simplebarWrapper.prop('scrollHeight') },
+      'slow',
+    );
+  }, timeBetweenMessages);
+
+  //Once the last response is shown...
+  let calcInputField = MQ.MathField($('#calculatorInput')[0]);
+  setTimeout(
+    function () {
+      let stepID = lastResponseParent.find('.badge-step-id').html();
+      let side = 'right';
+      let badgeObj = $('#step' + stepID + ' button.check-rewrite-right .badge');
+      if (lastResponseParent.find('.new-badge-count-left').length) {
+        badgeObj = $('#step' + stepID + ' button.check-rewrite-left .badge');
+        side = 'left';
+      }
+      badgeObj.html(
+        $(lastResponseParent)
+          .find('.new-badge-count-' + side)
+          .html(),
       );
+      if (lastResponseParent.find('.danger').length) {
+        badgeObj.removeClass('bg-faded-info text-info');
+        badgeObj.addClass('bg-faded-danger text-danger');
+      }
+
+      if (lastResponseParent.find('.finished').length) {
+        LockEverything();
+        stopConfetti = false;
+        poof();
+      }
+
+      $('#calculatorSubmit').prop('disabled', false);
+      if (calcInputField) {
+        calcInputField.config({
+          handlers: {
+            enter: function () {
+              if (
+                calcInputField.latex().length &&
+                calcInputField.latex().length < 250
+              ) {
+                SubmitUserMessage();
+                calcInputField.latex('');
+              }
+            },
+          },
+        });
+      }
 
-      let simplebarWrapper = $('#calculatorDialog .simplebar-content-wrapper');
-      simplebarWrapper.animate(
-        { scrollTop: simplebarWrapper.prop('scrollHeight') },
-        'slow',
-      );
-    });
+      clearInterval(appearInterval);
+    },
+    lastResponses.length * timeBetweenMessages + 100,
+  );
+
+  let simplebarWrapper = $('#calculatorDialog .simplebar-content-wrapper');
+  simplebarWrapper.animate(
+    { scrollTop: simplebarWrapper.prop('scrollHeight') },
+    'slow',
+  );
 }
 
 function SetCalculatorHeight() {
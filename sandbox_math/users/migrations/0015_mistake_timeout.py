@@ -0,0 +1,59 @@
+# Generated by Django 4.1.9 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0014_alter_mistake_mistake_type"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="mistake",
+            name="mistake_type",
+            field=models.CharField(
+                choices=[
+                    ("Define the Equation", "Use the dropdown in the first step to define an equation."),
+                    ("Linear Equations Only", "Make sure the equation you defined in the first step is linear."),
+                    ("Need a Variable", "Provide a variable to solve in the equation in the first step."),
+                    ("Select a Variable", "Use the dropdown menu to select which variable to solve for."),
+                    (
+                        "Select a Step Type",
+                        "Use the dropdown above this step to select which step type you want here.",
+                    ),
+                    (
+                        "Select a Variable in Equation",
+                        "Use the dropdown menu to select a variable to solve for that is in your equation.",
+                    ),
+                    ("No Blank Expressions", "You need to type something in to each input box for each step."),
+                    ("Incorrect Rewrite", "This expression is not equivalent to the previous step."),
+                    ("Unequal Arithmetic", "The arithmetic is not the same on both sides of the equation."),
+                    ("Do Arithmetic", "Do some arithmetic to this expression."),
+                    ("Copy Previous Step", "Copy the expression from the previous step and then do arithmetic to it."),
+                    ("Use Parentheses", "Use parentheses to do arithmetic to the entire expression."),
+                    ("Non-Algebraic Expression", "This isn't an expression that makes sense in this context."),
+                    ("Missing Something", "Remove the grey box from the expression or enter something in it."),
+                    ("Change Step Type", "The equation was already defined in the first step."),
+                    ("Unknown Symbol", "Remove the symbol in this expression that has no meaning in this context."),
+                    (
+                        "Check Previous Expression",
+                        "Fix the expression in the previous step so it makes sense then try to rewrite it.",
+                    ),
+                    (
+                        "Expression Too Long",
+                        "This expression has too many characters in it and cannot be saved. Shorten it!",
+                    ),
+                    ("Took Too Long to Check", "This took too long to check. Try writing it in a simpler way."),
+                    ("No Mistake Here", "This expression is correct at this step."),
+                    ("Already checked - incorrect", "Trying to check rewrite or answer already proven to be wrong."),
+                    ("Expression needs fixed", "Trying to check expression that is not valid."),
+                    ("Choosing a value", "Mistake made while choosing a value to substitute in for a variable."),
+                    ("Substitution expression 1", "Mistake made while substituting a value in for a variable."),
+                    ("Substitution expression 2", "Mistake made while substituting a value in for a variable."),
+                ],
+                default=None,
+                max_length=30,
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.1.9 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0015_mistake_timeout"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="helpclick",
+            index=models.Index(fields=["object_type", "object_id"], name="users_helpc_object__9bc8ba_idx"),
+        ),
+    ]
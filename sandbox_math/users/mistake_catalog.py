@@ -0,0 +1,21 @@
+# Mistake.MISTAKE_TYPES is a list of (code, message) pairs because that is what Django wants for choices, but finding
+# a message or checking whether something is a mistake code means scanning the whole list. A MistakeCatalog is built
+# from it once, when users/models.py is imported, and answers both with a dictionary lookup.
+
+
+# Expression parsing returns one of these instead of a SymPy expression when the latex is not valid math
+# It is equal to its Mistake code, so it can be saved and compared like any other mistake, but because it is its own
+# type, telling a parse failure apart from a SymPy expression never has to compare the expression to mistake codes
+class ParseMistake(str):
+    pass
+
+
+class MistakeCatalog:
+    def __init__(self, mistake_types):
+        self.messages = dict(mistake_types)
+
+    def __contains__(self, code):
+        return isinstance(code, str) and code in self.messages
+
+    def get_message(self, code, default=None):
+        return self.messages.get(code, default)
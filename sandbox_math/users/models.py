@@ -13,6 +13,7 @@ from django.utils.translation import gettext_lazy as _
 
 from config.settings.base import AUTH_USER_MODEL
 from sandbox_math.sandbox.models import Sandbox
+from sandbox_math.users.mistake_catalog import MistakeCatalog
 
 
 @receiver(user_signed_up)
@@ -285,7 +286,7 @@ class User(AbstractUser):
 
             all_problems_recently_started = []
             for p in all_problems_with_recent_steps:
-                first_step = step_model.objects.filter(problem_id=p["id"]).order_by("created").first()
+                first_step = step_model.objects.filter(problem_id=p["id"]).order_by("position").first()
                 if first_step.created >= start_date:
                     all_problems_recently_started.append(first_step.problem)
 
@@ -329,6 +330,9 @@ class HelpClick(models.Model):
     object_type = models.CharField(max_length=10, choices=OBJECT_TYPES, default=None)
     click_time = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["object_type", "object_id"])]
+
 
 class Proceed(models.Model):
     ADD_STEP = "add step"
@@ -350,8 +354,8 @@ class Mistake(models.Model):
     CHECK_REWRITE = "CheckRewrite"
     CHECK_SOLUTION = "CheckSolution"
 
-    # HELP_CLICK mistakes can be fixed when Step.get_mistakes is called
-    # PROCEED -> ADD_STEP mistakes can be fixed when Problem.get_all_steps_mistakes is called
+    # HELP_CLICK mistakes can be fixed when Problem.reconcile_mistakes is called
+    # PROCEED -> ADD_STEP mistakes can be fixed when Problem.reconcile_mistakes is called
     # CHECK_SOLUTION mistakes can be fixed when a problem is solved
     # CHECK_REWRITE mistakes can be fixed after expression 1 or expression 2 is correctly substituted for
     MISTAKE_EVENT_TYPES = [
@@ -380,6 +384,7 @@ class Mistake(models.Model):
     ALREADY_DEFINED = "Change Step Type"
     CANNOT_REWRITE = "Check Previous Expression"
     TOO_LONG = "Expression Too Long"
+    TIMEOUT = "Took Too Long to Check"
     NONE = "No Mistake Here"
 
     # Check rewrite and check solution mistakes
@@ -442,6 +447,7 @@ class Mistake(models.Model):
             "Fix the expression in the previous step so it makes sense then try to rewrite it.",
         ),
         (TOO_LONG, "This expression has too many characters in it and cannot be saved. Shorten it!"),
+        (TIMEOUT, "This took too long to check. Try writing it in a simpler way."),
         (NONE, "This expression is correct at this step."),
         (ALREADY_INCORRECT, "Trying to check rewrite or answer already proven to be wrong."),
         (INVALID_EXPR, "Trying to check expression that is not valid."),
@@ -449,6 +455,7 @@ class Mistake(models.Model):
         (SUB_EXPR1, "Mistake made while substituting a value in for a variable."),
         (SUB_EXPR2, "Mistake made while substituting a value in for a variable."),
     ]
+    CATALOG = MistakeCatalog(MISTAKE_TYPES)
 
     owner = models.ForeignKey(AUTH_USER_MODEL, related_name="owner", on_delete=models.CASCADE)
     mistake_type = models.CharField(max_length=30, choices=MISTAKE_TYPES, default=None)
@@ -457,31 +464,47 @@ class Mistake(models.Model):
     mistake_time = models.DateTimeField(auto_now_add=True)
     is_fixed = models.BooleanField(default=False)
 
+    # Saves one mistake for the student working on the problem, see MistakeRecorder for saving several at once
     @classmethod
     def save_new(cls, problem_id, mistake_event_instance, mistake_type):
-        problem_model = apps.get_model("algebra", "Problem")
+        mistake_recorder = MistakeRecorder.for_problem(problem_id)
+        new_mistake = mistake_recorder.add(mistake_event_instance, mistake_type)
+        mistake_recorder.save()
+        if new_mistake is None:
+            return Mistake.objects.none()
 
-        problem_obj = problem_model.objects.get(id=problem_id)
+        return new_mistake
 
-        new_mistake = Mistake.objects.none()
-        for mistake_event_type in Mistake.MISTAKE_EVENT_TYPES:
-            if mistake_event_type[0] == mistake_event_instance.__class__.__name__:
-                new_mistake = Mistake(
-                    owner=problem_obj.student,
-                    mistake_type=mistake_type,
-                    mistake_event_type=mistake_event_type[0],
-                    event_id=mistake_event_instance.id,
-                )
-                new_mistake.save()
+    # expression_ids are expressions in one of owner_id's problems that don't have a mistake anymore
+    # If help was clicked on one of them while it had a mistake, every help click mistake on it is fixed
+    # This is a single UPDATE, and it only looks at owner_id's mistakes
+    @classmethod
+    def fix_help_clicks(cls, owner_id, expression_ids):
+        if not expression_ids:
+            return
+
+        help_click_mistakes = Mistake.objects.filter(owner_id=owner_id, mistake_event_type=Mistake.HELP_CLICK)
+        unfixed_help_clicks = HelpClick.objects.filter(
+            object_type=HelpClick.EXPRESSION,
+            object_id__in=expression_ids,
+            id__in=help_click_mistakes.filter(is_fixed=False).exclude(mistake_type=Mistake.NONE).values("event_id"),
+        )
+        help_clicks = HelpClick.objects.filter(
+            object_type=HelpClick.EXPRESSION, object_id__in=unfixed_help_clicks.values("object_id")
+        )
+        help_click_mistakes.filter(event_id__in=help_clicks.values("id")).update(is_fixed=True)
 
-        return new_mistake
+    # This is called when none of the steps in a problem have a mistake
+    @classmethod
+    def fix_proceeds(cls, problem_id, proceed_type):
+        proceeds = Proceed.objects.filter(problem_id=problem_id, proceed_type=proceed_type)
+        Mistake.objects.filter(mistake_event_type=Mistake.PROCEED, event_id__in=proceeds.values("id")).update(
+            is_fixed=True
+        )
 
     @classmethod
     def get_mistake_message(cls, mistake_type):
-        for m in Mistake.MISTAKE_TYPES:
-            if m[0] == mistake_type:
-                return m[1]
-        return None
+        return Mistake.CATALOG.get_message(mistake_type)
 
     @classmethod
     def get_recent_by_date(cls, student_id, day_range):
@@ -554,3 +577,46 @@ class Mistake(models.Model):
                 mistakes_per_date[date_string]["Mistakes Fixed"] = 1
 
         return mistakes_per_date
+
+
+# Collects the mistakes made by one thing a student did, and saves all of them with one bulk_create
+# The owner is looked up once for all of them, and each mistake's event type comes from the class of its event
+class MistakeRecorder:
+    EVENT_TYPES = {mistake_event_type for mistake_event_type, description in Mistake.MISTAKE_EVENT_TYPES}
+
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+        self.mistakes = []
+
+    # A recorder for the student working on a problem
+    @classmethod
+    def for_problem(cls, problem_id):
+        problem_model = apps.get_model("algebra", "Problem")
+
+        return MistakeRecorder(problem_model.objects.values_list("student_id", flat=True).get(id=problem_id))
+
+    # Adds a mistake made in mistake_event_instance, which is a HelpClick, Proceed, CheckRewrite or CheckSolution, and
+    # returns it, or None if mistake_event_instance isn't one of those
+    # Nothing is saved until save is called
+    def add(self, mistake_event_instance, mistake_type):
+        mistake_event_type = mistake_event_instance.__class__.__name__
+        if mistake_event_type not in MistakeRecorder.EVENT_TYPES:
+            return None
+
+        new_mistake = Mistake(
+            owner_id=self.owner_id,
+            mistake_type=mistake_type,
+            mistake_event_type=mistake_event_type,
+            event_id=mistake_event_instance.id,
+        )
+        self.mistakes.append(new_mistake)
+
+        return new_mistake
+
+    # Saves the mistakes added since the last save in one query, and returns them
+    def save(self):
+        saved_mistakes, self.mistakes = self.mistakes, []
+        if saved_mistakes:
+            Mistake.objects.bulk_create(saved_mistakes)
+
+        return saved_mistakes
@@ -0,0 +1,23 @@
+from sympy import Symbol
+
+from sandbox_math.users.mistake_catalog import ParseMistake
+from sandbox_math.users.models import Mistake
+
+
+def test_catalog_matches_mistake_types():
+    for code, message in Mistake.MISTAKE_TYPES:
+        assert code in Mistake.CATALOG
+        assert Mistake.get_mistake_message(code) == message
+
+    assert "2x+3" not in Mistake.CATALOG
+    assert Symbol("x") not in Mistake.CATALOG
+    assert Mistake.get_mistake_message("2x+3") is None
+    assert Mistake.CATALOG.get_message("2x+3", "") == ""
+
+
+def test_parse_mistake_is_its_mistake_code():
+    parse_mistake = ParseMistake(Mistake.NON_MATH)
+
+    assert parse_mistake == Mistake.NON_MATH
+    assert parse_mistake in Mistake.CATALOG
+    assert not isinstance(Mistake.NON_MATH, ParseMistake)
@@ -1,5 +1,62 @@
-from sandbox_math.users.models import User
+from sandbox_math.sandbox.models import Sandbox
+from sandbox_math.users.models import HelpClick, Mistake, MistakeRecorder, Proceed, User
+from sandbox_math.users.tests.factories import UserFactory
 
 
 def test_user_get_absolute_url(user: User):
     assert user.get_absolute_url() == f"/users/{user.username}/"
+
+
+def test_fix_help_clicks(user: User, django_assert_num_queries):
+    other_user = UserFactory()
+    mistakes = []
+    for owner, expression_id, mistake_type in [
+        (user, 1, Mistake.NON_MATH),
+        (user, 1, Mistake.NONE),
+        (user, 2, Mistake.NONE),
+        (other_user, 1, Mistake.NON_MATH),
+    ]:
+        help_click = HelpClick(sandbox=Sandbox.ALGEBRA, object_type=HelpClick.EXPRESSION, object_id=expression_id)
+        help_click.save()
+        mistake = Mistake(
+            owner=owner, mistake_type=mistake_type, mistake_event_type=Mistake.HELP_CLICK, event_id=help_click.id
+        )
+        mistake.save()
+        mistakes.append(mistake)
+
+    with django_assert_num_queries(1):
+        Mistake.fix_help_clicks(user.id, [1, 2])
+
+    for mistake in mistakes:
+        mistake.refresh_from_db()
+    # Expression 2 never had help clicked on it while it had a mistake, and other students' mistakes are left alone
+    assert [mistake.is_fixed for mistake in mistakes] == [True, True, False, False]
+
+
+def test_mistake_recorder(user: User, django_assert_num_queries):
+    help_click = HelpClick(sandbox=Sandbox.ALGEBRA, object_type=HelpClick.EXPRESSION, object_id=1)
+    help_click.save()
+    proceed = Proceed(sandbox=Sandbox.ALGEBRA, problem_id=1, proceed_type=Proceed.ADD_STEP)
+    proceed.save()
+
+    mistake_recorder = MistakeRecorder(user.id)
+    for mistake_type in [Mistake.REWRITE, Mistake.BLANK_EXPR, Mistake.NON_MATH]:
+        mistake_recorder.add(proceed, mistake_type)
+    mistake_recorder.add(help_click, Mistake.NONE)
+    # Only the events mistakes are made in are recorded
+    assert mistake_recorder.add(user, Mistake.REWRITE) is None
+
+    # However many mistakes there are
+    with django_assert_num_queries(1):
+        mistakes = mistake_recorder.save()
+
+    assert all(mistake.id for mistake in mistakes)
+    assert list(
+        Mistake.objects.filter(owner=user).order_by("id").values_list("mistake_event_type", "mistake_type")
+    ) == [
+        (Mistake.PROCEED, Mistake.REWRITE),
+        (Mistake.PROCEED, Mistake.BLANK_EXPR),
+        (Mistake.PROCEED, Mistake.NON_MATH),
+        (Mistake.HELP_CLICK, Mistake.NONE),
+    ]
+    assert mistake_recorder.save() == []
@@ -0,0 +1,43 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+
+from django.conf import settings
+from django.db import close_old_connections
+
+# Async views hand the work that blocks, which is mostly ORM calls and the SymPy work they lead to, to a fixed number
+# of threads instead of Django's thread per request. A student waiting on SymPy holds one of these threads, and one
+# waiting for a free thread only holds a coroutine, so a worker can have many more students than threads.
+
+blocking_executor = None
+blocking_executor_lock = Lock()
+
+
+# The threads for this process, started the first time they are needed
+def get_blocking_executor():
+    global blocking_executor
+    if blocking_executor is None:
+        with blocking_executor_lock:
+            if blocking_executor is None:
+                blocking_executor = ThreadPoolExecutor(
+                    max_workers=settings.BLOCKING_WORK_THREADS, thread_name_prefix="blocking-work"
+                )
+
+    return blocking_executor
+
+
+# Each thread keeps its own database connection, so this does what Django does before and after a request to not use
+# one that broke or is older than CONN_MAX_AGE
+def run_with_connection(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(func, *args):
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(get_blocking_executor(), partial(run_with_connection, func, *args))
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from threading import Lock
+
+# Returned by LRUCache.get when the key is not in the cache, because None can be a cached value
+MISSING = object()
+
+
+# A dictionary that holds at most max_size items and throws out the least recently used one when it is full
+# It counts hits and misses so we can tell if max_size is big enough
+# One of these is shared by every thread in a process, so all reads and writes happen while holding a lock
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._items), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,135 @@
+import multiprocessing
+import queue
+import time
+from threading import Lock
+
+from django.conf import settings
+
+
+# Raised when a call to SympyPool.run takes longer than the pool's timeout
+# The worker that was running it is killed and replaced, so it stops using CPU right away
+class SympyTimeout(Exception):
+    pass
+
+
+# This is what each worker process runs: it takes (function, args) off its connection, calls it, and sends back
+# ("ok", result) or ("error", exception) until the connection is closed
+def work(connection):
+    while True:
+        try:
+            func, args = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            result = ("ok", func(*args))
+        except Exception as error:
+            result = ("error", error)
+        connection.send(result)
+
+
+# A set of worker processes that SymPy work is sent to, so a student expression that takes forever can be stopped
+# without tying up the thread handling the request
+# Functions and arguments are pickled, so functions have to be importable without Django being set up, and SymPy
+# expressions are evaluated when they are unpickled, so anything that has to stay unevaluated must be sent as srepr
+class SympyPool:
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.calls = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.most_waiting = 0
+        self._lock = Lock()
+        # The workers are forked from a separate server process that has already imported SymPy, instead of from a
+        # Django process with threads and database connections
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(["sympy"])
+        self._idle_workers = queue.Queue()
+        for _ in range(size):
+            self._idle_workers.put(self._start_worker())
+
+    def _start_worker(self):
+        connection, worker_connection = self._context.Pipe()
+        process = self._context.Process(target=work, args=(worker_connection,), daemon=True)
+        process.start()
+        worker_connection.close()
+
+        return process, connection
+
+    # This returns func(*args) from a worker, or raises SympyTimeout if that takes longer than self.timeout seconds,
+    # counting the time spent waiting for a worker to be free
+    def run(self, func, *args):
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            self.waiting += 1
+            self.most_waiting = max(self.most_waiting, self.waiting)
+        try:
+            worker = self._idle_workers.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise SympyTimeout()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        with self._lock:
+            self.calls += 1
+        process, connection = worker
+        try:
+            connection.send((func, args))
+            if not connection.poll(max(0, deadline - time.monotonic())):
+                raise SympyTimeout()
+            status, value = connection.recv()
+        except (SympyTimeout, EOFError, OSError):
+            # The worker is stuck or died, so it gets replaced
+            process.kill()
+            process.join()
+            connection.close()
+            worker = self._start_worker()
+            with self._lock:
+                self.timeouts += 1
+            raise SympyTimeout()
+        finally:
+            self._idle_workers.put(worker)
+
+        if status == "error":
+            raise value
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "timeout": self.timeout,
+                "idle": self._idle_workers.qsize(),
+                "waiting": self.waiting,
+                "most_waiting": self.most_waiting,
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+            }
+
+
+sympy_pool = None
+sympy_pool_lock = Lock()
+
+
+# The pool for this process, started the first time it is needed
+# It is None when settings.SYMPY_POOL_SIZE is 0, and then SymPy work is done in the request thread
+def get_sympy_pool():
+    global sympy_pool
+    if settings.SYMPY_POOL_SIZE > 0 and sympy_pool is None:
+        with sympy_pool_lock:
+            if sympy_pool is None:
+                sympy_pool = SympyPool(settings.SYMPY_POOL_SIZE, settings.SYMPY_TIMEOUT)
+
+    return sympy_pool
+
+
+def run_sympy(func, *args):
+    pool = get_sympy_pool()
+    if pool is None:
+        return func(*args)
+
+    return pool.run(func, *args)